@@ -2,9 +2,10 @@ from __future__ import annotations
 from anthropic import Anthropic, NotFoundError
 from datetime import datetime
 from typing import Iterable, Tuple
-import json, os, re
+import json, re
 
-DEFAULT_MODEL = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20240620")
+from . import metrics
+from .model_registry import registry
 
 def _percent_done(events: Iterable[dict]) -> int:
     total = 0
@@ -41,11 +42,12 @@ def decide_mood_and_message(
     api_key: str,
     events: Iterable[dict],
     history_percent: list[int],
-    model: str = DEFAULT_MODEL,
+    model: str | None = None,
 ) -> Tuple[str, str, int]:
     """
     Returns (mood, message, percent_done).
     mood ∈ {"great","okay","low"}; message ≤ 120 chars.
+    `model` defaults to the registry's pick for the "mood" route.
     """
     percent = _percent_done(events)
 
@@ -69,35 +71,44 @@ def decide_mood_and_message(
         "Output JSON only."
     )
 
-    try:
-        resp = client.messages.create(
-            model=model,
-            max_tokens=150,
-            temperature=0.3,
-            system=system,
-            messages=[{"role": "user", "content": user}],
-        )
-        raw = resp.content[0].text if resp.content else "{}"
-        data = _parse_json(raw) or {}
-        mood = (data.get("mood") or "").strip().lower()
-        msg = (data.get("message") or "").strip()
+    model = model or registry.pick("mood")
+    for _ in range(2):
+        try:
+            with metrics.upstream("anthropic", "messages.create") as span:
+                span.set(route="mood", model=model)
+                resp = client.messages.create(
+                    model=model,
+                    max_tokens=150,
+                    temperature=0.3,
+                    system=system,
+                    messages=[{"role": "user", "content": user}],
+                )
+            metrics.record_usage("mood", model, resp.usage)
+            span.set(input_tokens=resp.usage.input_tokens, output_tokens=resp.usage.output_tokens)
+            raw = resp.content[0].text if resp.content else "{}"
+            data = _parse_json(raw) or {}
+            mood = (data.get("mood") or "").strip().lower()
+            msg = (data.get("message") or "").strip()
 
-        if mood not in {"great", "okay", "low"}:
-            mood, msg = _fallback_message(percent)
+            if mood not in {"great", "okay", "low"}:
+                mood, msg = _fallback_message(percent)
 
-        if len(msg) > 120:
-            msg = msg[:117] + "..."
+            if len(msg) > 120:
+                msg = msg[:117] + "..."
 
-        return mood, msg or _fallback_message(percent)[1], percent
+            return mood, msg or _fallback_message(percent)[1], percent
 
-    except NotFoundError:
-        # model name not available to this key → try a known-good fallback once
-        if model != "claude-3-haiku-20240307":
-            return decide_mood_and_message(api_key, events, history_percent, "claude-3-haiku-20240307")
-        mood, msg = _fallback_message(percent)
-        return mood, msg, percent
-    except Exception as e:
-        # Any network/JSON error → graceful fallback
-        print("Claude error:", repr(e))
-        mood, msg = _fallback_message(percent)
-        return mood, msg, percent
\ No newline at end of file
+        except NotFoundError:
+            # model not available to this key → remember that, retry once with the next pick
+            registry.mark_unavailable(model)
+            next_model = registry.pick("mood")
+            if next_model == model:
+                break
+            model = next_model
+        except Exception as e:
+            # Any network/JSON error → graceful fallback
+            print("Claude error:", repr(e))
+            break
+
+    mood, msg = _fallback_message(percent)
+    return mood, msg, percent
@@ -2,216 +2,184 @@
 MCP-powered brain that lets Claude call multiple tools.
 Simplified embedded approach for hackathon speed.
 """
-from anthropic import Anthropic
+from anthropic import Anthropic, NotFoundError
 from typing import Dict, Any, List
+import asyncio
 import json
-import importlib.util
+import time
 
-# Import MCP tool functions directly (embedded approach)
-import sys
-import os
-sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from . import metrics, replay, slack_summary_cache, tracing
+from .brain import _parse_json
+from .tool_registry import tools
+from .tool_result import ToolResult
+from .model_registry import registry
 
-async def get_calendar_events():
-    """Wrapper for calendar MCP tool"""
-    from mcp.calendar_server import get_today_events_tool
-    result = await get_today_events_tool()
-    return result.content[0].get("json", [])
-
-async def query_notion(database_id: str, filter_json: str = ""):
-    """Wrapper for Notion MCP tool"""
-    from mcp.notion_server import notion_query_database
-    result = await notion_query_database(database_id, filter_json)
-    return result.content[0].get("json", {})
-
-async def fetch_ai_query(query: str):
-    """Wrapper for Fetch AI MCP tool"""
-    from mcp.fetch_ai_server import fetch_ai_query_tool
-    result = await fetch_ai_query_tool(query)
-    return result.content[0].get("json", {})
-
-async def slack_list_conversations(types: str = "public_channel,private_channel,im,mpim", limit: int = 100, cursor: str | None = None):
-    base = os.path.join(os.path.dirname(os.path.dirname(__file__)), "mcp", "slack_server.py")
-    spec = importlib.util.spec_from_file_location("local_mcp_slack_server", base)
-    mod = importlib.util.module_from_spec(spec)
-    assert spec and spec.loader
-    spec.loader.exec_module(mod)
-    result = await mod.slack_list_conversations(types, limit, cursor)
-    # Extract JSON payload robustly
-    blocks = getattr(result, "content", [])
-    if blocks:
-        b = blocks[0]
-        if isinstance(b, dict):
-            if "json" in b:
-                return b.get("json", {})
-            if "text" in b:
-                try:
-                    return json.loads(b["text"])  # server returned JSON as text
-                except Exception:
-                    return {"text": b["text"]}
-            return {}
-        # Pydantic content block (avoid BaseModel.json() name collision)
-        if hasattr(b, "model_dump"):
-            bd = b.model_dump()
-            if getattr(b, "type", None) == "json":
-                return bd.get("json", {})
-            if getattr(b, "type", None) == "text":
-                txt = bd.get("text", "")
-                try:
-                    return json.loads(txt)
-                except Exception:
-                    return {"text": txt}
-        if hasattr(b, "text"):
-            txt = getattr(b, "text")
-            try:
-                return json.loads(txt)
-            except Exception:
-                return {"text": txt}
-    return {}
-
-async def slack_fetch_messages(channel_id: str, oldest_ts: str | None = None, latest_ts: str | None = None, limit: int = 100, cursor: str | None = None):
-    base = os.path.join(os.path.dirname(os.path.dirname(__file__)), "mcp", "slack_server.py")
-    spec = importlib.util.spec_from_file_location("local_mcp_slack_server", base)
-    mod = importlib.util.module_from_spec(spec)
-    assert spec and spec.loader
-    spec.loader.exec_module(mod)
-    result = await mod.slack_fetch_messages(channel_id, oldest_ts, latest_ts, limit, cursor)
-    blocks = getattr(result, "content", [])
-    if blocks:
-        b = blocks[0]
-        if isinstance(b, dict):
-            if "json" in b:
-                return b.get("json", {})
-            if "text" in b:
-                try:
-                    return json.loads(b["text"])  # server returned JSON as text
-                except Exception:
-                    return {"text": b["text"]}
-            return {}
-        if hasattr(b, "model_dump"):
-            bd = b.model_dump()
-            if getattr(b, "type", None) == "json":
-                return bd.get("json", {})
-            if getattr(b, "type", None) == "text":
-                txt = bd.get("text", "")
-                try:
-                    return json.loads(txt)
-                except Exception:
-                    return {"text": txt}
-        if hasattr(b, "text"):
-            txt = getattr(b, "text")
-            try:
-                return json.loads(txt)
-            except Exception:
-                return {"text": txt}
-    return {}
-
-# Tool definitions for Claude
-TOOLS = [
+# Embedded approach: MCP server modules are loaded once and called in-process
+tools.register(
+    "get_calendar_events", "calendar_server", "get_today_events_tool",
+    "Fetch today's Google Calendar events with completion status",
+    default=[],
+)
+tools.register(
+    "query_notion", "notion_server", "notion_query_database",
+    "Query Notion database for tasks. Provide database_id and optional filter_json",
     {
-        "name": "get_calendar_events",
-        "description": "Fetch today's Google Calendar events with completion status",
-        "input_schema": {
-            "type": "object",
-            "properties": {},
-            "required": []
+        "database_id": {
+            "type": "string",
+            "description": "Notion database ID"
+        },
+        "filter_json": {
+            "type": "string",
+            "description": "JSON string for Notion API filter (optional)"
         }
     },
+    ["database_id"],
+)
+tools.register(
+    "fetch_ai_query", "fetch_ai_server", "fetch_ai_query_tool",
+    "Query Fetch AI agent for productivity insights",
     {
-        "name": "query_notion",
-        "description": "Query Notion database for tasks. Provide database_id and optional filter_json",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "database_id": {
-                    "type": "string",
-                    "description": "Notion database ID"
-                },
-                "filter_json": {
-                    "type": "string",
-                    "description": "JSON string for Notion API filter (optional)"
-                }
-            },
-            "required": ["database_id"]
+        "query": {
+            "type": "string",
+            "description": "Query to send to Fetch AI"
         }
     },
+    ["query"],
+)
+tools.register(
+    "slack_list_conversations", "slack_server", "slack_list_conversations",
+    "List Slack conversations accessible by the authenticated user, most active first",
     {
-        "name": "fetch_ai_query",
-        "description": "Query Fetch AI agent for productivity insights",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "query": {
-                    "type": "string",
-                    "description": "Query to send to Fetch AI"
-                }
-            },
-            "required": ["query"]
-        }
+        "types": {"type": "string", "description": "Comma-separated types: public_channel,private_channel,im,mpim"},
+        "limit": {"type": "integer"},
+        "cursor": {"type": "string"}
     },
+)
+tools.register(
+    "slack_fetch_messages", "slack_server", "slack_fetch_messages",
+    "Fetch recent messages from a Slack conversation, with author display names and the replies of threads active in the window",
     {
-        "name": "slack_list_conversations",
-        "description": "List Slack conversations accessible by the authenticated user",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "types": {"type": "string", "description": "Comma-separated types: public_channel,private_channel,im,mpim"},
-                "limit": {"type": "integer"},
-                "cursor": {"type": "string"}
-            },
-            "required": []
-        }
+        "channel_id": {"type": "string"},
+        "oldest_ts": {"type": "string"},
+        "latest_ts": {"type": "string"},
+        "limit": {"type": "integer"},
+        "cursor": {"type": "string"},
+        "expand_threads": {"type": "boolean"},
+        "resolve_users": {"type": "boolean"},
+        "filter_noise": {"type": "boolean", "description": "Drop join/leave-style messages and collapse near-duplicates (default true)"}
     },
+    ["channel_id"],
+)
+tools.register(
+    "slack_top_channels", "slack_server", "slack_top_channels",
+    "Member Slack conversations ranked by recent activity (last message ts and message counts over 1h/24h/7d).",
     {
-        "name": "slack_fetch_messages",
-        "description": "Fetch recent messages from a Slack conversation",
-        "input_schema": {
-            "type": "object",
-            "properties": {
-                "channel_id": {"type": "string"},
-                "oldest_ts": {"type": "string"},
-                "latest_ts": {"type": "string"},
-                "limit": {"type": "integer"},
-                "cursor": {"type": "string"}
-            },
-            "required": ["channel_id"]
-        }
-    }
-]
-
-async def call_tool(tool_name: str, tool_input: Dict[str, Any]) -> Any:
-    """Route tool calls to appropriate MCP functions"""
-    if tool_name == "get_calendar_events":
-        return await get_calendar_events()
-    elif tool_name == "query_notion":
-        return await query_notion(
-            tool_input.get("database_id", ""),
-            tool_input.get("filter_json", "")
-        )
-    elif tool_name == "fetch_ai_query":
-        return await fetch_ai_query(tool_input.get("query", ""))
-    elif tool_name == "slack_list_conversations":
-        return await slack_list_conversations(
-            tool_input.get("types", "public_channel,private_channel,im,mpim"),
-            tool_input.get("limit", 100),
-            tool_input.get("cursor")
-        )
-    elif tool_name == "slack_fetch_messages":
-        return await slack_fetch_messages(
-            tool_input.get("channel_id", ""),
-            tool_input.get("oldest_ts"),
-            tool_input.get("latest_ts"),
-            tool_input.get("limit", 100),
-            tool_input.get("cursor")
-        )
-    else:
-        raise ValueError(f"Unknown tool: {tool_name}")
+        "k": {"type": "integer", "description": "How many conversations to return"},
+        "types": {"type": "string"}
+    },
+)
+
+tools.register(
+    "slack_search", "slack_server", "slack_search_messages",
+    "Full-text search (BM25-ranked) over synced Slack messages. Use it to pull only the messages relevant to a topic instead of reading whole channels.",
+    {
+        "query": {"type": "string", "description": "Words to search for"},
+        "channel_id": {"type": "string"},
+        "user": {"type": "string", "description": "Slack user id"},
+        "oldest_ts": {"type": "string"},
+        "latest_ts": {"type": "string"},
+        "limit": {"type": "integer"}
+    },
+    ["query"],
+)
+
+# Tool definitions for Claude
+TOOLS = tools.schemas()
+
+async def call_tool(tool_name: str, tool_input: Dict[str, Any]) -> ToolResult:
+    """Route tool calls to appropriate MCP functions (or replay them from a cassette)"""
+    with tracing.span(f"tool {tool_name}", input=tool_input) as span:
+        result = await replay.recorded_tool_call(tool_name, tool_input, lambda: tools.invoke(tool_name, tool_input))
+        if result.error is not None:
+            span.fail(result.error)
+        span.set(output=tracing.sizes(result.data))
+        return result
+
+async def get_calendar_events():
+    """Wrapper for calendar MCP tool"""
+    return await tools.call("get_calendar_events", {})
+
+async def query_notion(database_id: str, filter_json: str = ""):
+    """Wrapper for Notion MCP tool"""
+    return await tools.call("query_notion", {"database_id": database_id, "filter_json": filter_json})
+
+async def fetch_ai_query(query: str):
+    """Wrapper for Fetch AI MCP tool"""
+    return await tools.call("fetch_ai_query", {"query": query})
+
+async def slack_list_conversations(types: str = "public_channel,private_channel,im,mpim", limit: int = 100, cursor: str | None = None):
+    return await tools.call("slack_list_conversations", {"types": types, "limit": limit, "cursor": cursor})
+
+async def slack_fetch_messages(channel_id: str, oldest_ts: str | None = None, latest_ts: str | None = None, limit: int = 100, cursor: str | None = None, expand_threads: bool = True, resolve_users: bool = True, filter_noise: bool = True):
+    return await tools.call("slack_fetch_messages", {
+        "channel_id": channel_id,
+        "oldest_ts": oldest_ts,
+        "latest_ts": latest_ts,
+        "limit": limit,
+        "cursor": cursor,
+        "expand_threads": expand_threads,
+        "resolve_users": resolve_users,
+        "filter_noise": filter_noise,
+    })
+
+async def slack_search_messages(query: str, channel_id: str | None = None, user: str | None = None, oldest_ts: str | None = None, latest_ts: str | None = None, limit: int = 20):
+    return await tools.call("slack_search", {
+        "query": query,
+        "channel_id": channel_id,
+        "user": user,
+        "oldest_ts": oldest_ts,
+        "latest_ts": latest_ts,
+        "limit": limit,
+    })
+
+def _create(client: Anthropic, route: str, model: str, messages: List[Dict[str, Any]], **kwargs):
+    with metrics.upstream("anthropic", "messages.create") as span:
+        span.set(route=route, model=model, messages=len(messages))
+        response = client.messages.create(model=model, messages=messages, **kwargs)
+    usage = getattr(response, "usage", None)
+    metrics.record_usage(route, model, usage)
+    span.set(
+        stop_reason=getattr(response, "stop_reason", None),
+        input_tokens=getattr(usage, "input_tokens", None),
+        output_tokens=getattr(usage, "output_tokens", None),
+    )
+    return response
+
+def _create_message(client: Anthropic, route: str, messages: List[Dict[str, Any]], **kwargs):
+    """messages.create on the route's model; a missing model is remembered and retried once."""
+    model = registry.pick(route)
+    try:
+        response = _create(client, route, model, messages, **kwargs)
+    except NotFoundError:
+        registry.mark_unavailable(model)
+        next_model = registry.pick(route)
+        if next_model == model:
+            raise
+        response = _create(client, route, next_model, messages, **kwargs)
+    replay.record_response(messages, response)
+    return response
 
 async def decide_mood_with_mcp(api_key: str, history_percent: List[int]) -> Dict[str, Any]:
     """
     Use Claude with MCP tools to analyze productivity.
     Claude decides which tools to call and synthesizes the data.
     """
+    with tracing.span("mood_agent", history=history_percent[-7:]) as span:
+        result = await _decide_mood(api_key, history_percent)
+        span.set(mood=result.get("mood"), percent_done=result.get("percent_done"))
+        return result
+
+async def _decide_mood(api_key: str, history_percent: List[int]) -> Dict[str, Any]:
     client = Anthropic(api_key=api_key)
     
     # Initial prompt
@@ -237,13 +205,12 @@ Return ONLY valid JSON: {{"percent_done": <int>, "mood": "<string>", "message":
     
     # Multi-turn loop: let Claude call tools
     max_turns = 10  # Safety limit
+    metrics.agent_runs.inc(agent="mood")
     for turn in range(max_turns):
-        response = client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=4096,
-            messages=messages,
-            tools=TOOLS
-        )
+        metrics.agent_turns.inc(agent="mood")
+        tracing.current().set(turns=turn + 1)
+        # Off the event loop so other requests/stages keep running during the model call
+        response = await asyncio.to_thread(_create_message, client, "agent", messages, max_tokens=4096, tools=TOOLS)
         
         # Check if Claude is done
         if response.stop_reason == "end_turn":
@@ -278,20 +245,11 @@ Return ONLY valid JSON: {{"percent_done": <int>, "mood": "<string>", "message":
             for block in response.content:
                 if block.type == "tool_use":
                     try:
-                        # Call the tool
+                        # Call the tool; its payload is serialized once, here
                         result = await call_tool(block.name, block.input)
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block.id,
-                            "content": json.dumps(result)
-                        })
                     except Exception as e:
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block.id,
-                            "content": f"Error: {str(e)}",
-                            "is_error": True
-                        })
+                        result = ToolResult(error=str(e))
+                    tool_results.append(result.to_block(block.id))
             
             # Add tool results to messages
             messages.append({"role": "user", "content": tool_results})
@@ -306,87 +264,165 @@ Return ONLY valid JSON: {{"percent_done": <int>, "mood": "<string>", "message":
         "message": "Analysis took too long 🐮"
     }
 
-async def summarize_slack_with_mcp(api_key: str, hours: int = 24, max_channels: int = 5, messages_per_channel: int = 100) -> Dict[str, Any]:
-    """
-    Use Claude with Slack tools to read recent messages and produce summaries and suggestions.
-    """
-    client = Anthropic(api_key=api_key)
+def _response_json(response) -> Dict[str, Any] | None:
+    for block in response.content:
+        if block.type == "text":
+            data = _parse_json(block.text)
+            if isinstance(data, dict):
+                return data
+    return None
 
-    prompt_lines = [
-        "You are the Cow Assistant.",
-        "",
-        "Goal: Read recent Slack conversations and produce concise summaries and actionable suggestions.",
+def _compact_messages(messages: List[Dict[str, Any]]) -> str:
+    # Oldest first, one line per message (thread replies indented under their parent);
+    # ids/subtypes are noise for the summary
+    lines = []
+    for m in sorted(messages, key=lambda m: float(m.get("ts") or 0)):
+        text = (m.get("text") or "").replace("\n", " ").strip()
+        if text:
+            repeat = f" (x{m['dup_count']} similar)" if m.get("dup_count") else ""
+            lines.append(f"[{m.get('ts')}] {m.get('user_name') or m.get('user') or '?'}: {text}{repeat}")
+        for r in m.get("replies", []):
+            reply = (r.get("text") or "").replace("\n", " ").strip()
+            if reply:
+                lines.append(f"    ↳ {r.get('user_name') or r.get('user') or '?'}: {reply}")
+    return "\n".join(lines)
+
+def _activity_ts(m: Dict[str, Any]) -> str:
+    # A thread with new replies counts as new activity even if its parent is old
+    return max([m.get("ts") or "0", *(r.get("ts") or "0" for r in m.get("replies", []))], key=float)
+
+def _newer_than(messages: List[Dict[str, Any]], ts: str) -> List[Dict[str, Any]]:
+    """Messages (and replies) the summary up to `ts` hasn't seen."""
+    fresh = []
+    for m in messages:
+        if float(_activity_ts(m)) <= float(ts):
+            continue
+        if m.get("replies") and float(m.get("ts") or 0) <= float(ts):
+            m = {**m, "replies": [r for r in m["replies"] if float(r.get("ts") or 0) > float(ts)]}
+        fresh.append(m)
+    return fresh
+
+def _map_prompt(channel: Dict[str, Any], messages: List[Dict[str, Any]], prior: Dict[str, Any] | None) -> str:
+    name = channel.get("name") or channel.get("id")
+    lines = [
+        f"Summarize this Slack channel (#{name}) for a busy teammate.",
         "",
-        "Instructions:",
-        "- Use slack_list_conversations to discover channels/DMs the user can access.",
-        f"- Select up to {max_channels} conversations that look most relevant (active recently, work-related names).",
-        f"- For each, use slack_fetch_messages to fetch up to {messages_per_channel} recent messages (default recency is OK). Prefer last {hours} hours if possible.",
+    ]
+    if prior:
+        lines += [
+            "Previous summary of older messages (update it with the new messages below):",
+            json.dumps(prior),
+            "",
+            "New messages:",
+        ]
+    else:
+        lines.append("Messages:")
+    lines += [
+        _compact_messages(messages),
         "",
-        "Output only valid JSON with this schema:",
-        "{",
-        '  "channels": [',
-        "    {",
-        '      "id": "string",',
-        '      "name": "string",',
-        '      "summary": "short summary of recent discussion",',
-        '      "key_points": ["point1", "point2"],',
-        '      "action_items": ["action1", "action2"]',
-        "    }",
-        "  ],",
-        '  "overall_insights": ["insight1", "insight2"],',
-        '  "suggestions": ["next-step suggestion 1", "suggestion 2"]',
-        "}",
+        'Return ONLY JSON: {"summary": "<=2 sentences", "key_points": ["..."], "action_items": ["..."]}',
     ]
-    prompt = "\n".join(prompt_lines)
+    return "\n".join(lines)
 
-    messages = [{
-        "role": "user",
-        "content": prompt,
-    }]
+def _reduce_prompt(channels: List[Dict[str, Any]]) -> str:
+    return "\n".join([
+        "You are the Cow Assistant.",
+        "Combine these per-channel Slack summaries into overall insights and actionable next steps.",
+        "",
+        json.dumps(channels),
+        "",
+        'Return ONLY JSON: {"overall_insights": ["..."], "suggestions": ["..."]}',
+    ])
 
-    max_turns = 10
-    for _ in range(max_turns):
-        response = client.messages.create(
-            model="claude-sonnet-4-5-20250929",
-            max_tokens=4096,
-            messages=messages,
-            tools=TOOLS
+async def _summarize_channel(client: Anthropic, channel: Dict[str, Any], messages: List[Dict[str, Any]],
+                             oldest_ts: str, hours: int) -> Dict[str, Any]:
+    """Map step for one channel, reusing the cached summary when nothing changed."""
+    channel_id = channel.get("id", "")
+    with tracing.span("slack_map", channel=channel.get("name") or channel_id, messages=len(messages)):
+        summary = await _map_channel(client, channel, messages, oldest_ts, hours)
+    return {"id": channel_id, "name": channel.get("name"), **summary}
+
+async def _map_channel(client: Anthropic, channel: Dict[str, Any], messages: List[Dict[str, Any]],
+                       oldest_ts: str, hours: int) -> Dict[str, Any]:
+    channel_id = channel.get("id", "")
+    latest_ts = max((_activity_ts(m) for m in messages), key=float)
+    cached = slack_summary_cache.get_summary(channel_id)
+    if cached and not slack_summary_cache.matches_window(cached, oldest_ts, hours * 3600):
+        cached = None  # built for another window: its content doesn't apply
+    hit = bool(cached and cached.summary and float(cached.latest_ts) >= float(latest_ts))
+    metrics.cache("slack_summary", hit)
+    tracing.current().set(cached=hit)
+    if hit:
+        summary = cached.summary
+    else:
+        prior = None
+        window_start = oldest_ts
+        if cached and cached.summary:
+            # Only the messages the cached summary has not seen yet; the entry
+            # keeps its window start so drift retires it (see slack_summary_cache)
+            prior = cached.summary
+            messages = _newer_than(messages, cached.latest_ts)
+            window_start = cached.oldest_ts
+        response = await asyncio.to_thread(
+            _create_message, client, "slack_map",
+            [{"role": "user", "content": _map_prompt(channel, messages, prior)}],
+            max_tokens=600,
         )
+        data = _response_json(response) or {}
+        summary = {
+            "summary": data.get("summary", ""),
+            "key_points": data.get("key_points", []),
+            "action_items": data.get("action_items", []),
+        }
+        slack_summary_cache.put_summary(channel_id, latest_ts, summary, window_start)
+    return summary
 
-        if response.stop_reason == "end_turn":
-            for block in response.content:
-                if block.type == "text":
-                    try:
-                        data = json.loads(block.text)
-                        return data
-                    except json.JSONDecodeError:
-                        import re
-                        m = re.search(r'\{.*\}', block.text, re.DOTALL)
-                        if m:
-                            return json.loads(m.group())
-            return {"channels": [], "overall_insights": [], "suggestions": []}
+async def summarize_slack_with_mcp(api_key: str, hours: int = 24, max_channels: int = 5, messages_per_channel: int = 100) -> Dict[str, Any]:
+    """
+    Map-reduce Slack summary: fetch recent messages for the most active
+    conversations (preselected from the channel activity index), summarize each channel concurrently with a fast model
+    (cached per channel by window and latest message ts), then combine the channel
+    summaries into overall insights and suggestions.
+    """
+    with tracing.span("slack_summary", hours=hours, max_channels=max_channels,
+                      messages_per_channel=messages_per_channel) as span:
+        result = await _summarize_slack(api_key, hours, max_channels, messages_per_channel)
+        span.set(channels=len(result["channels"]))
+        return result
 
-        if response.stop_reason == "tool_use":
-            messages.append({"role": "assistant", "content": response.content})
-            tool_results = []
-            for block in response.content:
-                if block.type == "tool_use":
-                    try:
-                        result = await call_tool(block.name, block.input)
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block.id,
-                            "content": json.dumps(result)
-                        })
-                    except Exception as e:
-                        tool_results.append({
-                            "type": "tool_result",
-                            "tool_use_id": block.id,
-                            "content": f"Error: {str(e)}",
-                            "is_error": True
-                        })
-            messages.append({"role": "user", "content": tool_results})
-        else:
-            break
+async def _summarize_slack(api_key: str, hours: int, max_channels: int, messages_per_channel: int) -> Dict[str, Any]:
+    client = Anthropic(api_key=api_key)
+    oldest_ts = f"{time.time() - hours * 3600:.6f}"
 
-    return {"channels": [], "overall_insights": [], "suggestions": []}
+    # Preselect from the activity index; fetching them also refreshes their counters
+    ranked = (await call_tool("slack_top_channels", {"k": max_channels * 2})).payload({})
+    candidates = [c for c in (ranked.get("channels") or []) if c.get("id")]
+
+    fetched = await asyncio.gather(*(
+        call_tool("slack_fetch_messages", {"channel_id": c["id"], "oldest_ts": oldest_ts, "limit": messages_per_channel})
+        for c in candidates
+    ))
+    active = []
+    for channel, result in zip(candidates, fetched):
+        msgs = [m for m in (result.payload({}).get("messages") or []) if m.get("ts")]
+        if msgs:
+            active.append((channel, msgs))
+    # Busiest conversations in the window first
+    active.sort(key=lambda cm: len(cm[1]), reverse=True)
+    active = active[:max_channels]
+    if not active:
+        return {"channels": [], "overall_insights": [], "suggestions": []}
+
+    channels = await asyncio.gather(*(_summarize_channel(client, ch, msgs, oldest_ts, hours) for ch, msgs in active))
+
+    response = await asyncio.to_thread(
+        _create_message, client, "slack_summary",
+        [{"role": "user", "content": _reduce_prompt(list(channels))}],
+        max_tokens=1024,
+    )
+    data = _response_json(response) or {}
+    return {
+        "channels": list(channels),
+        "overall_insights": data.get("overall_insights", []),
+        "suggestions": data.get("suggestions", []),
+    }
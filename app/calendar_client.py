@@ -1,14 +1,24 @@
 from datetime import datetime, timedelta
 from typing import Dict, Any
+import os
 from google.oauth2.credentials import Credentials
 from googleapiclient.discovery import build
 from sqlmodel import select
 
+from . import metrics
+
 SCOPES = ["https://www.googleapis.com/auth/calendar.readonly"]
+# Full base URL of the Calendar API (e.g. a local fake: http://127.0.0.1:8789/); default is Google's
+CALENDAR_BASE_URL = os.getenv("GOOGLE_CALENDAR_BASE_URL", "")
 
 def build_calendar(tokens: dict):
     creds = Credentials.from_authorized_user_info(tokens, SCOPES)
-    return build("calendar", "v3", credentials=creds)
+    options = {"api_endpoint": CALENDAR_BASE_URL} if CALENDAR_BASE_URL else None
+    return build("calendar", "v3", credentials=creds, client_options=options)
+
+def _execute(request, method: str):
+    with metrics.upstream("google", method):
+        return request.execute()
 
 def today_window():
     # Use timezone-aware datetime to match local calendar view
@@ -20,13 +30,13 @@ def today_window():
 def get_today_events(tokens: dict):
     cal = build_calendar(tokens)
     start, end = today_window()
-    res = cal.events().list(
+    res = _execute(cal.events().list(
         calendarId="primary",
         singleEvents=True,
         orderBy="startTime",
         timeMin=start.isoformat(),  # Already has timezone, don't add 'Z'
         timeMax=end.isoformat(),    # Already has timezone, don't add 'Z'
-    ).execute()
+    ), "events.list")
     items = res.get("items", [])
     events = []
     for e in items:
@@ -41,10 +51,6 @@ def get_today_events(tokens: dict):
             "end": end_ts
         })
 
-    print(f"Fetched {len(events)} events from Google Calendar:")
-    for e in events:
-        print(" -", e["title"], e["start"], "→", e["end"])
-
     return events
 
 def who_am_i(tokens: dict) -> str:
@@ -52,7 +58,7 @@ def who_am_i(tokens: dict) -> str:
     Returns the user's email (the primary calendar ID) using the Calendar API.
     """
     cal = build_calendar(tokens)
-    me = cal.calendars().get(calendarId="primary").execute()
+    me = _execute(cal.calendars().get(calendarId="primary"), "calendars.get")
     return me.get("id") or me.get("summary") or ""
 
 def get_past_events_today(tokens: dict):
@@ -65,13 +71,13 @@ def get_past_events_today(tokens: dict):
     start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     end = start + timedelta(days=1)
 
-    res = cal.events().list(
+    res = _execute(cal.events().list(
         calendarId="primary",
         singleEvents=True,
         orderBy="startTime",
         timeMin=start.isoformat(),
         timeMax=end.isoformat(),
-    ).execute()
+    ), "events.list")
 
     def parse(ts: str) -> datetime:
         if ts.endswith("Z"):
@@ -108,13 +114,13 @@ def percent_done_completed_only(tokens: Dict[str, Any]) -> int:
     start = now.replace(hour=0, minute=0, second=0, microsecond=0)
     end = start + timedelta(days=1)
 
-    res = cal.events().list(
+    res = _execute(cal.events().list(
         calendarId="primary",
         singleEvents=True,
         orderBy="startTime",
         timeMin=start.isoformat(), # tz-aware RFC3339
         timeMax=end.isoformat(),
-    ).execute()
+    ), "events.list")
 
     def parse(ts: str) -> datetime:
         # handle trailing 'Z' and offsets
@@ -148,16 +154,18 @@ def percent_done_completed_only(tokens: Dict[str, Any]) -> int:
     pct = int(round(100 * done_secs / total_secs))
     return max(0, min(100, pct))
 
-def percent_done_from_user_input(user_id: int, tokens: dict, session) -> int:
+def percent_done_from_user_input(user_id: int, tokens: dict, session, past_events=None) -> int:
     """
     Calculate completion % based on user's manual yes/no responses.
     Returns percentage of past events that user marked as completed.
+    Pass `past_events` when they are already known (e.g. from the snapshot).
     """
     from datetime import date
     from .model import EventCompletion
     
     # Get all past events from calendar
-    past_events = get_past_events_today(tokens)
+    if past_events is None:
+        past_events = get_past_events_today(tokens)
     
     if not past_events:
         return 0
@@ -0,0 +1,67 @@
+"""
+Per-user snapshot of today's calendar in SQLite.
+
+One Google call fetches all of today's timed events; which of them are "past"
+is worked out at read time from their end times, so a snapshot only goes
+stale when events are added, moved or deleted. Reads use it while it is
+younger than CALENDAR_SNAPSHOT_MAX_AGE and fetch live otherwise. The
+scheduler (app/scheduler.py) keeps it fresh ahead of requests.
+"""
+from __future__ import annotations
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+import os, time
+
+from sqlmodel import Session
+
+from . import metrics
+from .calendar_client import get_today_events
+from .model import CalendarSnapshot
+from .settings import engine
+
+MAX_AGE = float(os.getenv("CALENDAR_SNAPSHOT_MAX_AGE", "900"))
+
+
+def refresh(user_id: int, tokens: dict) -> List[Dict[str, Any]]:
+    """Fetch today's events from Google and store them."""
+    events = get_today_events(tokens)
+    with Session(engine) as s:
+        row = s.get(CalendarSnapshot, (user_id, date.today()))
+        if not row:
+            row = CalendarSnapshot(user_id=user_id, day=date.today())
+        row.events = events
+        row.fetched_at = time.time()
+        s.add(row)
+        s.commit()
+    return events
+
+
+def cached_events(user_id: int, max_age: float = MAX_AGE) -> Optional[List[Dict[str, Any]]]:
+    """Today's stored events, or None if there is no snapshot younger than max_age."""
+    with Session(engine) as s:
+        row = s.get(CalendarSnapshot, (user_id, date.today()))
+    if not row or time.time() - row.fetched_at > max_age:
+        return None
+    return row.events or []
+
+
+def today_events(user_id: int, tokens: dict) -> List[Dict[str, Any]]:
+    events = cached_events(user_id)
+    metrics.cache("calendar_snapshot", events is not None)
+    return events if events is not None else refresh(user_id, tokens)
+
+
+def _parse(ts: str, tz) -> datetime:
+    if ts.endswith("Z"):
+        ts = ts[:-1] + "+00:00"
+    return datetime.fromisoformat(ts).astimezone(tz)
+
+
+def past_events(events: List[Dict[str, Any]], now: Optional[datetime] = None) -> List[Dict[str, Any]]:
+    """The events that have ended by `now` (same shape as get_past_events_today)."""
+    now = now or datetime.now().astimezone()
+    return [e for e in events if _parse(e["end"], now.tzinfo) <= now]
+
+
+def past_events_today(user_id: int, tokens: dict) -> List[Dict[str, Any]]:
+    return past_events(today_events(user_id, tokens))
@@ -0,0 +1,150 @@
+"""
+In-memory credential provider for the tool servers.
+
+Google and Slack tokens are read from the DB once and served from memory;
+the OAuth callbacks call `invalidate()` after storing new tokens, which
+reloads them and bumps a shared generation. A background thread watches
+that generation every SHARED_CHECK_SECONDS (so other worker processes reload
+too) and refreshes the Google access token GOOGLE_REFRESH_MARGIN seconds
+before it expires (writing it back with its expiry). Once started, tool
+calls neither open a DB session nor refresh a token inline.
+"""
+from __future__ import annotations
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+import os, threading, time
+
+from google.auth.transport.requests import Request as GoogleRequest
+from google.oauth2.credentials import Credentials
+from sqlmodel import Session, select
+
+from . import shared_state
+from .model import User
+from .settings import engine
+
+REFRESH_MARGIN = int(os.getenv("GOOGLE_REFRESH_MARGIN", "300"))
+CHECK_SECONDS = 60
+SHARED_CHECK_SECONDS = float(os.getenv("SHARED_CHECK_SECONDS", "1"))
+GENERATION = "credentials"
+EXPIRY_FORMAT = "%Y-%m-%dT%H:%M:%SZ"  # what Credentials.from_authorized_user_info parses
+
+
+def token_expiry(creds: Credentials) -> Optional[str]:
+    return creds.expiry.strftime(EXPIRY_FORMAT) if creds.expiry else None
+
+
+class CredentialProvider:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._generation = 0
+        self._user_id: Optional[int] = None
+        self._google: Optional[Dict[str, Any]] = None
+        self._slack: Optional[Dict[str, Any]] = None
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _load(self) -> None:
+        self._generation = shared_state.generation(GENERATION)
+        with Session(engine) as s:
+            user = s.exec(select(User)).first()
+            self._user_id = user.id if user else None
+            self._google = dict(user.google_tokens) if user and user.google_tokens else None
+            self._slack = dict(user.slack_tokens) if user and user.slack_tokens else None
+        self._loaded = True
+
+    def _ensure_loaded(self) -> None:
+        # Only before start() (or a first access racing it); afterwards the
+        # background thread keeps the tokens current
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    self._load()
+
+    def _check_generation(self) -> None:
+        """Load, or reload if another worker stored new tokens (background thread only)."""
+        if not self._loaded or shared_state.generation(GENERATION) != self._generation:
+            with self._lock:
+                self._load()
+
+    def invalidate(self) -> None:
+        """Reload the tokens here and make every other worker reload them (call off the event loop)."""
+        shared_state.bump(GENERATION)
+        with self._lock:
+            self._load()
+
+    def slack_token(self) -> str:
+        self._ensure_loaded()
+        tokens = self._slack
+        if not tokens:
+            raise RuntimeError("No Slack authenticated user found")
+        token = tokens.get("access_token")
+        if not token:
+            raise RuntimeError("Slack access token missing")
+        return token
+
+    def google_tokens(self) -> Optional[Dict[str, Any]]:
+        """Authorized-user info for Credentials, or None when Google isn't connected."""
+        self._ensure_loaded()
+        return self._google
+
+    def _needs_refresh(self, tokens: Dict[str, Any]) -> bool:
+        if not tokens.get("refresh_token"):
+            return False
+        expiry = tokens.get("expiry")
+        if not expiry:
+            return True  # tokens stored before expiry was tracked: refresh once to learn it
+        expires_at = datetime.strptime(expiry, EXPIRY_FORMAT)
+        return expires_at - datetime.utcnow() < timedelta(seconds=REFRESH_MARGIN)
+
+    def refresh_google(self, force: bool = False) -> bool:
+        """Refresh the Google access token if it is (about to be) expired; returns True if refreshed."""
+        self._ensure_loaded()
+        with self._refresh_lock:
+            tokens = self._google
+            if not tokens or not (force or self._needs_refresh(tokens)):
+                return False
+            creds = Credentials.from_authorized_user_info(tokens, tokens.get("scopes") or None)
+            creds.refresh(GoogleRequest())
+            updated = {**tokens, "token": creds.token, "expiry": token_expiry(creds)}
+            with Session(engine) as s:
+                user = s.get(User, self._user_id) if self._user_id else None
+                if user:
+                    user.google_tokens = updated
+                    s.add(user)
+                    s.commit()
+            with self._lock:
+                self._google = updated
+            shared_state.bump(GENERATION)
+            return True
+
+    def start(self) -> None:
+        """Background refresher (daemon thread)."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def run():
+            refreshed_at = 0.0
+            while not self._stop.is_set():
+                try:
+                    self._check_generation()
+                except Exception as e:
+                    print("Credential reload failed:", repr(e))
+                if time.monotonic() - refreshed_at >= CHECK_SECONDS:
+                    refreshed_at = time.monotonic()
+                    try:
+                        self.refresh_google()
+                    except Exception as e:
+                        print("Google token refresh failed:", repr(e))
+                self._stop.wait(SHARED_CHECK_SECONDS)
+
+        self._thread = threading.Thread(target=run, daemon=True, name="credential-refresh")
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+credentials = CredentialProvider()
@@ -0,0 +1,235 @@
+"""
+Opt-in event-loop blocking detector (LOOP_MONITOR=1), served at /debug/loop.
+
+Three parts, all aggregated in memory:
+  * heartbeat: a task that sleeps LOOP_MONITOR_INTERVAL_MS and measures how late
+    it wakes up. That lateness is the loop lag (cow_event_loop_lag_seconds).
+  * watchdog: a thread that notices when the heartbeat is more than
+    LOOP_LAG_THRESHOLD_MS late and samples the loop thread's stack
+    (sys._current_frames) while the stall lasts. Samples are grouped by call
+    site: the innermost frame in this repo (the line that made the blocking
+    call), together with the innermost frame overall (where it was blocked:
+    sqlite3, ssl, socket...).
+  * slow callbacks: every loop callback is timed (asyncio's Handle._run is
+    wrapped while the monitor runs), and the ones over the threshold are
+    counted per coroutine.
+
+A site's stall_ms adds up the stalls it was caught in (a stall that moved
+between sites counts for each), samples says how often it was on the stack.
+Benchmarks read and reset it between runs (bench/bench_load.py --loop-monitor).
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio, os, sys, threading, time, traceback
+
+from . import metrics
+
+ENABLED = os.getenv("LOOP_MONITOR", "0") not in ("0", "false", "no", "")
+THRESHOLD = float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100")) / 1000
+INTERVAL = float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "20")) / 1000
+STACK_DEPTH = 12
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_SELF = os.path.abspath(__file__)
+
+
+def _in_repo(filename: str) -> bool:
+    return filename.startswith(ROOT) and "site-packages" not in filename and filename != _SELF
+
+
+def _short(filename: str) -> str:
+    return os.path.relpath(filename, ROOT) if filename.startswith(ROOT) else filename
+
+
+def _where(fs: traceback.FrameSummary) -> str:
+    return f"{_short(fs.filename)}:{fs.lineno} {fs.name}"
+
+
+def _describe_callback(handle: asyncio.Handle) -> str:
+    cb = handle._callback
+    task = getattr(cb, "__self__", None)
+    if isinstance(task, asyncio.Task):
+        code = getattr(task.get_coro(), "cr_code", None)
+        if code is not None:
+            return f"task {code.co_name} ({_short(code.co_filename)}:{code.co_firstlineno})"
+        return f"task {task.get_name()}"
+    return getattr(cb, "__qualname__", None) or repr(cb)
+
+
+class _Site:
+    __slots__ = ("site", "blocked_in", "stalls", "samples", "stall_ms", "max_stall_ms", "last_seen", "stack")
+
+    def __init__(self, site: str, blocked_in: str, stack: List[str]):
+        self.site = site
+        self.blocked_in = blocked_in
+        self.stalls = 0
+        self.samples = 0
+        self.stall_ms = 0.0
+        self.max_stall_ms = 0.0
+        self.last_seen = 0.0
+        self.stack = stack
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "site": self.site,
+            "blocked_in": self.blocked_in,
+            "stalls": self.stalls,
+            "samples": self.samples,
+            "stall_ms": round(self.stall_ms, 1),
+            "max_stall_ms": round(self.max_stall_ms, 1),
+            "last_seen": self.last_seen,
+            "stack": self.stack,
+        }
+
+
+class LoopMonitor:
+    def __init__(self, threshold: float = THRESHOLD, interval: float = INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._orig_run = None
+        self._beat = 0.0  # monotonic time the heartbeat last ran
+        self.reset()
+
+    @property
+    def running(self) -> bool:
+        return self._loop is not None
+
+    def reset(self) -> None:
+        with self._lock:
+            self._sites: Dict[Tuple[str, str], _Site] = {}
+            self._callbacks: Dict[str, List[float]] = {}  # name -> [count, total s, max s]
+            self._lag_max = 0.0
+            self._stalls = 0
+            self._stall_sites: List[Tuple[str, str]] = []  # sites sampled during the current stall
+            self._since = time.time()
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> bool:
+        """Call on the loop's thread (app startup)."""
+        if not ENABLED or self.running:
+            return False
+        self._loop = loop
+        self._thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = loop.create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        self._patch_handles()
+        return True
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+        if self._orig_run is not None:
+            asyncio.events.Handle._run = self._orig_run
+            self._orig_run = None
+        self._loop = self._task = self._watchdog = None
+
+    # heartbeat (on the loop)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            expected = time.monotonic() + self.interval
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            lag = max(0.0, now - expected)
+            self._beat = now
+            metrics.loop_lag.observe(lag)
+            with self._lock:
+                self._lag_max = max(self._lag_max, lag)
+                if self._stall_sites:
+                    for key in set(self._stall_sites):
+                        site = self._sites.get(key)
+                        if site is None:
+                            continue  # reset mid-stall
+                        site.stall_ms += lag * 1000
+                        site.max_stall_ms = max(site.max_stall_ms, lag * 1000)
+                    self._stall_sites = []
+
+    # watchdog (its own thread)
+
+    def _watch(self) -> None:
+        stalled_beat = None
+        while not self._stop.wait(self.interval):
+            beat = self._beat
+            if time.monotonic() - beat <= self.interval + self.threshold:
+                continue
+            frame = sys._current_frames().get(self._thread_id)
+            if frame is None:
+                continue
+            self._sample(traceback.extract_stack(frame), new_stall=beat != stalled_beat)
+            stalled_beat = beat
+
+    def _sample(self, stack: traceback.StackSummary, new_stall: bool) -> None:
+        own = [fs for fs in stack if _in_repo(fs.filename)]
+        site = _where(own[-1]) if own else "(outside the app)"
+        blocked_in = _where(stack[-1]) if stack else ""
+        key = (site, blocked_in)
+        with self._lock:
+            entry = self._sites.get(key)
+            if entry is None:
+                frames = [_where(fs) for fs in stack if fs.filename != _SELF]
+                entry = self._sites[key] = _Site(site, blocked_in, frames[-STACK_DEPTH:])
+            entry.samples += 1
+            entry.last_seen = time.time()
+            if new_stall:
+                self._stalls += 1
+            if key not in self._stall_sites:
+                entry.stalls += 1
+                self._stall_sites.append(key)
+
+    # slow callbacks
+
+    def _patch_handles(self) -> None:
+        orig = self._orig_run = asyncio.events.Handle._run
+        monitor = self
+
+        def _run(handle):
+            if threading.get_ident() != monitor._thread_id:
+                return orig(handle)
+            t = time.perf_counter()
+            try:
+                return orig(handle)
+            finally:
+                elapsed = time.perf_counter() - t
+                if elapsed >= monitor.threshold:
+                    monitor._slow_callback(_describe_callback(handle), elapsed)
+
+        asyncio.events.Handle._run = _run
+
+    def _slow_callback(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._callbacks.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            sites = sorted(self._sites.values(), key=lambda s: s.stall_ms, reverse=True)
+            callbacks = sorted(self._callbacks.items(), key=lambda kv: kv[1][1], reverse=True)
+            return {
+                "enabled": self.running,
+                "threshold_ms": self.threshold * 1000,
+                "interval_ms": self.interval * 1000,
+                "since": self._since,
+                "stalls": self._stalls,
+                "max_lag_ms": round(self._lag_max * 1000, 1),
+                "sites": [s.to_dict() for s in sites],
+                "slow_callbacks": [
+                    {"callback": name, "count": int(c), "total_ms": round(total * 1000, 1), "max_ms": round(mx * 1000, 1)}
+                    for name, (c, total, mx) in callbacks
+                ],
+            }
+
+
+monitor = LoopMonitor()
@@ -1,33 +1,40 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, Response, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from sqlmodel import SQLModel, Session, select
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from pydantic import BaseModel
 from google_auth_oauthlib.flow import Flow
-import requests, secrets
+import asyncio, json, requests
 from urllib.parse import urlencode
 from .brain_mcp import (
     decide_mood_with_mcp,
     summarize_slack_with_mcp,
     slack_list_conversations as mcp_slack_list_conversations,
     slack_fetch_messages as mcp_slack_fetch_messages,
+    slack_search_messages as mcp_slack_search_messages,
 )
 from datetime import date
-from anthropic import Anthropic
 
 from .model import User, DaySummary, EventCompletion
+from . import calendar_snapshot, metrics, notion_client, notion_mirror, notion_writer, oauth_state, slack_client, slack_store, tracing
+from .credentials import credentials, token_expiry
+from .file_lock import FileLock
+from .loop_monitor import monitor as loop_monitor
+from .scheduler import prewarmer
+from .timing import ServerTiming
+from .singleflight import SingleFlight, ThreadSingleFlight
+from .status_hub import hub as status_hub
 from .settings import settings, engine
+from .model_registry import registry as model_registry, ROUTES as MODEL_ROUTES
 from .calendar_client import (
     who_am_i, 
     percent_done_completed_only,
-    get_past_events_today,
     percent_done_from_user_input
 )
 from .notion_client import (
     list_databases as notion_list_databases,
-    query_database as notion_query_database,
     get_page as notion_get_page,
-    append_blocks as notion_append_blocks,
 )
 
 # create app
@@ -41,19 +48,52 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization"],
+    expose_headers=["Server-Timing"],
 )
+app.add_middleware(metrics.MetricsMiddleware)
+app.add_middleware(tracing.TracingMiddleware)
+
+# Per-user coalescing of the expensive refresh pipelines
+mood_refresh_flight = SingleFlight(settings.REFRESH_MIN_INTERVAL, name="mood_refresh")
+slack_summary_flight = SingleFlight(settings.SLACK_SUMMARY_MIN_INTERVAL, name="slack_summarize")
+past_events_flight = ThreadSingleFlight(settings.REFRESH_MIN_INTERVAL, name="past_events")
 
 # lifestyle
 @app.on_event("startup")
 def on_start():
-    SQLModel.metadata.create_all(engine)
-    with engine.begin() as conn:
-        cols = conn.exec_driver_sql("PRAGMA table_info('user')").fetchall()
-        names = [c[1] for c in cols]
-        if 'slack_tokens' not in names:
-            conn.exec_driver_sql("ALTER TABLE user ADD COLUMN slack_tokens TEXT")
+    # Workers start together: one at a time through the schema setup
+    with FileLock(f"{settings.DB_PATH}.lock"):
+        SQLModel.metadata.create_all(engine)
+        with engine.begin() as conn:
+            cols = conn.exec_driver_sql("PRAGMA table_info('user')").fetchall()
+            names = [c[1] for c in cols]
+            if 'slack_tokens' not in names:
+                conn.exec_driver_sql("ALTER TABLE user ADD COLUMN slack_tokens TEXT")
+            cols = conn.exec_driver_sql("PRAGMA table_info('slackchannelsummary')").fetchall()
+            if 'oldest_ts' not in [c[1] for c in cols]:
+                conn.exec_driver_sql("ALTER TABLE slackchannelsummary ADD COLUMN oldest_ts VARCHAR")
+        slack_store.init_search_index()
+    model_registry.start(settings.ANTHROPIC_API_KEY)
+    credentials.start()
+    prewarmer.start(asyncio.get_running_loop(), _prewarm_mood)
+    loop_monitor.start(asyncio.get_running_loop())
+
+@app.on_event("shutdown")
+async def on_stop():
+    loop_monitor.stop()
+    prewarmer.stop()
+    status_hub.close()
+    credentials.stop()
+    await slack_client.close()
+    await notion_client.close()
+    tracing.close()
 
 # routes
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics_endpoint():
+    """Prometheus text exposition of this worker's metrics."""
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/auth/whoami")
 def auth_whoami():
     with Session(engine) as s:
@@ -63,6 +103,33 @@ def auth_whoami():
         email = who_am_i(user.google_tokens)
         return {"authed": True, "email": email}
 
+@app.get("/debug/traces")
+def debug_traces(limit: int = 20, format: str = "json"):
+    """The last traces, newest first: JSON, or format=waterfall for a text view."""
+    traces = tracing.recent(limit)
+    if format == "waterfall":
+        return PlainTextResponse("\n\n".join(tracing.waterfall(t) for t in traces) + "\n")
+    return {"traces": [t.to_dict() for t in traces]}
+
+@app.get("/debug/traces/{trace_id}")
+def debug_trace(trace_id: str, format: str = "json"):
+    trace = tracing.get(trace_id)
+    if not trace:
+        raise HTTPException(status_code=404, detail="Trace not found (only the last few are kept)")
+    if format == "waterfall":
+        return PlainTextResponse(tracing.waterfall(trace) + "\n")
+    return trace.to_dict()
+
+@app.get("/debug/loop")
+def debug_loop():
+    """Event-loop stalls by call site and slow callbacks (start with LOOP_MONITOR=1)."""
+    return loop_monitor.report()
+
+@app.post("/debug/loop/reset")
+def debug_loop_reset():
+    loop_monitor.reset()
+    return {"ok": True}
+
 @app.get("/debug/calendar")
 def debug_calendar():
     """Debug endpoint - shows raw calendar data like test_calendar.py"""
@@ -119,27 +186,62 @@ def debug_calendar():
 
 @app.get("/status")
 def status():
-    from datetime import date
     with Session(engine) as s:
         user = s.exec(select(User)).first()
         if not user:
             return {"authed": False}
-        today = s.exec(
-            select(DaySummary).where(
-                DaySummary.user_id == user.id,
-                DaySummary.day == date.today()
-            )
-        ).first()
         return {
             "authed": user.google_tokens is not None,
-            "today": {
-                "percent_done": today.percent_done if today else 0,
-                "mood": today.mood if today else "low",
-                "message": today.message if today else "Let’s start the day ",
-                "milk_points": today.milk_points if today else 0,
-            },
+            "today": _today_status(s, user.id),
         }
 
+def _today_status(s: Session, user_id: int) -> Dict[str, Any]:
+    today = s.exec(
+        select(DaySummary).where(
+            DaySummary.user_id == user_id,
+            DaySummary.day == date.today()
+        )
+    ).first()
+    return {
+        "percent_done": today.percent_done if today else 0,
+        "mood": today.mood if today else "low",
+        "message": today.message if today else "Let’s start the day ",
+        "milk_points": today.milk_points if today else 0,
+    }
+
+def _today_completions(s: Session, user_id: int) -> Dict[str, bool]:
+    rows = s.exec(
+        select(EventCompletion).where(
+            EventCompletion.user_id == user_id,
+            EventCompletion.day == date.today()
+        )
+    ).all()
+    return {r.event_id: r.completed for r in rows}
+
+def _live_status(user_id: int) -> Dict[str, Any]:
+    with Session(engine) as s:
+        return {**_today_status(s, user_id), "completions": _today_completions(s, user_id)}
+
+status_hub.loader = _live_status
+
+@app.get("/status/stream")
+def status_stream():
+    """
+    Server-Sent Events: the current status, then a delta whenever today's
+    summary or an event completion is written. Replaces polling /status.
+    """
+    with Session(engine) as s:
+        user = s.exec(select(User)).first()
+        if not user:
+            raise HTTPException(status_code=401, detail="No user found")
+        user_id = user.id
+    snapshot = _live_status(user_id)
+    return StreamingResponse(
+        status_hub.stream(user_id, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 CLIENT_CONFIG = {
     "installed": {
         "client_id": settings.GOOGLE_CLIENT_ID,
@@ -159,6 +261,7 @@ SLACK_USER_SCOPES = [
     "groups:history",
     "im:history",
     "mpim:history",
+    "users:read",
 ]
 
 @app.get("/auth/google/start")
@@ -173,12 +276,12 @@ def google_start():
         include_granted_scopes="true",
         prompt="consent",
     )
-    app.state.oauth_state = state
+    oauth_state.issue("google", state)
     return {"auth_url": auth_url}
 
 @app.get("/auth/google/callback")
 def google_callback(request: Request, code: str, state: str):
-    if state != getattr(app.state, "oauth_state", None):
+    if not oauth_state.consume("google", state):
         raise HTTPException(status_code=400, detail="State mismatch")
 
     flow = Flow.from_client_config(
@@ -196,6 +299,7 @@ def google_callback(request: Request, code: str, state: str):
         "client_id": creds.client_id,
         "client_secret": getattr(creds, "client_secret", None),
         "scopes": list(creds.scopes) if getattr(creds, "scopes", None) else [],
+        "expiry": token_expiry(creds),
     }
 
     with Session(engine) as s:
@@ -205,6 +309,7 @@ def google_callback(request: Request, code: str, state: str):
         user.google_tokens = tokens
         s.add(user)
         s.commit()
+    credentials.invalidate()
 
     return "Google connected. You can close this tab."
 
@@ -215,15 +320,13 @@ def slack_start():
         "redirect_uri": settings.SLACK_REDIRECT_URI,
         "user_scope": ",".join(SLACK_USER_SCOPES),
     }
-    state = secrets.token_urlsafe(16)
-    app.state.slack_oauth_state = state
-    params["state"] = state
+    params["state"] = oauth_state.issue("slack")
     auth_url = f"https://slack.com/oauth/v2/authorize?{urlencode(params)}"
     return {"auth_url": auth_url}
 
 @app.get("/auth/slack/callback")
 def slack_callback(request: Request, code: str, state: str):
-    if state != getattr(app.state, "slack_oauth_state", None):
+    if not oauth_state.consume("slack", state):
         raise HTTPException(status_code=400, detail="State mismatch")
     data = {
         "client_id": settings.SLACK_CLIENT_ID,
@@ -231,7 +334,8 @@ def slack_callback(request: Request, code: str, state: str):
         "code": code,
         "redirect_uri": settings.SLACK_REDIRECT_URI,
     }
-    resp = requests.post("https://slack.com/api/oauth.v2.access", data=data)
+    with metrics.upstream("slack", "oauth.v2.access"):
+        resp = requests.post(f"{slack_client.SLACK_API_URL}oauth.v2.access", data=data)
     body = resp.json()
     if not body.get("ok"):
         raise HTTPException(status_code=400, detail=f"Slack OAuth failed: {body.get('error', 'unknown')}")
@@ -252,6 +356,7 @@ def slack_callback(request: Request, code: str, state: str):
         user.slack_tokens = tokens
         s.add(user)
         s.commit()
+    credentials.invalidate()
     return "Slack connected. You can close this tab."
 
 class NotionQueryBody(BaseModel):
@@ -260,6 +365,8 @@ class NotionQueryBody(BaseModel):
     sorts: Optional[List[Dict[str, Any]]] = None
     page_size: int = 25
     start_cursor: Optional[str] = None
+    filter_properties: Optional[List[str]] = None  # property ids/names to return
+    stream: bool = False  # NDJSON, one row per line, following next_cursor server-side
 
 class NotionAppendBody(BaseModel):
     block_id: str
@@ -275,22 +382,49 @@ def api_notion_databases(query: Optional[str] = None, page_size: int = 10):
     return notion_list_databases(query=query, page_size=page_size)
 
 @app.post("/notion/query")
-def api_notion_query(body: NotionQueryBody):
-    return notion_query_database(
-        database_id=body.database_id,
-        filter=body.filter,
-        sorts=body.sorts,
-        page_size=body.page_size,
-        start_cursor=body.start_cursor,
-    )
+async def api_notion_query(body: NotionQueryBody):
+    if not body.stream:
+        return await notion_client.async_query_database(
+            database_id=body.database_id,
+            filter=body.filter,
+            sorts=body.sorts,
+            page_size=body.page_size,
+            start_cursor=body.start_cursor,
+            filter_properties=body.filter_properties,
+        )
+
+    async def rows():
+        try:
+            async for row in notion_client.iter_database_rows(
+                body.database_id,
+                filter=body.filter,
+                sorts=body.sorts,
+                page_size=min(max(body.page_size, 1), 100),
+                filter_properties=body.filter_properties,
+                start_cursor=body.start_cursor,
+            ):
+                yield json.dumps(row) + "\n"
+        except Exception as e:
+            # Headers are already sent; report the failure in-band as the last line
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
+@app.post("/notion/mirror/{database_id}/sync")
+async def api_notion_mirror_sync(database_id: str, full: bool = False):
+    """Pull changes into the local mirror of a database (everything when full=true)"""
+    pages = await notion_mirror.sync(database_id, full=full)
+    state = await asyncio.to_thread(notion_mirror.get_state, database_id)
+    return {"database_id": database_id, "pages_synced": pages, "watermark": state.watermark if state else None}
 
 @app.get("/notion/page/{page_id}")
 def api_notion_get_page(page_id: str):
     return notion_get_page(page_id)
 
 @app.post("/notion/append")
-def api_notion_append(body: NotionAppendBody):
-    return notion_append_blocks(body.block_id, body.children)
+async def api_notion_append(body: NotionAppendBody):
+    """Append blocks in order; any number of (nested) children, split into valid requests"""
+    return await notion_writer.append_blocks_bulk(body.block_id, body.children)
 
 @app.get("/events/today/past")
 def get_past_events():
@@ -300,7 +434,9 @@ def get_past_events():
         if not user or not user.google_tokens:
             raise HTTPException(status_code=401, detail="Not authenticated")
         
-        past_events = get_past_events_today(user.google_tokens)
+        # Google fetch shared by concurrent/recent requests; copies so the overlay below stays per-request
+        shared = past_events_flight.do(user.id, lambda: calendar_snapshot.past_events_today(user.id, user.google_tokens))
+        past_events = [dict(e) for e in shared]
         
         # Check which ones user has already marked
         today = date.today()
@@ -351,6 +487,9 @@ def mark_event_complete(body: EventCompleteBody):
             s.add(completion)
         
         s.commit()
+        # Completions change percent_done: don't serve a cached refresh
+        mood_refresh_flight.forget((user.id, False), (user.id, True))
+        status_hub.publish(user.id, {"completions": {body.event_id: body.completed}})
         return {"success": True}
 
 @app.get("/slack/conversations")
@@ -359,77 +498,74 @@ async def api_slack_conversations(types: Optional[str] = "public_channel,private
     return await mcp_slack_list_conversations(types, limit, cursor)
 
 @app.get("/slack/messages")
-async def api_slack_messages(channel_id: str, oldest_ts: Optional[str] = None, latest_ts: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None):
-    """Fetch recent messages for a Slack conversation"""
+async def api_slack_messages(channel_id: str, oldest_ts: Optional[str] = None, latest_ts: Optional[str] = None, limit: int = 100, cursor: Optional[str] = None, expand_threads: bool = True, resolve_users: bool = True, filter_noise: bool = True):
+    """Fetch recent messages for a Slack conversation (with user names and active thread replies)"""
     if not channel_id:
         raise HTTPException(status_code=400, detail="channel_id is required")
-    return await mcp_slack_fetch_messages(channel_id, oldest_ts, latest_ts, limit, cursor)
+    return await mcp_slack_fetch_messages(channel_id, oldest_ts, latest_ts, limit, cursor, expand_threads, resolve_users, filter_noise)
+
+@app.get("/slack/search")
+async def api_slack_search(q: str, channel_id: Optional[str] = None, user: Optional[str] = None, oldest_ts: Optional[str] = None, latest_ts: Optional[str] = None, limit: int = 20):
+    """Full-text search over Slack messages synced so far (BM25-ranked)"""
+    if not q.strip():
+        raise HTTPException(status_code=400, detail="q is required")
+    return await mcp_slack_search_messages(q, channel_id, user, oldest_ts, latest_ts, limit)
 
 @app.post("/slack/summarize")
 async def api_slack_summarize(body: SlackSummarizeBody):
     """Use Claude to summarize recent Slack activity and provide insights."""
     if not settings.ANTHROPIC_API_KEY:
         raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY is not configured")
-    return await summarize_slack_with_mcp(
+    key = (body.hours, body.max_channels, body.messages_per_channel)
+    return await slack_summary_flight.do(key, lambda: summarize_slack_with_mcp(
         settings.ANTHROPIC_API_KEY,
         hours=body.hours,
         max_channels=body.max_channels,
         messages_per_channel=body.messages_per_channel,
-    )
+    ))
 
 @app.get("/anthropic/models")
 def api_anthropic_models():
     if not settings.ANTHROPIC_API_KEY:
         raise HTTPException(status_code=500, detail="ANTHROPIC_API_KEY is not configured")
-    client = Anthropic(api_key=settings.ANTHROPIC_API_KEY)
     try:
-        models = client.models.list()
-        # Return the model IDs for clarity
-        return {"models": [m.id for m in models]}
+        # Re-probe so this endpoint also refreshes the routing cache
+        models = model_registry.probe(settings.ANTHROPIC_API_KEY)
+        return {
+            "models": models,
+            "routes": {route: model_registry.pick(route) for route in MODEL_ROUTES},
+        }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list models: {e}")
 
-@app.post("/mood/refresh/mcp")
-async def refresh_mood_mcp():
+def _percent_done_today(user_id: int, tokens: dict) -> int:
+    past = calendar_snapshot.past_events_today(user_id, tokens)
     with Session(engine) as s:
-        user = s.exec(select(User)).first()
-        if not user:
-            raise HTTPException(status_code=401, detail="No user found")
-
-        # Get account email for debugging
-        account_email = who_am_i(user.google_tokens)
-        
-        # Get events for debugging
-        from .calendar_client import get_today_events
-        debug_events = get_today_events(user.google_tokens)
-        
-        # Calculate % done from user's manual completions
-        pct_today = percent_done_from_user_input(user.id, user.google_tokens, s)
+        return percent_done_from_user_input(user_id, tokens, s, past_events=past)
 
-        # 2) Recent history (optional context for mood)
+def _recent_history(user_id: int) -> List[int]:
+    with Session(engine) as s:
         rows = s.exec(
             select(DaySummary)
-            .where(DaySummary.user_id == user.id)
+            .where(DaySummary.user_id == user_id)
             .order_by(DaySummary.day.desc())
             .limit(7)
         ).all()
-        hist = [r.percent_done for r in rows[::-1]]
-
-        # MCP decide mood/message (pass history; percent is ours)
-        result = await decide_mood_with_mcp(settings.ANTHROPIC_API_KEY, hist)
+        return [r.percent_done for r in rows[::-1]]
 
-        # 4) Upsert today's row
+def _upsert_day_summary(user_id: int, pct_today: int, result: Dict[str, Any]) -> DaySummary:
+    with Session(engine) as s:
         today = date.today()
         row = s.exec(
             select(DaySummary).where(
-                DaySummary.user_id == user.id,
+                DaySummary.user_id == user_id,
                 DaySummary.day == today
             )
         ).first()
 
         if not row:
             row = DaySummary(
-                user_id=user.id,
+                user_id=user_id,
                 day=today,
                 percent_done=pct_today,
                 mood=result["mood"],
@@ -445,11 +581,72 @@ async def refresh_mood_mcp():
 
         s.commit()
         s.refresh(row)
-        return {
+        status_hub.publish(user_id, {
             "percent_done": row.percent_done,
             "mood": row.mood,
             "message": row.message,
             "milk_points": row.milk_points,
-            "debug_account_email": account_email,
-            "debug_events": debug_events,
-        }
\ No newline at end of file
+        })
+        return row
+
+async def _refresh_mood(user_id: int, tokens: dict, debug: bool) -> Tuple[Dict[str, Any], str]:
+    """
+    Stages run as a small dependency graph:
+        percent (Google + completions)  ─┐
+        history (DB) ──> mood (Claude)  ─┴─> upsert
+        [debug=true] whoami, today's events (independent)
+    so latency tracks the slowest branch. Returns (body, Server-Timing).
+    """
+    timing = ServerTiming()
+
+    async def mood_branch():
+        hist = await timing.stage("history", asyncio.to_thread(_recent_history, user_id))
+        # MCP decide mood/message (pass history; percent is ours)
+        return await timing.stage("mood", decide_mood_with_mcp(settings.ANTHROPIC_API_KEY, hist))
+
+    tasks = [
+        asyncio.create_task(timing.stage("percent", asyncio.to_thread(_percent_done_today, user_id, tokens))),
+        asyncio.create_task(mood_branch()),
+    ]
+    if debug:
+        from .calendar_client import get_today_events
+        tasks += [
+            asyncio.create_task(timing.stage("whoami", asyncio.to_thread(who_am_i, tokens))),
+            asyncio.create_task(timing.stage("events", asyncio.to_thread(get_today_events, tokens))),
+        ]
+    try:
+        pct_today, result, *debug_results = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    row = await timing.stage("upsert", asyncio.to_thread(_upsert_day_summary, user_id, pct_today, result))
+    body = {
+        "percent_done": row.percent_done,
+        "mood": row.mood,
+        "message": row.message,
+        "milk_points": row.milk_points,
+    }
+    if debug:
+        body["debug_account_email"], body["debug_events"] = debug_results
+    return body, timing.header()
+
+async def _prewarm_mood(user_id: int, tokens: dict) -> None:
+    """Scheduler hook: the same pipeline (and single-flight slot) as POST /mood/refresh/mcp."""
+    await mood_refresh_flight.do((user_id, False), lambda: _refresh_mood(user_id, tokens, False))
+
+@app.post("/mood/refresh/mcp")
+async def refresh_mood_mcp(response: Response, debug: bool = False):
+    """Refresh today's mood; concurrent/recent identical requests share one run (single-flight)."""
+    with Session(engine) as s:
+        user = s.exec(select(User)).first()
+        if not user:
+            raise HTTPException(status_code=401, detail="No user found")
+        user_id, tokens = user.id, user.google_tokens
+
+    body, server_timing = await mood_refresh_flight.do(
+        (user_id, debug), lambda: _refresh_mood(user_id, tokens, debug)
+    )
+    response.headers["Server-Timing"] = server_timing
+    return dict(body)
\ No newline at end of file
@@ -0,0 +1,235 @@
+"""
+Process metrics in the Prometheus text exposition format, served at /metrics.
+
+Hand-rolled counters and histograms (no client library): a handful of
+metric families, each a dict of label values -> numbers behind one lock.
+
+  cow_http_request_duration_seconds     per route template, method and status
+  cow_upstream_request_duration_seconds per provider (google, slack, notion,
+                                        anthropic), API method and outcome
+  cow_agent_runs_total / _turns_total   model turns of the tool-using agent
+  cow_tool_calls_total, cow_tool_call_duration_seconds
+  cow_llm_tokens_total                  input/output/cache tokens per route
+  cow_cache_requests_total              hit/miss per caching layer, plus a
+                                        derived cow_cache_hit_ratio gauge
+  cow_event_loop_lag_seconds            with LOOP_MONITOR=1 (app/loop_monitor.py)
+
+Numbers are per process: with several uvicorn workers each scrape sees the
+worker that answered it.
+"""
+from __future__ import annotations
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+import threading, time
+
+from . import tracing
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _num(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def _header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_num(value)}")
+        return lines
+
+
+class Histogram(_Family):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                # per-bucket counts (last one is +Inf), sum
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t, **labels)
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            snapshot = {k: (list(v[0]), v[1]) for k, v in self._values.items()}
+        for key, (counts, total) in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _num(bound) + '"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_num(round(total, 6))}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+http_requests = Histogram(
+    "cow_http_request_duration_seconds", "Time to the response headers, per route.",
+    ("method", "route", "status"),
+)
+upstream_requests = Histogram(
+    "cow_upstream_request_duration_seconds", "Calls to external APIs.",
+    ("provider", "method", "outcome"),
+)
+agent_runs = Counter("cow_agent_runs_total", "Agent loops started.", ("agent",))
+agent_turns = Counter("cow_agent_turns_total", "Model turns taken by agent loops.", ("agent",))
+tool_calls = Counter("cow_tool_calls_total", "Tool invocations.", ("tool", "outcome"))
+tool_durations = Histogram("cow_tool_call_duration_seconds", "Tool invocation time.", ("tool",))
+llm_tokens = Counter("cow_llm_tokens_total", "Model tokens by route and kind.", ("route", "model", "kind"))
+cache_requests = Counter("cow_cache_requests_total", "Cache lookups by result.", ("cache", "result"))
+loop_lag = Histogram(
+    "cow_event_loop_lag_seconds", "How late the event loop heartbeat wakes up (LOOP_MONITOR=1).",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+FAMILIES = [http_requests, upstream_requests, agent_runs, agent_turns, tool_calls,
+            tool_durations, llm_tokens, cache_requests, loop_lag]
+
+
+@contextmanager
+def upstream(provider: str, method: str) -> Iterator[Any]:
+    """Time one external API call (works around sync and async calls alike).
+    Also a client span in the current trace, which is what it yields."""
+    t = time.perf_counter()
+    outcome = "error"
+    try:
+        with tracing.span(f"{provider} {method}", kind="client", provider=provider) as span:
+            yield span
+        outcome = "ok"
+    finally:
+        upstream_requests.observe(time.perf_counter() - t, provider=provider, method=method, outcome=outcome)
+
+
+def cache(name: str, hit: bool, count: int = 1) -> None:
+    if count:
+        cache_requests.inc(count, cache=name, result="hit" if hit else "miss")
+
+
+def record_usage(route: str, model: str, usage: Any) -> None:
+    """Token counts from a Messages API response's `usage`."""
+    if usage is None:
+        return
+    for kind, attr in (("input", "input_tokens"), ("output", "output_tokens"),
+                       ("cache_read", "cache_read_input_tokens"),
+                       ("cache_write", "cache_creation_input_tokens")):
+        value = getattr(usage, attr, None)
+        if value:
+            llm_tokens.inc(value, route=route, model=model, kind=kind)
+
+
+def _hit_ratios() -> List[str]:
+    totals: Dict[str, List[float]] = {}
+    for (name, result), value in cache_requests.values().items():
+        t = totals.setdefault(name, [0.0, 0.0])
+        t[1] += value
+        if result == "hit":
+            t[0] += value
+    lines = ["# HELP cow_cache_hit_ratio Hits over lookups since start, per cache.",
+             "# TYPE cow_cache_hit_ratio gauge"]
+    for name, (hits, total) in sorted(totals.items()):
+        lines.append(f'cow_cache_hit_ratio{{cache="{_escape(name)}"}} {_num(round(hits / total, 4))}')
+    return lines
+
+
+def render() -> str:
+    lines: List[str] = []
+    for family in FAMILIES:
+        lines += family.render()
+    lines += _hit_ratios()
+    return "\n".join(lines) + "\n"
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request up to its response headers
+    (so a long-lived stream counts its setup, not its lifetime)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        t = time.perf_counter()
+        recorded = False
+
+        def record(status: int) -> None:
+            nonlocal recorded
+            recorded = True
+            route = scope.get("route")
+            http_requests.observe(
+                time.perf_counter() - t, method=scope["method"],
+                route=getattr(route, "path", None) or "unmatched", status=status,
+            )
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and not recorded:
+                record(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            if not recorded:
+                record(500)
+            raise
@@ -2,7 +2,7 @@
 from datetime import datetime, date
 from typing import Optional
 from sqlmodel import SQLModel, Field
-from sqlalchemy import Column
+from sqlalchemy import Column, Index
 from sqlalchemy.types import JSON  # <-- from SQLAlchemy, not sqlmodel
 
 class User(SQLModel, table=True):
@@ -36,3 +36,94 @@ class EventCompletion(SQLModel, table=True):
     day: date
     completed: bool
     marked_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SlackChannelSummary(SQLModel, table=True):
+    channel_id: str = Field(primary_key=True)
+    latest_ts: str  # ts of the newest message the summary covers
+    oldest_ts: Optional[str] = None  # start of the window it was first built for
+    summary: Optional[dict] = Field(
+        default=None,
+        sa_column=Column(JSON)
+    )
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class SlackMessage(SQLModel, table=True):
+    channel_id: str = Field(primary_key=True)
+    ts: str = Field(primary_key=True)  # Slack ts strings sort correctly as text
+    user: Optional[str] = None
+    text: str = ""
+    subtype: Optional[str] = None
+    thread_ts: Optional[str] = None
+    reply_count: int = 0
+    latest_reply: Optional[str] = None
+
+class SlackChannelState(SQLModel, table=True):
+    channel_id: str = Field(primary_key=True)
+    latest_ts: Optional[str] = None   # watermark: newest message stored
+    covered_from: Optional[str] = None  # oldest ts the store is complete from ("0" = full history)
+    synced_at: float = 0.0  # epoch seconds of the last upstream pull
+    reconciled_at: float = 0.0  # epoch seconds of the last edit/delete reconciliation
+
+class SlackChannel(SQLModel, table=True):
+    channel_id: str = Field(primary_key=True)
+    name: Optional[str] = None
+    is_channel: bool = False
+    is_group: bool = False
+    is_im: bool = False
+    is_mpim: bool = False
+    is_private: bool = False
+    is_member: bool = False
+    last_message_ts: Optional[str] = None
+    msgs_1h: int = 0
+    msgs_24h: int = 0
+    msgs_7d: int = 0
+    listed_at: float = 0.0  # epoch seconds of the conversations.list pass that saw it
+    activity_at: float = 0.0  # epoch seconds the activity counters were computed
+
+class NotionPage(SQLModel, table=True):
+    page_id: str = Field(primary_key=True)
+    database_id: str = Field(index=True)
+    last_edited_time: str  # ISO string as returned by Notion
+    data: Optional[dict] = Field(
+        default=None,
+        sa_column=Column(JSON)  # the full page object
+    )
+
+class NotionPropertyValue(SQLModel, table=True):
+    # One row per (page, property) value; multi_select has one row per option
+    __table_args__ = (
+        Index("ix_notionpropertyvalue_text", "database_id", "property", "text"),
+        Index("ix_notionpropertyvalue_num", "database_id", "property", "num"),
+    )
+    id: Optional[int] = Field(default=None, primary_key=True)
+    database_id: str
+    page_id: str = Field(index=True)
+    property: str
+    text: Optional[str] = None  # select/status/checkbox/date start/lower-cased text
+    num: Optional[float] = None
+
+class NotionMirrorState(SQLModel, table=True):
+    database_id: str = Field(primary_key=True)
+    watermark: Optional[str] = None  # newest last_edited_time mirrored
+    synced_at: float = 0.0  # epoch seconds of the last incremental sync
+    full_synced_at: float = 0.0  # epoch seconds of the last full pass (drops deleted pages)
+
+class OAuthState(SQLModel, table=True):
+    state: str = Field(primary_key=True)  # the value sent to the provider
+    provider: str  # "google" | "slack"
+    expires_at: float  # epoch seconds; consumed (deleted) on first callback
+
+class SharedCounter(SQLModel, table=True):
+    # Generation counters that tell other worker processes to drop a cache
+    name: str = Field(primary_key=True)
+    value: int = 0
+
+class CalendarSnapshot(SQLModel, table=True):
+    # Today's timed events as fetched from Google; refreshed by the scheduler
+    user_id: int = Field(primary_key=True)
+    day: date = Field(primary_key=True)
+    events: Optional[list] = Field(
+        default=None,
+        sa_column=Column(JSON)  # [{id, title, start, end}], as get_today_events returns
+    )
+    fetched_at: float = 0.0  # epoch seconds
@@ -0,0 +1,150 @@
+"""
+Model availability cache + routing.
+
+Probes `client.models.list()` once (at startup), caches the ids this key can
+use and re-probes in the background every MODEL_REFRESH_SECONDS. Each call
+type is routed to the first model in its preference list (cheapest/fastest
+first) that is available, so requests never pay a round trip for a model we
+already know is missing.
+"""
+from __future__ import annotations
+from anthropic import Anthropic
+from typing import Dict, List, Optional, Set
+import os, re, threading, time
+
+from . import metrics
+
+REFRESH_SECONDS = int(os.getenv("MODEL_REFRESH_SECONDS", str(6 * 3600)))
+
+# Cheapest/fastest first. Dated ids are used verbatim when the registry has
+# not been probed yet; once probed, any newer snapshot of the same family wins.
+ROUTES: Dict[str, List[str]] = {
+    # one short JSON reply, no tools
+    "mood": [
+        "claude-3-5-haiku-20241022",
+        "claude-haiku-4-5-20251001",
+        "claude-3-haiku-20240307",
+        "claude-sonnet-4-5-20250929",
+    ],
+    # multi-turn tool use, needs solid planning
+    "agent": [
+        "claude-sonnet-4-5-20250929",
+        "claude-sonnet-4-20250514",
+        "claude-3-7-sonnet-20250219",
+        "claude-haiku-4-5-20251001",
+    ],
+    # reduce step: combine per-channel summaries into insights/suggestions
+    "slack_summary": [
+        "claude-haiku-4-5-20251001",
+        "claude-sonnet-4-5-20250929",
+        "claude-sonnet-4-20250514",
+        "claude-3-5-haiku-20241022",
+    ],
+    # map step: summarize one channel's messages, many in parallel
+    "slack_map": [
+        "claude-3-5-haiku-20241022",
+        "claude-haiku-4-5-20251001",
+        "claude-3-haiku-20240307",
+    ],
+}
+
+# Per-route pins, e.g. ANTHROPIC_MODEL_AGENT=claude-opus-4-1-20250805.
+# ANTHROPIC_MODEL keeps pinning the simple-mode (mood) model as before.
+_ENV_PINS = {"mood": "ANTHROPIC_MODEL"}
+
+_DATE_SUFFIX = re.compile(r"-\d{8}$")
+
+
+def _family(model_id: str) -> str:
+    return _DATE_SUFFIX.sub("", model_id)
+
+
+class ModelRegistry:
+    def __init__(self, refresh_seconds: int = REFRESH_SECONDS):
+        self.refresh_seconds = refresh_seconds
+        self._available: Optional[Set[str]] = None  # None = never probed
+        self._unavailable: Set[str] = set()
+        self._probed_at = 0.0
+        self._api_key = ""
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def probe(self, api_key: str) -> List[str]:
+        """Blocking: list the models this key can use and cache them."""
+        self._api_key = api_key or self._api_key
+        if not self._api_key:
+            return []
+        client = Anthropic(api_key=self._api_key)
+        with metrics.upstream("anthropic", "models.list"):
+            ids = [m.id for m in client.models.list()]
+        with self._lock:
+            self._available = set(ids)
+            self._unavailable.clear()
+            self._probed_at = time.time()
+        return ids
+
+    def start(self, api_key: str) -> None:
+        """Kick off the startup probe without delaying app startup."""
+        self._api_key = api_key or self._api_key
+        if self._api_key:
+            self._refresh_in_background()
+
+    def _refresh_in_background(self) -> None:
+        def run():
+            try:
+                self.probe(self._api_key)
+            except Exception as e:
+                print("Model probe failed:", repr(e))
+                # retry in a minute rather than waiting a full refresh interval
+                self._probed_at = time.time() - self.refresh_seconds + 60
+            finally:
+                self._refreshing = False
+
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=run, daemon=True).start()
+
+    def available(self) -> List[str]:
+        with self._lock:
+            return sorted(self._available or [])
+
+    def mark_unavailable(self, model_id: str) -> None:
+        """Called on NotFoundError so the next pick skips this model."""
+        with self._lock:
+            self._unavailable.add(model_id)
+            if self._available is not None:
+                self._available.discard(model_id)
+
+    def _resolve(self, preferred: str) -> Optional[str]:
+        if preferred in self._unavailable:
+            return None
+        if self._available is None:
+            return preferred
+        if preferred in self._available:
+            return preferred
+        family = [m for m in self._available if _family(m) == _family(preferred)]
+        return max(family) if family else None
+
+    def pick(self, route: str) -> str:
+        """Best available model for a call type (a key of ROUTES)."""
+        if route not in ROUTES:
+            raise ValueError(f"Unknown model route: {route}")
+        if self._api_key and time.time() - self._probed_at > self.refresh_seconds:
+            self._refresh_in_background()
+
+        pin = os.getenv(_ENV_PINS.get(route, f"ANTHROPIC_MODEL_{route.upper()}"), "")
+        prefs = ([pin] if pin else []) + ROUTES[route]
+        with self._lock:
+            for preferred in prefs:
+                model = self._resolve(preferred)
+                if model:
+                    return model
+            # Nothing known-good: hand back the last preference not marked
+            # unavailable (the last one if all are) and let the caller fall back
+            untried = [m for m in prefs if m not in self._unavailable]
+        return (untried or prefs)[-1]
+
+
+registry = ModelRegistry()
@@ -1,16 +1,89 @@
-import os
-from typing import Optional, List, Dict, Any
+"""
+Notion API access shared by the HTTP routes and mcp/notion_server.py.
+
+One pooled `notion_client.Client` per API key for the process (keep-alive
+httpx connections), and one `AsyncClient` per event loop for the async agent
+tools. NOTION_BASE_URL points both at another host (benchmarks, fakes).
+iter_database_rows() follows next_cursor with one page prefetched, for
+streaming large databases in bounded memory.
+"""
+import asyncio, os, threading
+from typing import AsyncIterator, Optional, List, Dict, Any, Tuple
+import httpx
 from dotenv import load_dotenv
-from notion_client import Client
+from notion_client import AsyncClient, Client
+
+from . import metrics
 
 load_dotenv()
 
+NOTION_BASE_URL = os.getenv("NOTION_BASE_URL", "https://api.notion.com")
+TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60)
 
-def get_client() -> Client:
+_lock = threading.Lock()
+_clients: Dict[str, Client] = {}
+_async_clients: Dict[Tuple[str, int], Tuple[asyncio.AbstractEventLoop, AsyncClient]] = {}
+
+
+def _token() -> str:
     token = os.getenv("NOTION_API_KEY", "")
     if not token:
         raise RuntimeError("NOTION_API_KEY not set in environment")
-    return Client(auth=token)
+    return token
+
+
+def get_client() -> Client:
+    token = _token()
+    client = _clients.get(token)
+    if client is None:
+        with _lock:
+            client = _clients.get(token)
+            if client is None:
+                http = httpx.Client(timeout=TIMEOUT, limits=LIMITS)
+                client = Client(auth=token, base_url=NOTION_BASE_URL, client=http)
+                _clients[token] = client
+    return client
+
+
+def get_async_client() -> AsyncClient:
+    """The AsyncClient for the running event loop (httpx async pools are loop-bound)."""
+    token = _token()
+    loop = asyncio.get_running_loop()
+    key = (token, id(loop))
+    cached = _async_clients.get(key)
+    if cached and cached[0] is loop and not loop.is_closed():
+        return cached[1]
+    http = httpx.AsyncClient(timeout=TIMEOUT, limits=LIMITS)
+    client = AsyncClient(auth=token, base_url=NOTION_BASE_URL, client=http)
+    _async_clients[key] = (loop, client)
+    return client
+
+
+async def close() -> None:
+    """Close pooled connections (app shutdown)."""
+    loop = asyncio.get_running_loop()
+    for key, (client_loop, client) in list(_async_clients.items()):
+        if client_loop is loop:
+            await client.aclose()
+        _async_clients.pop(key, None)
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def _query_kwargs(filter, sorts, page_size, start_cursor, filter_properties=None) -> Dict[str, Any]:
+    kwargs: Dict[str, Any] = {"page_size": page_size}
+    if filter_properties:
+        kwargs["filter_properties"] = filter_properties  # property ids/names to return
+    if filter is not None:
+        kwargs["filter"] = filter
+    if sorts is not None:
+        kwargs["sorts"] = sorts
+    if start_cursor:
+        kwargs["start_cursor"] = start_cursor
+    return kwargs
 
 
 def list_databases(query: Optional[str] = None, page_size: int = 10) -> Dict[str, Any]:
@@ -21,7 +94,8 @@ def list_databases(query: Optional[str] = None, page_size: int = 10) -> Dict[str
     }
     if query:
         kwargs["query"] = query
-    return client.search(**kwargs)
+    with metrics.upstream("notion", "search"):
+        return client.search(**kwargs)
 
 
 def query_database(
@@ -30,23 +104,90 @@ def query_database(
     sorts: Optional[List[Dict[str, Any]]] = None,
     page_size: int = 25,
     start_cursor: Optional[str] = None,
+    filter_properties: Optional[List[str]] = None,
 ) -> Dict[str, Any]:
     client = get_client()
-    kwargs: Dict[str, Any] = {"page_size": page_size}
-    if filter is not None:
-        kwargs["filter"] = filter
-    if sorts is not None:
-        kwargs["sorts"] = sorts
-    if start_cursor:
-        kwargs["start_cursor"] = start_cursor
-    return client.databases.query(database_id=database_id, **kwargs)
+    with metrics.upstream("notion", "databases.query"):
+        return client.databases.query(database_id=database_id, **_query_kwargs(filter, sorts, page_size, start_cursor, filter_properties))
 
 
 def get_page(page_id: str) -> Dict[str, Any]:
     client = get_client()
-    return client.pages.retrieve(page_id=page_id)
+    with metrics.upstream("notion", "pages.retrieve"):
+        return client.pages.retrieve(page_id=page_id)
 
 
 def append_blocks(block_id: str, children: List[Dict[str, Any]]) -> Dict[str, Any]:
     client = get_client()
-    return client.blocks.children.append(block_id=block_id, children=children)
+    with metrics.upstream("notion", "blocks.children.append"):
+        return client.blocks.children.append(block_id=block_id, children=children)
+
+
+async def async_search_databases(query: Optional[str] = None, page_size: int = 10) -> Dict[str, Any]:
+    client = get_async_client()
+    with metrics.upstream("notion", "search"):
+        return await client.search(
+            query=query or None,
+            filter={"property": "object", "value": "database"},
+            page_size=page_size,
+        )
+
+
+async def async_query_database(
+    database_id: str,
+    filter: Optional[Dict[str, Any]] = None,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+    page_size: int = 25,
+    start_cursor: Optional[str] = None,
+    filter_properties: Optional[List[str]] = None,
+) -> Dict[str, Any]:
+    client = get_async_client()
+    with metrics.upstream("notion", "databases.query"):
+        return await client.databases.query(database_id=database_id, **_query_kwargs(filter, sorts, page_size, start_cursor, filter_properties))
+
+
+async def async_get_page(page_id: str) -> Dict[str, Any]:
+    client = get_async_client()
+    with metrics.upstream("notion", "pages.retrieve"):
+        return await client.pages.retrieve(page_id=page_id)
+
+
+async def async_append_blocks(block_id: str, children: List[Dict[str, Any]]) -> Dict[str, Any]:
+    client = get_async_client()
+    with metrics.upstream("notion", "blocks.children.append"):
+        return await client.blocks.children.append(block_id=block_id, children=children)
+
+
+async def async_list_block_children(block_id: str, start_cursor: Optional[str] = None, page_size: int = 100) -> Dict[str, Any]:
+    client = get_async_client()
+    kwargs: Dict[str, Any] = {"page_size": page_size}
+    if start_cursor:
+        kwargs["start_cursor"] = start_cursor
+    with metrics.upstream("notion", "blocks.children.list"):
+        return await client.blocks.children.list(block_id=block_id, **kwargs)
+
+
+async def iter_database_rows(
+    database_id: str,
+    filter: Optional[Dict[str, Any]] = None,
+    sorts: Optional[List[Dict[str, Any]]] = None,
+    page_size: int = 100,
+    filter_properties: Optional[List[str]] = None,
+    start_cursor: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Every row of a query, page by page. The next page is requested while the
+    current one is consumed, so at most two pages are held at a time."""
+    def fetch(cursor: Optional[str]) -> "asyncio.Task[Dict[str, Any]]":
+        return asyncio.create_task(async_query_database(database_id, filter, sorts, page_size, cursor, filter_properties))
+
+    pending: Optional[asyncio.Task] = fetch(start_cursor)
+    try:
+        while pending is not None:
+            res = await pending
+            cursor = res.get("next_cursor") if res.get("has_more") else None
+            pending = fetch(cursor) if cursor else None
+            for row in res.get("results", []):
+                yield row
+    finally:
+        if pending is not None:
+            pending.cancel()
@@ -0,0 +1,485 @@
+"""
+Local mirror of selected Notion databases (NOTION_MIRROR_DATABASES, comma
+separated ids).
+
+Pages are synced incrementally: each pass asks only for pages with
+last_edited_time on or after the stored watermark. Every
+NOTION_MIRROR_FULL_INTERVAL a full pass re-reads everything. Incremental
+queries don't return archived or deleted pages, so at most every
+NOTION_MIRROR_MAX_AGE an id-only listing (title property only) drops pages
+that are gone upstream. Queries are answered locally once the mirror is
+younger than NOTION_MIRROR_MAX_AGE, for edits and removals alike (a stale
+mirror is brought up to date first, which is usually a few small requests).
+
+The evaluator covers the common subset of Notion's filter/sort JSON:
+and/or compounds, checkbox, select/status, multi_select, date, number,
+title/rich_text and created/last_edited_time timestamps. Anything else
+raises Unsupported and the caller goes to the API instead, as do sorts on
+select/status (Notion orders those by option position, which the mirror
+doesn't keep) and multi_select. Indexable conditions are first narrowed in
+SQL through NotionPropertyValue. The SQLite work runs in a worker thread.
+"""
+from __future__ import annotations
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Set
+import asyncio, os, time
+
+from sqlalchemy import and_, delete
+from sqlmodel import Session, select
+
+from . import metrics, notion_client
+from .model import NotionMirrorState, NotionPage, NotionPropertyValue
+from .settings import engine
+
+MIRRORED = {d.strip() for d in os.getenv("NOTION_MIRROR_DATABASES", "").split(",") if d.strip()}
+MAX_AGE = float(os.getenv("NOTION_MIRROR_MAX_AGE", "60"))
+FULL_INTERVAL = float(os.getenv("NOTION_MIRROR_FULL_INTERVAL", str(6 * 3600)))
+BATCH = 100
+
+_locks: Dict[str, asyncio.Lock] = {}
+_pruned_at: Dict[str, float] = {}  # per process: last pass that dropped removed pages
+
+
+class Unsupported(Exception):
+    """Filter/sort the local evaluator can't answer exactly."""
+
+
+# ---- property values ----
+
+def _plain_text(items: Optional[List[Dict[str, Any]]]) -> str:
+    return "".join(i.get("plain_text") or (i.get("text") or {}).get("content", "") for i in items or [])
+
+
+def property_value(prop: Optional[Dict[str, Any]]) -> Any:
+    """Comparable Python value of a page property (None when empty)."""
+    if not prop:
+        return None
+    kind = prop.get("type")
+    value = prop.get(kind)
+    if kind in ("title", "rich_text"):
+        return _plain_text(value)
+    if kind == "checkbox":
+        return bool(value)
+    if kind in ("select", "status"):
+        return (value or {}).get("name")
+    if kind == "multi_select":
+        return [o.get("name") for o in value or []]
+    if kind == "date":
+        return (value or {}).get("start")
+    if kind in ("number", "url", "email", "phone_number", "created_time", "last_edited_time"):
+        return value
+    raise Unsupported(f"property type {kind}")
+
+
+def _index_rows(database_id: str, page: Dict[str, Any]) -> List[Dict[str, Any]]:
+    rows = []
+    for name, prop in (page.get("properties") or {}).items():
+        try:
+            value = property_value(prop)
+        except Unsupported:
+            continue
+        values = value if isinstance(value, list) else [value]
+        for v in values:
+            if v is None:
+                continue
+            row = {"database_id": database_id, "page_id": page["id"], "property": name, "text": None, "num": None}
+            if isinstance(v, bool):
+                row["text"] = "true" if v else "false"
+            elif isinstance(v, (int, float)):
+                row["num"] = float(v)
+            elif prop.get("type") in ("title", "rich_text"):
+                row["text"] = v.lower()
+            else:
+                row["text"] = str(v)
+            rows.append(row)
+    return rows
+
+
+# ---- filters ----
+
+def _dt(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    dt = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def _date_pred(cond: Dict[str, Any]) -> Callable[[Any], bool]:
+    (op, arg), = cond.items()
+    if op == "is_empty":
+        return lambda v: not v
+    if op == "is_not_empty":
+        return lambda v: bool(v)
+    if op not in ("equals", "before", "after", "on_or_before", "on_or_after"):
+        raise Unsupported(f"date {op}")
+    date_only = isinstance(arg, str) and len(arg) == 10
+    target = _dt(arg)
+
+    def pred(v):
+        if not v:
+            return False
+        got = _dt(v)
+        a, b = (got.date(), target.date()) if date_only else (got, target)
+        return {
+            "equals": a == b, "before": a < b, "after": a > b,
+            "on_or_before": a <= b, "on_or_after": a >= b,
+        }[op]
+    return pred
+
+
+def _text_pred(cond: Dict[str, Any]) -> Callable[[Any], bool]:
+    (op, arg), = cond.items()
+    arg_l = (arg or "").lower() if isinstance(arg, str) else arg
+    ops = {
+        "equals": lambda v: (v or "") == arg,
+        "does_not_equal": lambda v: (v or "") != arg,
+        "contains": lambda v: arg_l in (v or "").lower(),
+        "does_not_contain": lambda v: arg_l not in (v or "").lower(),
+        "starts_with": lambda v: (v or "").lower().startswith(arg_l),
+        "ends_with": lambda v: (v or "").lower().endswith(arg_l),
+        "is_empty": lambda v: not v,
+        "is_not_empty": lambda v: bool(v),
+    }
+    if op not in ops:
+        raise Unsupported(f"text {op}")
+    return ops[op]
+
+
+def _number_pred(cond: Dict[str, Any]) -> Callable[[Any], bool]:
+    (op, arg), = cond.items()
+    ops = {
+        "equals": lambda v: v is not None and v == arg,
+        "does_not_equal": lambda v: v != arg,
+        "greater_than": lambda v: v is not None and v > arg,
+        "less_than": lambda v: v is not None and v < arg,
+        "greater_than_or_equal_to": lambda v: v is not None and v >= arg,
+        "less_than_or_equal_to": lambda v: v is not None and v <= arg,
+        "is_empty": lambda v: v is None,
+        "is_not_empty": lambda v: v is not None,
+    }
+    if op not in ops:
+        raise Unsupported(f"number {op}")
+    return ops[op]
+
+
+def _select_pred(cond: Dict[str, Any]) -> Callable[[Any], bool]:
+    (op, arg), = cond.items()
+    ops = {
+        "equals": lambda v: v == arg,
+        "does_not_equal": lambda v: v != arg,
+        "is_empty": lambda v: v is None,
+        "is_not_empty": lambda v: v is not None,
+    }
+    if op not in ops:
+        raise Unsupported(f"select {op}")
+    return ops[op]
+
+
+def _multi_select_pred(cond: Dict[str, Any]) -> Callable[[Any], bool]:
+    (op, arg), = cond.items()
+    ops = {
+        "contains": lambda v: arg in (v or []),
+        "does_not_contain": lambda v: arg not in (v or []),
+        "is_empty": lambda v: not v,
+        "is_not_empty": lambda v: bool(v),
+    }
+    if op not in ops:
+        raise Unsupported(f"multi_select {op}")
+    return ops[op]
+
+
+def _checkbox_pred(cond: Dict[str, Any]) -> Callable[[Any], bool]:
+    (op, arg), = cond.items()
+    if op == "equals":
+        return lambda v: bool(v) == bool(arg)
+    if op == "does_not_equal":
+        return lambda v: bool(v) != bool(arg)
+    raise Unsupported(f"checkbox {op}")
+
+
+_PREDICATES = {
+    "checkbox": _checkbox_pred,
+    "select": _select_pred,
+    "status": _select_pred,
+    "multi_select": _multi_select_pred,
+    "date": _date_pred,
+    "number": _number_pred,
+    "title": _text_pred,
+    "rich_text": _text_pred,
+    "url": _text_pred,
+    "email": _text_pred,
+    "phone_number": _text_pred,
+}
+
+
+def compile_filter(flt: Optional[Dict[str, Any]]) -> Callable[[Dict[str, Any]], bool]:
+    """Notion filter JSON -> predicate over page objects (raises Unsupported)."""
+    if not flt:
+        return lambda page: True
+    if "and" in flt or "or" in flt:
+        parts = [compile_filter(f) for f in flt.get("and") or flt.get("or") or []]
+        if "and" in flt:
+            return lambda page: all(p(page) for p in parts)
+        return lambda page: any(p(page) for p in parts)
+    if "timestamp" in flt:
+        field = flt["timestamp"]
+        if field not in ("created_time", "last_edited_time"):
+            raise Unsupported(f"timestamp {field}")
+        pred = _date_pred(flt[field])
+        return lambda page: pred(page.get(field))
+    name = flt.get("property")
+    kinds = [k for k in flt if k in _PREDICATES]
+    if not name or len(kinds) != 1:
+        raise Unsupported(f"filter {sorted(flt)}")
+    pred = _PREDICATES[kinds[0]](flt[kinds[0]])
+
+    def check(page):
+        prop = (page.get("properties") or {}).get(name)
+        return pred(property_value(prop))
+    return check
+
+
+def _index_condition(flt: Dict[str, Any]):
+    """SQL narrowing for one leaf condition, or None if it can't use the index."""
+    name = flt.get("property")
+    if not name:
+        return None
+    col = NotionPropertyValue
+    for kind, cond in flt.items():
+        if kind == "property" or not isinstance(cond, dict) or len(cond) != 1:
+            continue
+        (op, arg), = cond.items()
+        if kind == "checkbox" and op == "equals":
+            return and_(col.property == name, col.text == ("true" if arg else "false"))
+        if kind in ("select", "status") and op == "equals":
+            return and_(col.property == name, col.text == arg)
+        if kind == "multi_select" and op == "contains":
+            return and_(col.property == name, col.text == arg)
+        if kind == "number" and op in ("equals", "greater_than", "less_than", "greater_than_or_equal_to", "less_than_or_equal_to"):
+            cmp = {"equals": col.num == arg, "greater_than": col.num > arg, "less_than": col.num < arg,
+                   "greater_than_or_equal_to": col.num >= arg, "less_than_or_equal_to": col.num <= arg}[op]
+            return and_(col.property == name, cmp)
+        if kind == "date" and op in ("equals", "before", "after", "on_or_before", "on_or_after") and isinstance(arg, str):
+            # Superset on the date part; the predicate does the exact comparison
+            day = arg[:10]
+            if op == "equals":
+                return and_(col.property == name, col.text >= day, col.text <= day + "~")
+            if op in ("after", "on_or_after"):
+                return and_(col.property == name, col.text >= day)
+            return and_(col.property == name, col.text <= day + "~")
+        if kind in ("title", "rich_text") and op in ("contains", "equals", "starts_with") and isinstance(arg, str):
+            pattern = {"contains": f"%{arg.lower()}%", "equals": arg.lower(), "starts_with": f"{arg.lower()}%"}[op]
+            return and_(col.property == name, col.text.like(pattern))
+    return None
+
+
+def _candidates(s: Session, database_id: str, flt: Optional[Dict[str, Any]]) -> Optional[Set[str]]:
+    """Page ids that may match (None = no index narrowing possible)."""
+    if not flt:
+        return None
+    leaves = flt.get("and") if "and" in flt else ([flt] if "or" not in flt else [])
+    result: Optional[Set[str]] = None
+    for leaf in leaves or []:
+        cond = _index_condition(leaf)
+        if cond is None:
+            continue
+        ids = set(s.exec(select(NotionPropertyValue.page_id).where(
+            NotionPropertyValue.database_id == database_id, cond
+        )).all())
+        result = ids if result is None else result & ids
+        if not result:
+            break
+    return result
+
+
+# ---- sorts ----
+
+def _sort_pages(pages: List[Dict[str, Any]], sorts: Optional[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    if not sorts:
+        return sorted(pages, key=lambda p: p.get("created_time") or "", reverse=True)
+    for sort in reversed(sorts):  # stable sorts, last key first
+        descending = sort.get("direction") == "descending"
+        if "timestamp" in sort:
+            field = sort["timestamp"]
+            if field not in ("created_time", "last_edited_time"):
+                raise Unsupported(f"sort timestamp {field}")
+            getter = lambda p, f=field: p.get(f)
+        elif "property" in sort:
+            name = sort["property"]
+            for p in pages:
+                kind = ((p.get("properties") or {}).get(name) or {}).get("type")
+                if kind in ("select", "status", "multi_select"):
+                    raise Unsupported(f"sort on {kind}")
+            getter = lambda p, n=name: property_value((p.get("properties") or {}).get(n))
+        else:
+            raise Unsupported("sort")
+        keyed = [(getter(p), p) for p in pages]
+        present = [kp for kp in keyed if kp[0] not in (None, "")]
+        empty = [p for v, p in keyed if v in (None, "")]
+        present.sort(key=lambda kp: kp[0], reverse=descending)
+        pages = [p for _, p in present] + empty  # Notion puts empty values last either way
+    return pages
+
+
+# ---- sync ----
+
+def is_mirrored(database_id: str) -> bool:
+    return database_id in MIRRORED
+
+
+def get_state(database_id: str) -> Optional[NotionMirrorState]:
+    with Session(engine) as s:
+        return s.get(NotionMirrorState, database_id)
+
+
+def _store(database_id: str, pages: List[Dict[str, Any]]) -> None:
+    live = [p for p in pages if not p.get("archived") and not p.get("in_trash")]
+    removed = [p["id"] for p in pages if p.get("archived") or p.get("in_trash")]
+    with Session(engine) as s:
+        s.exec(delete(NotionPropertyValue).where(NotionPropertyValue.page_id.in_([p["id"] for p in pages])))
+        if removed:
+            s.exec(delete(NotionPage).where(NotionPage.page_id.in_(removed)))
+        for page in live:
+            s.merge(NotionPage(page_id=page["id"], database_id=database_id,
+                               last_edited_time=page.get("last_edited_time") or "", data=page))
+        rows = [r for page in live for r in _index_rows(database_id, page)]
+        if rows:
+            s.bulk_insert_mappings(NotionPropertyValue, rows)
+        s.commit()
+
+
+def _save_state(state: NotionMirrorState) -> None:
+    with Session(engine) as s:
+        s.merge(state)
+        s.commit()
+
+
+def _iso_now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def _drop_missing(database_id: str, seen: Set[str], edited_before: str) -> None:
+    """Delete stored pages the listing didn't return (but not ones stored by a
+    concurrent sync after the listing started)."""
+    with Session(engine) as s:
+        stored = set(s.exec(select(NotionPage.page_id).where(
+            NotionPage.database_id == database_id,
+            NotionPage.last_edited_time < edited_before,
+        )).all())
+        gone = list(stored - seen)
+        if gone:
+            s.exec(delete(NotionPropertyValue).where(NotionPropertyValue.page_id.in_(gone)))
+            s.exec(delete(NotionPage).where(NotionPage.page_id.in_(gone)))
+            s.commit()
+
+
+async def sync(database_id: str, full: bool = False) -> int:
+    """Pull pages edited since the watermark (everything when `full`); returns pages stored."""
+    lock = _locks.setdefault(database_id, asyncio.Lock())
+    async with lock:
+        now = time.time()
+        started = _iso_now()
+        state = await asyncio.to_thread(get_state, database_id) or NotionMirrorState(database_id=database_id)
+        full = full or not state.watermark or now - state.full_synced_at >= FULL_INTERVAL
+        flt = None if full else {"timestamp": "last_edited_time", "last_edited_time": {"on_or_after": state.watermark}}
+        sorts = [{"timestamp": "last_edited_time", "direction": "ascending"}]
+        seen: Set[str] = set()
+        batch: List[Dict[str, Any]] = []
+        watermark = state.watermark
+        async for page in notion_client.iter_database_rows(database_id, filter=flt, sorts=sorts, page_size=100):
+            batch.append(page)
+            seen.add(page["id"])
+            edited = page.get("last_edited_time")
+            if edited and (not watermark or edited > watermark):
+                watermark = edited
+            if len(batch) >= BATCH:
+                await asyncio.to_thread(_store, database_id, batch)
+                batch = []
+        if batch:
+            await asyncio.to_thread(_store, database_id, batch)
+        if full:
+            await asyncio.to_thread(_drop_missing, database_id, seen, started)
+            state.full_synced_at = now
+            _pruned_at[database_id] = now
+        elif _prune_due(database_id):
+            await _prune(database_id)
+        state.watermark = watermark
+        state.synced_at = now
+        await asyncio.to_thread(_save_state, state)
+        return len(seen)
+
+
+def _prune_due(database_id: str) -> bool:
+    return time.time() - _pruned_at.get(database_id, 0.0) > MAX_AGE
+
+
+async def _prune(database_id: str) -> None:
+    """Id-only listing of the whole database; drops pages no longer in it."""
+    started = _iso_now()
+    now = time.time()
+    ids: Set[str] = set()
+    async for page in notion_client.iter_database_rows(database_id, page_size=100, filter_properties=["title"]):
+        ids.add(page["id"])
+    await asyncio.to_thread(_drop_missing, database_id, ids, started)
+    _pruned_at[database_id] = now
+
+
+async def ensure_fresh(database_id: str) -> None:
+    state = await asyncio.to_thread(get_state, database_id)
+    if not state or time.time() - state.synced_at > MAX_AGE or _prune_due(database_id):
+        await sync(database_id)
+
+
+# ---- queries ----
+
+def query_local(database_id: str, filter: Optional[Dict[str, Any]] = None,
+                sorts: Optional[List[Dict[str, Any]]] = None, page_size: int = 25,
+                start_cursor: Optional[str] = None) -> Dict[str, Any]:
+    """databases.query answered from the mirror, in the API's response shape."""
+    pred = compile_filter(filter)
+    try:
+        offset = int(start_cursor or 0)
+    except ValueError:
+        raise Unsupported("cursor from the remote API")
+    with Session(engine) as s:
+        candidates = _candidates(s, database_id, filter)
+        stmt = select(NotionPage.data).where(NotionPage.database_id == database_id)
+        if candidates is not None:
+            stmt = stmt.where(NotionPage.page_id.in_(candidates))
+        pages = [p for p in s.exec(stmt).all() if pred(p)]
+    pages = _sort_pages(pages, sorts)
+    page_size = min(max(page_size, 1), 100)
+    chunk = pages[offset:offset + page_size]
+    more = offset + page_size < len(pages)
+    return {
+        "object": "list",
+        "results": chunk,
+        "next_cursor": str(offset + page_size) if more else None,
+        "has_more": more,
+        "type": "page_or_database",
+        "page_or_database": {},
+    }
+
+
+async def query(database_id: str, filter: Optional[Dict[str, Any]] = None,
+                sorts: Optional[List[Dict[str, Any]]] = None, page_size: int = 25,
+                start_cursor: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Mirror answer, or None when the database isn't mirrored or the query is unsupported."""
+    if not is_mirrored(database_id):
+        return None
+    try:
+        compile_filter(filter)
+        _sort_pages([], sorts)
+        if start_cursor:
+            int(start_cursor)
+    except (Unsupported, ValueError, TypeError, AttributeError):
+        metrics.cache("notion_mirror", False)
+        return None
+    await ensure_fresh(database_id)
+    try:
+        res = await asyncio.to_thread(query_local, database_id, filter, sorts, page_size, start_cursor)
+    except Unsupported:
+        metrics.cache("notion_mirror", False)
+        return None
+    metrics.cache("notion_mirror", True)
+    return res
@@ -0,0 +1,207 @@
+"""
+Bulk block writer for Notion.
+
+blocks.children.append takes at most 100 children per array (and ~1000 block
+elements in total) per request, nested two levels deep, and Notion allows
+about 3 requests per second per integration. append_blocks_bulk() splits any
+child list into valid requests, keeping order:
+
+  * each parent's chunks are sent one after another (appends land at the
+    end, so that is what preserves order);
+  * children ride inline with their parent down to Notion's two levels, the
+    first 100 of each list. What doesn't fit (later siblings, deeper
+    descendants) is appended once its parent exists; a parent that was
+    created inline is found with blocks.children.list. Different parents are
+    written concurrently;
+  * column_list, column and table can't be created empty, so they are only
+    placed where their first children fit inline with them (a column_list at
+    the top of a request, a column or table no deeper than one level); a
+    table's rows past the first 100 are appended to the table afterwards;
+  * every request goes through one token bucket (NOTION_RPS) and 429s are
+    retried after Retry-After.
+"""
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+import asyncio, copy, os
+
+from notion_client import APIResponseError
+
+from . import notion_client
+from .rate_limit import TokenBucket
+
+MAX_CHILDREN = 100
+MAX_BLOCKS_PER_REQUEST = 1000
+MAX_DEPTH = 2  # levels of children allowed under a request's top-level blocks
+RPS = float(os.getenv("NOTION_RPS", "3"))
+MAX_RETRIES = int(os.getenv("NOTION_MAX_RETRIES", "5"))
+
+# Block types that must be created with their children, and the deepest
+# level of a request they can sit at for those children to fit
+_NEEDS_CHILDREN = {"column_list": 0, "column": 1, "table": 1}
+
+Path = Tuple[int, ...]  # indices from a created block down to one of its inline descendants
+FollowUp = Tuple[Path, List[Dict[str, Any]]]  # (where, children to append there)
+
+_limiters: Dict[int, Tuple[asyncio.AbstractEventLoop, TokenBucket]] = {}
+
+
+def _limiter() -> TokenBucket:
+    loop = asyncio.get_running_loop()
+    cached = _limiters.get(id(loop))
+    if cached and cached[0] is loop:
+        return cached[1]
+    lim = TokenBucket(int(RPS * 60), burst=max(1, int(RPS)))
+    _limiters[id(loop)] = (loop, lim)
+    return lim
+
+
+def _children(block: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+    body = block.get(block.get("type") or "")
+    return body.get("children") if isinstance(body, dict) else None
+
+
+def _without_children(block: Dict[str, Any]) -> Dict[str, Any]:
+    sent = copy.copy(block)
+    sent[block["type"]] = {k: v for k, v in block[block["type"]].items() if k != "children"}
+    return sent
+
+
+def _fits(block: Dict[str, Any], depth: int) -> bool:
+    return depth <= _NEEDS_CHILDREN.get(block.get("type") or "", MAX_DEPTH)
+
+
+def _split(block: Dict[str, Any], depth: int = 0, path: Path = (),
+           budget: Optional[List[int]] = None) -> Tuple[Dict[str, Any], List[FollowUp]]:
+    """(block to send, follow-up appends once it exists). Children stay inline
+    up to MAX_DEPTH, MAX_CHILDREN and MAX_BLOCKS_PER_REQUEST in all; from the
+    first one that doesn't fit on, a child list is appended later so order is
+    kept."""
+    budget = budget if budget is not None else [MAX_BLOCKS_PER_REQUEST]
+    budget[0] -= 1
+    kids = _children(block)
+    if not kids:
+        return block, []
+    if depth == MAX_DEPTH:
+        return _without_children(block), [(path, kids)]
+    # A column_list needs all its columns, a column or table its first child
+    required = 0 if block.get("type") not in _NEEDS_CHILDREN else len(kids) if block["type"] == "column_list" else 1
+    inline: List[Dict[str, Any]] = []
+    follow_ups: List[FollowUp] = []
+    for i, kid in enumerate(kids):
+        if len(inline) >= required and (len(inline) == MAX_CHILDREN or budget[0] < 1 or not _fits(kid, depth + 1)):
+            break
+        sent, later = _split(kid, depth + 1, path + (i,), budget)
+        inline.append(sent)
+        follow_ups += later
+    if len(inline) < len(kids):
+        follow_ups.append((path, kids[len(inline):]))
+    if len(inline) == len(kids) and not follow_ups:
+        return block, []
+    sent = _without_children(block)
+    if inline:
+        sent[block["type"]]["children"] = inline
+    return sent, follow_ups
+
+
+def _size(block: Dict[str, Any]) -> int:
+    return 1 + sum(_size(k) for k in _children(block) or [])
+
+
+def chunk_blocks(blocks: List[Dict[str, Any]]) -> List[List[Tuple[Dict[str, Any], List[FollowUp]]]]:
+    """Ordered request payloads of (block, follow-up appends) pairs."""
+    chunks: List[List[Tuple[Dict[str, Any], List[FollowUp]]]] = []
+    current: List[Tuple[Dict[str, Any], List[FollowUp]]] = []
+    size = 0
+    for block in blocks:
+        sent, follow_ups = _split(block)
+        n = _size(sent)
+        if current and (len(current) >= MAX_CHILDREN or size + n > MAX_BLOCKS_PER_REQUEST):
+            chunks.append(current)
+            current, size = [], 0
+        current.append((sent, follow_ups))
+        size += n
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+async def _request(call: Callable[[], Awaitable[Dict[str, Any]]], what: str, stats: Dict[str, int]) -> Dict[str, Any]:
+    limiter = _limiter()
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire()
+        stats["requests"] += 1
+        try:
+            return await call()
+        except APIResponseError as e:
+            if e.status != 429 or attempt == MAX_RETRIES:
+                raise
+            stats["retries"] += 1
+            try:
+                wait = float(e.headers.get("Retry-After") or 1)
+            except ValueError:
+                wait = 1.0
+            limiter.block(wait)
+    raise RuntimeError(f"Notion {what}: rate limited")
+
+
+async def _append(block_id: str, children: List[Dict[str, Any]], stats: Dict[str, int]) -> Dict[str, Any]:
+    return await _request(lambda: notion_client.async_append_blocks(block_id, children), "append", stats)
+
+
+async def _child_ids(block_id: str, stats: Dict[str, int]) -> List[str]:
+    ids: List[str] = []
+    cursor = None
+    while True:
+        res = await _request(lambda: notion_client.async_list_block_children(block_id, cursor), "list children", stats)
+        ids += [b["id"] for b in res.get("results", [])]
+        cursor = res.get("next_cursor")
+        if not res.get("has_more") or not cursor:
+            return ids
+
+
+async def _follow_up(block_id: str, follow_ups: List[FollowUp], stats: Dict[str, int]) -> None:
+    """Append the deferred child lists of a created block (or of its inline descendants)."""
+    ids: Dict[Path, str] = {(): block_id}
+    tasks: List[asyncio.Task] = []
+    try:
+        for path, kids in follow_ups:
+            for n in range(1, len(path) + 1):
+                if path[:n] not in ids:
+                    parent = path[:n - 1]
+                    for i, child_id in enumerate(await _child_ids(ids[parent], stats)):
+                        ids[parent + (i,)] = child_id
+            tasks.append(asyncio.create_task(_write(ids[path], kids, stats)))
+        if tasks:
+            await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+
+async def _write(block_id: str, blocks: List[Dict[str, Any]], stats: Dict[str, int]) -> List[Dict[str, Any]]:
+    created: List[Dict[str, Any]] = []
+    nested: List[asyncio.Task] = []
+    try:
+        for chunk in chunk_blocks(blocks):
+            res = await _append(block_id, [sent for sent, _ in chunk], stats)
+            results = res.get("results", [])
+            created.extend(results)
+            for (_, follow_ups), made in zip(chunk, results):
+                if follow_ups:
+                    # Start the subtree now; it runs while this parent's next chunk is sent
+                    nested.append(asyncio.create_task(_follow_up(made["id"], follow_ups, stats)))
+        if nested:
+            await asyncio.gather(*nested)
+    except BaseException:
+        for task in nested:
+            task.cancel()
+        raise
+    return created
+
+
+async def append_blocks_bulk(block_id: str, children: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Append any number of (nested) blocks in order; returns the created top-level blocks."""
+    stats = {"requests": 0, "retries": 0}
+    created = await _write(block_id, children, stats)
+    return {"object": "list", "results": created, "has_more": False, "next_cursor": None, **stats}
@@ -0,0 +1,38 @@
+"""
+OAuth `state` values, stored in SQLite so any worker can finish a sign-in
+another worker started, and several sign-ins can be in flight at once.
+
+A state is valid for OAUTH_STATE_TTL seconds and can be consumed once: the
+DELETE ... WHERE not-expired is atomic across processes, so a replayed or
+raced callback gets False.
+"""
+from __future__ import annotations
+from typing import Optional
+import os, secrets, time
+
+from .settings import engine
+
+TTL = int(os.getenv("OAUTH_STATE_TTL", "600"))
+
+
+def issue(provider: str, state: Optional[str] = None) -> str:
+    """Store (or generate) a state for `provider`; expired states are purged on the way."""
+    state = state or secrets.token_urlsafe(16)
+    now = time.time()
+    with engine.begin() as conn:
+        conn.exec_driver_sql("DELETE FROM oauthstate WHERE expires_at <= ?", (now,))
+        conn.exec_driver_sql(
+            "INSERT INTO oauthstate (state, provider, expires_at) VALUES (?, ?, ?)",
+            (state, provider, now + TTL),
+        )
+    return state
+
+
+def consume(provider: str, state: str) -> bool:
+    """True exactly once for a live state issued for `provider`."""
+    with engine.begin() as conn:
+        res = conn.exec_driver_sql(
+            "DELETE FROM oauthstate WHERE state = ? AND provider = ? AND expires_at > ?",
+            (state, provider, time.time()),
+        )
+        return res.rowcount == 1
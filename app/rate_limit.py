@@ -0,0 +1,40 @@
+"""
+Async token bucket shared by the API clients that pace themselves
+(slack_client per token and Web API method, notion_writer per event loop).
+"""
+from __future__ import annotations
+from typing import Optional
+import asyncio, time
+
+
+class TokenBucket:
+    """
+    Refills at `per_minute` and allows a burst of a quarter of the per-minute
+    budget by default (APIs tolerate short bursts; anything beyond that comes
+    back as 429 + Retry-After, which block() turns into a pause).
+    """
+
+    def __init__(self, per_minute: int, burst: Optional[int] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = float(burst or max(1, per_minute // 4))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def block(self, seconds: float) -> None:
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    await asyncio.sleep(self.blocked_until - now)
+                    continue
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
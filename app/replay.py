@@ -0,0 +1,211 @@
+"""
+Record/replay cassettes for the agent loops in brain_mcp.
+
+Record mode captures every Messages API response and every tool output of a
+live run into a JSON cassette. Replay mode serves the tool outputs back from
+the cassette, so decide_mood_with_mcp / summarize_slack_with_mcp run without
+Slack, Google or Notion. Model responses are replayed by bench/fake_anthropic.py
+(point ANTHROPIC_BASE_URL at it).
+
+Enable with env vars:
+    COW_CASSETTE=bench/cassettes/mood.json
+    COW_CASSETTE_MODE=record|replay
+
+or programmatically with `use_cassette(path, mode)`.
+"""
+from __future__ import annotations
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+import asyncio, hashlib, json, os, threading, time
+
+from .tool_result import ToolResult
+
+
+def _canonical(obj: Any) -> str:
+    return json.dumps(obj, sort_keys=True, default=str)
+
+
+def conversation_key(messages: List[Dict[str, Any]]) -> str:
+    """Stable id for a conversation: hash of its first user message."""
+    if not messages:
+        return ""
+    return hashlib.sha1(_canonical(messages[0].get("content")).encode()).hexdigest()
+
+
+def conversation_turn(messages: List[Dict[str, Any]]) -> int:
+    """Turn index = number of assistant messages already in the conversation."""
+    return sum(1 for m in messages if m.get("role") == "assistant")
+
+
+def first_user_text(messages: List[Dict[str, Any]]) -> str:
+    if not messages:
+        return ""
+    content = messages[0].get("content")
+    return content if isinstance(content, str) else _canonical(content)
+
+
+class Cassette:
+    """
+    JSON file holding recorded model responses and tool outputs:
+
+        {"version": 1,
+         "messages": [{"key": sha1, "match": "substring", "turn": 0, "response": {...}}],
+         "tools": [{"name": ..., "input": {...}, "output": ..., "error": null, "elapsed_ms": 12.3}]}
+
+    Message entries are looked up by exact conversation key first, then by
+    `match` (substring of the first user message), then by key "*".
+    """
+
+    def __init__(self, path: str, mode: str = "replay", tool_latency_scale: float = 0.0, autosave: bool = False):
+        if mode not in {"record", "replay"}:
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        self.path = path
+        self.mode = mode
+        self.tool_latency_scale = tool_latency_scale
+        self.autosave = autosave
+        self.messages: List[Dict[str, Any]] = []
+        self.tools: List[Dict[str, Any]] = []
+        self.tool_timings: List[Dict[str, Any]] = []
+        self._tool_cursor: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        if mode == "replay" or os.path.exists(path):
+            self.load()
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    def load(self) -> None:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"Cassette not found: {self.path}")
+        with open(self.path) as f:
+            data = json.load(f)
+        self.messages = data.get("messages", [])
+        self.tools = data.get("tools", [])
+
+    def save(self) -> None:
+        d = os.path.dirname(self.path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump({"version": 1, "messages": self.messages, "tools": self.tools}, f, indent=2, default=str)
+
+    # --- model responses -------------------------------------------------
+
+    def record_response(self, messages: List[Dict[str, Any]], response: Any) -> None:
+        if self.replaying:
+            return
+        body = response.model_dump(mode="json") if hasattr(response, "model_dump") else response
+        with self._lock:
+            self.messages.append({
+                "key": conversation_key(messages),
+                "turn": conversation_turn(messages),
+                "response": body,
+            })
+            if self.autosave:
+                self.save()
+
+    def find_response(self, messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        key = conversation_key(messages)
+        turn = conversation_turn(messages)
+        text = first_user_text(messages)
+        candidates = [m for m in self.messages if m.get("turn", 0) == turn]
+        for m in candidates:
+            if m.get("key") == key:
+                return m["response"]
+        for m in candidates:
+            if m.get("match") and m["match"] in text:
+                return m["response"]
+        for m in candidates:
+            if m.get("key") == "*":
+                return m["response"]
+        return None
+
+    # --- tool outputs ----------------------------------------------------
+
+    def record_tool(self, name: str, tool_input: Dict[str, Any], result: ToolResult, elapsed_ms: float) -> None:
+        with self._lock:
+            self.tool_timings.append({"name": name, "elapsed_ms": elapsed_ms})
+            if not self.replaying:
+                entry = {"name": name, "input": tool_input, "output": result.data, "elapsed_ms": elapsed_ms}
+                if result.error is not None:
+                    entry["error"] = result.error
+                self.tools.append(entry)
+                if self.autosave:
+                    self.save()
+
+    async def replay_tool(self, name: str, tool_input: Dict[str, Any]) -> ToolResult:
+        """Return the recorded output for (name, input), cycling through repeats."""
+        want = _canonical(tool_input)
+        with self._lock:
+            matches = [t for t in self.tools if t["name"] == name and _canonical(t.get("input", {})) == want]
+            if not matches:
+                # Inputs like timestamps/cursors vary run to run: fall back to the
+                # recordings of this tool sharing the most input values
+                def overlap(t):
+                    rec = t.get("input", {})
+                    return sum(1 for k, v in tool_input.items() if k in rec and _canonical(rec[k]) == _canonical(v))
+                named = [t for t in self.tools if t["name"] == name]
+                best = max((overlap(t) for t in named), default=0)
+                matches = [t for t in named if overlap(t) == best]
+            if not matches:
+                raise KeyError(f"No recorded output for tool {name}")
+            cursor_key = f"{name}:{want}"
+            i = self._tool_cursor.get(cursor_key, 0)
+            self._tool_cursor[cursor_key] = i + 1
+            entry = matches[i % len(matches)]
+        delay = entry.get("elapsed_ms", 0.0) * self.tool_latency_scale / 1000.0
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return ToolResult(data=entry.get("output"), error=entry.get("error"))
+
+
+_active: Optional[Cassette] = None
+
+
+def active() -> Optional[Cassette]:
+    """The cassette currently in use, if any (env-configured on first access)."""
+    global _active
+    if _active is None and os.getenv("COW_CASSETTE"):
+        _active = Cassette(
+            os.environ["COW_CASSETTE"],
+            os.getenv("COW_CASSETTE_MODE", "replay"),
+            float(os.getenv("COW_CASSETTE_TOOL_LATENCY", "0")),
+            autosave=True,
+        )
+    return _active
+
+
+@contextmanager
+def use_cassette(path: str, mode: str = "replay", tool_latency_scale: float = 0.0):
+    """Activate a cassette for the duration of the block; saves on exit when recording."""
+    global _active
+    prev = _active
+    _active = Cassette(path, mode, tool_latency_scale)
+    try:
+        yield _active
+    finally:
+        if _active.mode == "record":
+            _active.save()
+        _active = prev
+
+
+def record_response(messages: List[Dict[str, Any]], response: Any) -> None:
+    c = active()
+    if c is not None:
+        c.record_response(messages, response)
+
+
+async def recorded_tool_call(name: str, tool_input: Dict[str, Any], call) -> ToolResult:
+    """Run `call()` (or replay it) and record its output/latency on the active cassette."""
+    c = active()
+    if c is not None and c.replaying:
+        started = time.perf_counter()
+        out = await c.replay_tool(name, tool_input)
+        c.record_tool(name, tool_input, out, (time.perf_counter() - started) * 1000)
+        return out
+    started = time.perf_counter()
+    out = await call()
+    if c is not None:
+        c.record_tool(name, tool_input, out, (time.perf_counter() - started) * 1000)
+    return out
@@ -0,0 +1,157 @@
+"""
+Background prewarming (APScheduler), so /status and /events/today/past are
+served from data that is already fresh.
+
+Jobs, per user with Google connected:
+  * calendar snapshot: daily at SCHEDULER_DAY_START minus SCHEDULER_PREWARM_LEAD
+    minutes, every SCHEDULER_SNAPSHOT_INTERVAL seconds, and just after each of
+    today's events ends (one date job per event, re-planned on every refresh);
+  * mood: after an event ends, and every SCHEDULER_MOOD_INTERVAL seconds. It
+    only calls the model when the inputs changed, i.e. today's percent no
+    longer matches the stored DaySummary.
+
+Every trigger gets SCHEDULER_JITTER seconds of jitter, and jobs run on a pool
+of SCHEDULER_WORKERS threads (coalesced, one instance per job). The mood
+pipeline is async, so it is handed to the app's event loop. Only one worker
+process runs the scheduler: the first to take a file lock next to the DB.
+The others serve from the same snapshot and summary tables.
+"""
+from __future__ import annotations
+from datetime import date, datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio, os, random
+
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.date import DateTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+from sqlmodel import Session, select
+
+from . import calendar_snapshot, tracing
+from .calendar_client import percent_done_from_user_input
+from .file_lock import FileLock
+from .model import DaySummary, User
+from .settings import engine, settings
+
+ENABLED = os.getenv("SCHEDULER_ENABLED", "1") not in ("0", "false", "no")
+DAY_START = os.getenv("SCHEDULER_DAY_START", "08:00")  # server local time
+PREWARM_LEAD = int(os.getenv("SCHEDULER_PREWARM_LEAD", "10"))  # minutes before DAY_START
+SNAPSHOT_INTERVAL = float(os.getenv("SCHEDULER_SNAPSHOT_INTERVAL", "600"))
+MOOD_INTERVAL = float(os.getenv("SCHEDULER_MOOD_INTERVAL", "900"))
+JITTER = int(os.getenv("SCHEDULER_JITTER", "30"))
+WORKERS = int(os.getenv("SCHEDULER_WORKERS", "4"))
+EVENT_END_DELAY = 30  # seconds after an event ends, so late edits to it are seen
+
+RefreshMood = Callable[[int, dict], Awaitable[Any]]
+
+
+def _active_users() -> List[User]:
+    with Session(engine) as s:
+        return [u for u in s.exec(select(User)).all() if u.google_tokens]
+
+
+class Prewarmer:
+    def __init__(self):
+        self._scheduler: Optional[BackgroundScheduler] = None
+        self._lock = FileLock(f"{settings.DB_PATH}.scheduler.lock")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._refresh_mood: Optional[RefreshMood] = None
+
+    @property
+    def running(self) -> bool:
+        return self._scheduler is not None
+
+    def start(self, loop: asyncio.AbstractEventLoop, refresh_mood: RefreshMood) -> bool:
+        """Start the jobs unless disabled or another worker already runs them."""
+        if not ENABLED or self._scheduler or not self._lock.acquire(blocking=False):
+            return False
+        self._loop, self._refresh_mood = loop, refresh_mood
+        self._scheduler = BackgroundScheduler(
+            executors={"default": ThreadPoolExecutor(WORKERS)},
+            job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": 300},
+        )
+        hour, minute = (int(x) for x in DAY_START.split(":"))
+        before = datetime(2000, 1, 1, hour, minute) - timedelta(minutes=PREWARM_LEAD)
+        self._scheduler.add_job(
+            self.refresh_snapshots, CronTrigger(hour=before.hour, minute=before.minute, jitter=JITTER),
+            id="snapshots:day-start",
+        )
+        self._scheduler.add_job(
+            self.refresh_snapshots, IntervalTrigger(seconds=SNAPSHOT_INTERVAL, jitter=JITTER),
+            id="snapshots:interval", next_run_time=datetime.now(),  # also plans today's event-end jobs
+        )
+        self._scheduler.add_job(
+            self.precompute_moods, IntervalTrigger(seconds=MOOD_INTERVAL, jitter=JITTER),
+            id="mood:interval", next_run_time=datetime.now() + timedelta(seconds=random.uniform(0, JITTER)),
+        )
+        self._scheduler.start()
+        return True
+
+    def stop(self) -> None:
+        if self._scheduler:
+            self._scheduler.shutdown(wait=False)
+            self._scheduler = None
+        self._lock.release()
+
+    # jobs (run on the scheduler's thread pool)
+
+    def refresh_snapshots(self) -> None:
+        for user in _active_users():
+            try:
+                with tracing.span("job refresh_snapshot", user_id=user.id):
+                    events = calendar_snapshot.refresh(user.id, user.google_tokens)
+            except Exception as e:
+                print(f"Calendar snapshot for user {user.id} failed:", repr(e))
+                continue
+            self._plan_event_ends(user.id, events)
+
+    def _plan_event_ends(self, user_id: int, events: List[Dict[str, Any]]) -> None:
+        now = datetime.now().astimezone()
+        for e in events:
+            end = datetime.fromisoformat(e["end"].replace("Z", "+00:00")).astimezone(now.tzinfo)
+            if end <= now:
+                continue
+            # DateTrigger has no jitter: spread it here
+            run_at = end + timedelta(seconds=EVENT_END_DELAY + random.uniform(0, JITTER))
+            self._scheduler.add_job(
+                self.event_ended, DateTrigger(run_date=run_at), args=[user_id],
+                id=f"event-end:{user_id}:{e['id']}", replace_existing=True,
+            )
+
+    def event_ended(self, user_id: int) -> None:
+        with Session(engine) as s:
+            user = s.get(User, user_id)
+        if not user or not user.google_tokens:
+            return
+        with tracing.span("job event_ended", user_id=user_id):
+            try:
+                calendar_snapshot.refresh(user_id, user.google_tokens)
+            except Exception as e:
+                print(f"Calendar snapshot for user {user_id} failed:", repr(e))
+            self._precompute_mood(user)
+
+    def precompute_moods(self) -> None:
+        for user in _active_users():
+            self._precompute_mood(user)
+
+    def _precompute_mood(self, user: User) -> None:
+        with tracing.span("job precompute_mood", user_id=user.id) as span:
+            try:
+                past = calendar_snapshot.past_events_today(user.id, user.google_tokens)
+                with Session(engine) as s:
+                    pct = percent_done_from_user_input(user.id, user.google_tokens, s, past_events=past)
+                    row = s.exec(
+                        select(DaySummary).where(DaySummary.user_id == user.id, DaySummary.day == date.today())
+                    ).first()
+                if row and row.percent_done == pct:
+                    span.set(skipped=True)
+                    return  # nothing changed since the last mood
+                asyncio.run_coroutine_threadsafe(
+                    self._refresh_mood(user.id, user.google_tokens), self._loop
+                ).result()
+            except Exception as e:
+                print(f"Mood precompute for user {user.id} failed:", repr(e))
+
+
+prewarmer = Prewarmer()
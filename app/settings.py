@@ -1,4 +1,5 @@
 import os
+from sqlalchemy import event
 from sqlmodel import create_engine
 from dotenv import load_dotenv
 import os
@@ -14,6 +15,18 @@ class Settings:
     SLACK_CLIENT_ID = os.getenv("SLACK_CLIENT_ID", "")
     SLACK_CLIENT_SECRET = os.getenv("SLACK_CLIENT_SECRET", "")
     SLACK_REDIRECT_URI = os.getenv("SLACK_REDIRECT_URI", "http://localhost:8000/auth/slack/callback")
+    # Seconds a refresh result is reused before the pipeline runs again
+    REFRESH_MIN_INTERVAL = float(os.getenv("REFRESH_MIN_INTERVAL", "10"))
+    SLACK_SUMMARY_MIN_INTERVAL = float(os.getenv("SLACK_SUMMARY_MIN_INTERVAL", "60"))
 
 settings = Settings()
-engine = create_engine(f"sqlite:///{settings.DB_PATH}")
+engine = create_engine(f"sqlite:///{settings.DB_PATH}", connect_args={"timeout": 30})
+
+@event.listens_for(engine, "connect")
+def _sqlite_pragmas(dbapi_conn, _):
+    # WAL lets worker processes read while another writes; busy waits instead of "database is locked"
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute("PRAGMA synchronous=NORMAL")
+    cur.execute("PRAGMA busy_timeout=30000")
+    cur.close()
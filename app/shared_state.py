@@ -0,0 +1,39 @@
+"""
+Cross-process cache invalidation.
+
+Caches (credentials, live status) live in each worker process. A writer bumps
+a named generation counter in SQLite; other workers compare it with the
+generation they loaded and reload when it moved. Reading a counter is a
+primary-key lookup, so callers can afford to check it every second or so.
+"""
+from __future__ import annotations
+from typing import Dict, Iterable
+
+from sqlalchemy.dialects.sqlite import insert
+
+from .model import SharedCounter
+from .settings import engine
+
+
+def bump(name: str) -> None:
+    stmt = insert(SharedCounter).values(name=name, value=1)
+    stmt = stmt.on_conflict_do_update(index_elements=["name"], set_={"value": SharedCounter.value + 1})
+    with engine.begin() as conn:
+        conn.execute(stmt)
+
+
+def generation(name: str) -> int:
+    return generations([name]).get(name, 0)
+
+
+def generations(names: Iterable[str]) -> Dict[str, int]:
+    names = list(names)
+    if not names:
+        return {}
+    marks = ",".join("?" * len(names))
+    with engine.connect() as conn:
+        rows = conn.exec_driver_sql(
+            f"SELECT name, value FROM sharedcounter WHERE name IN ({marks})", tuple(names)
+        ).fetchall()
+    found = dict(rows)
+    return {n: found.get(n, 0) for n in names}
@@ -0,0 +1,127 @@
+"""
+Single-flight request coalescing.
+
+Concurrent calls with the same key share one in-flight computation and all
+get its result (or its exception). A successful result is also reused for
+`min_interval` seconds, so double-fired requests and several polling tabs
+cost one pipeline run. Results are shared between callers: don't mutate them.
+
+SingleFlight is for `async def` endpoints; ThreadSingleFlight for plain
+`def` endpoints, which FastAPI runs on its threadpool. Given a `name`, calls
+are counted in the cache metrics: a miss runs `fn`, a hit reuses a recent or
+in-flight result.
+"""
+from __future__ import annotations
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
+import asyncio, threading, time
+
+from . import metrics
+
+T = TypeVar("T")
+
+
+def _count(name: str, hit: bool) -> None:
+    if name:
+        metrics.cache(name, hit)
+
+
+class SingleFlight:
+    def __init__(self, min_interval: float = 0.0, name: str = ""):
+        self.min_interval = min_interval
+        self.name = name
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._last: Dict[Hashable, Tuple[float, Any]] = {}
+        self._generation = 0
+
+    def _fresh(self, key: Hashable) -> Optional[Tuple[float, Any]]:
+        last = self._last.get(key)
+        if last and time.monotonic() - last[0] < self.min_interval:
+            return last
+        return None
+
+    async def _run(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        generation = self._generation
+        try:
+            result = await fn()
+            # A forget() during the run means the result may already be stale
+            if generation == self._generation:
+                self._last[key] = (time.monotonic(), result)
+            return result
+        finally:
+            if self._inflight.get(key) is asyncio.current_task():
+                del self._inflight[key]
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        fresh = self._fresh(key)
+        if fresh:
+            _count(self.name, True)
+            return fresh[1]
+        fut = self._inflight.get(key)
+        leader = fut is None or fut.get_loop() is not asyncio.get_running_loop()
+        _count(self.name, not leader)
+        if leader:
+            fut = asyncio.ensure_future(self._run(key, fn))
+            # Retrieve the exception even if every waiter went away
+            fut.add_done_callback(lambda f: f.cancelled() or f.exception())
+            self._inflight[key] = fut
+        # A caller that disconnects must not cancel the run the others are waiting on
+        return await asyncio.shield(fut)
+
+    def forget(self, *keys: Hashable) -> None:
+        """Drop cached results (e.g. after a write that changes them)."""
+        self._generation += 1
+        for key in keys:
+            self._last.pop(key, None)
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ThreadSingleFlight:
+    def __init__(self, min_interval: float = 0.0, name: str = ""):
+        self.min_interval = min_interval
+        self.name = name
+        self._lock = threading.Lock()
+        self._inflight: Dict[Hashable, _Call] = {}
+        self._last: Dict[Hashable, Tuple[float, Any]] = {}
+        self._generation = 0
+
+    def do(self, key: Hashable, fn: Callable[[], T]) -> T:
+        with self._lock:
+            last = self._last.get(key)
+            if last and time.monotonic() - last[0] < self.min_interval:
+                _count(self.name, True)
+                return last[1]
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _Call()
+                generation = self._generation
+        _count(self.name, not leader)
+        if leader:
+            try:
+                call.result = fn()
+                with self._lock:
+                    if generation == self._generation:
+                        self._last[key] = (time.monotonic(), call.result)
+            except BaseException as e:
+                call.error = e
+            finally:
+                with self._lock:
+                    self._inflight.pop(key, None)
+                call.done.set()
+        else:
+            call.done.wait()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    def forget(self, *keys: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            for key in keys:
+                self._last.pop(key, None)
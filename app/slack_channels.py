@@ -0,0 +1,182 @@
+"""
+Activity-ranked Slack channel index.
+
+conversations.list is paginated in full at most once per
+SLACK_CHANNEL_LIST_INTERVAL; every channel sync in slack_store updates that
+channel's last-message ts and message counts over the last 1h / 24h / 7d.
+top_channels() ranks member conversations by that activity, so callers can
+preselect channels deterministically instead of asking the model to pick.
+
+Counts are decayed by their age (activity_at): a count over a window is
+scaled down linearly as the window passes, so a channel that was busy long
+ago doesn't keep its rank. stale_channels() names the member conversations
+whose counters are oldest (never-synced first); slack_store.refresh_activity
+syncs a few of them per ranking request so channels nobody fetches still get
+counted.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+import asyncio, os, time
+
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from . import slack_client
+from .model import SlackChannel, SlackMessage
+from .settings import engine
+
+LIST_INTERVAL = float(os.getenv("SLACK_CHANNEL_LIST_INTERVAL", "3600"))
+LIST_TYPES = "public_channel,private_channel,im,mpim"
+PAGE_SIZE = 200
+MAX_PAGES = 50
+WINDOWS = {"msgs_1h": 3600, "msgs_24h": 86400, "msgs_7d": 7 * 86400}
+STALE_AFTER = float(os.getenv("SLACK_ACTIVITY_STALE_AFTER", "3600"))
+
+_lock: Optional[asyncio.Lock] = None
+_lock_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _refresh_lock() -> asyncio.Lock:
+    global _lock, _lock_loop
+    loop = asyncio.get_running_loop()
+    if _lock is None or _lock_loop is not loop:
+        _lock, _lock_loop = asyncio.Lock(), loop
+    return _lock
+
+
+def _row(ch: Dict[str, Any], now: float) -> Dict[str, Any]:
+    is_im, is_mpim = bool(ch.get("is_im")), bool(ch.get("is_mpim"))
+    return {
+        "channel_id": ch["id"],
+        "name": ch.get("name") or ch.get("user"),
+        "is_channel": bool(ch.get("is_channel")),
+        "is_group": bool(ch.get("is_group")),
+        "is_im": is_im,
+        "is_mpim": is_mpim,
+        "is_private": bool(ch.get("is_private")),
+        # DMs don't carry is_member; you're always in them
+        "is_member": bool(ch.get("is_member", is_im or is_mpim)),
+        "listed_at": now,
+    }
+
+
+def listed_at() -> float:
+    with Session(engine) as s:
+        return s.exec(select(func.max(SlackChannel.listed_at))).one() or 0.0
+
+
+def _store(rows: List[Dict[str, Any]], now: float, complete: bool) -> None:
+    stmt = insert(SlackChannel).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["channel_id"],
+        set_={c: stmt.excluded[c] for c in rows[0] if c != "channel_id"},
+    )
+    with engine.begin() as conn:
+        conn.execute(stmt)
+        if complete:
+            # Complete listing: drop channels that were archived or left
+            conn.execute(delete(SlackChannel).where(SlackChannel.listed_at < now))
+
+
+async def refresh_channels(token: str, force: bool = False) -> int:
+    """Full conversations.list pass if the index is stale; returns calls made."""
+    async with _refresh_lock():
+        now = time.time()
+        if not force and now - await asyncio.to_thread(listed_at) < LIST_INTERVAL:
+            return 0
+        rows: List[Dict[str, Any]] = []
+        cursor, calls = None, 0
+        while calls < MAX_PAGES:
+            resp = await slack_client.call(
+                token, "conversations.list",
+                types=LIST_TYPES, exclude_archived="true", limit=PAGE_SIZE, cursor=cursor,
+            )
+            calls += 1
+            rows.extend(_row(ch, now) for ch in resp.get("channels", []) if ch.get("id"))
+            cursor = (resp.get("response_metadata") or {}).get("next_cursor")
+            if not cursor:
+                break
+        if rows:
+            await asyncio.to_thread(_store, rows, now, complete=not cursor)
+        return calls
+
+
+def update_activity(channel_id: str, now: Optional[float] = None) -> None:
+    """Recompute one channel's counters from the message store (called after each sync)."""
+    now = now or time.time()
+    counts = {
+        col: func.count().filter(SlackMessage.ts > f"{now - secs:.6f}")
+        for col, secs in WINDOWS.items()
+    }
+    stmt = select(func.max(SlackMessage.ts), *counts.values()).where(SlackMessage.channel_id == channel_id)
+    with Session(engine) as s:
+        last_ts, *values = s.exec(stmt).one()
+        ch = s.get(SlackChannel, channel_id) or SlackChannel(channel_id=channel_id, is_member=True)
+        ch.last_message_ts = last_ts
+        for col, value in zip(counts, values):
+            setattr(ch, col, value or 0)
+        ch.activity_at = now
+        s.add(ch)
+        s.commit()
+
+
+def _matches_types(ch: SlackChannel, types: str) -> bool:
+    wanted = set(types.split(","))
+    if ch.is_im:
+        return "im" in wanted
+    if ch.is_mpim:
+        return "mpim" in wanted
+    if ch.is_private:
+        return "private_channel" in wanted
+    return "public_channel" in wanted
+
+
+def _activity_key(ch: SlackChannel, now: float):
+    age = max(0.0, now - (ch.activity_at or 0.0))
+    decayed = tuple(getattr(ch, col) * max(0.0, 1 - age / secs) for col, secs in WINDOWS.items())
+    return (*decayed, ch.last_message_ts or "")
+
+
+def ranked_channels(types: str = LIST_TYPES, member_only: bool = False) -> List[SlackChannel]:
+    """Indexed conversations, most active first (never-synced ones last, by name)."""
+    with Session(engine) as s:
+        rows = s.exec(select(SlackChannel).order_by(SlackChannel.name)).all()
+    rows = [ch for ch in rows if _matches_types(ch, types) and (ch.is_member or not member_only)]
+    now = time.time()
+    rows.sort(key=lambda ch: _activity_key(ch, now), reverse=True)
+    return rows
+
+
+def stale_channels(k: int, types: str = LIST_TYPES) -> List[str]:
+    """Ids of up to k member conversations whose counters are older than
+    STALE_AFTER, least recently counted first."""
+    cutoff = time.time() - STALE_AFTER
+    with Session(engine) as s:
+        rows = s.exec(
+            select(SlackChannel)
+            .where(SlackChannel.activity_at < cutoff)
+            .order_by(SlackChannel.activity_at, SlackChannel.name)
+        ).all()
+    return [ch.channel_id for ch in rows if ch.is_member and _matches_types(ch, types)][:k]
+
+
+def top_channels(k: int, types: str = LIST_TYPES) -> List[SlackChannel]:
+    """The k member conversations with the most recent activity."""
+    return ranked_channels(types, member_only=True)[:k]
+
+
+def to_dict(ch: SlackChannel) -> Dict[str, Any]:
+    return {
+        "id": ch.channel_id,
+        "name": ch.name,
+        "is_channel": ch.is_channel,
+        "is_group": ch.is_group,
+        "is_im": ch.is_im,
+        "is_private": ch.is_private,
+        "is_member": ch.is_member,
+        "last_message_ts": ch.last_message_ts,
+        "msgs_1h": ch.msgs_1h,
+        "msgs_24h": ch.msgs_24h,
+        "msgs_7d": ch.msgs_7d,
+    }
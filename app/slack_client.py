@@ -0,0 +1,93 @@
+"""
+Shared async Slack Web API access.
+
+One AsyncWebClient (and aiohttp session) per token, and a per-method
+scheduler that keeps each Web API method under its rate-limit tier and backs
+off on 429 + Retry-After. Many channels can then be fetched with
+asyncio.gather and simply queue up to the allowed rate.
+"""
+from __future__ import annotations
+from typing import Any, Dict, Tuple
+import asyncio, os
+
+import aiohttp
+from slack_sdk.errors import SlackApiError
+from slack_sdk.web.async_client import AsyncWebClient
+
+from . import metrics
+from .rate_limit import TokenBucket
+
+SLACK_API_URL = os.getenv("SLACK_API_URL", "https://slack.com/api/")
+MAX_RETRIES = int(os.getenv("SLACK_MAX_RETRIES", "3"))
+
+# Web API tiers, requests per minute (https://api.slack.com/apis/rate-limits)
+TIER_PER_MINUTE = {1: 1, 2: 20, 3: 50, 4: 100}
+METHOD_TIERS = {
+    "conversations.list": 2,
+    "conversations.history": 3,
+    "conversations.replies": 3,
+    "conversations.info": 3,
+    "users.list": 2,
+    "users.info": 4,
+}
+DEFAULT_TIER = 3
+
+_clients: Dict[str, Tuple[asyncio.AbstractEventLoop, AsyncWebClient]] = {}
+_limiters: Dict[Tuple[str, str], Tuple[asyncio.AbstractEventLoop, TokenBucket]] = {}
+
+
+def get_client(token: str) -> AsyncWebClient:
+    """The shared client for this token (re-created if the event loop changed)."""
+    loop = asyncio.get_running_loop()
+    cached = _clients.get(token)
+    if cached and cached[0] is loop and not loop.is_closed():
+        return cached[1]
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=20, keepalive_timeout=60))
+    client = AsyncWebClient(token=token, base_url=SLACK_API_URL, session=session)
+    _clients[token] = (loop, client)
+    return client
+
+
+def _limiter(token: str, method: str) -> TokenBucket:
+    loop = asyncio.get_running_loop()
+    cached = _limiters.get((token, method))
+    if cached and cached[0] is loop:
+        return cached[1]
+    lim = TokenBucket(TIER_PER_MINUTE[METHOD_TIERS.get(method, DEFAULT_TIER)])
+    _limiters[(token, method)] = (loop, lim)
+    return lim
+
+
+def _retry_after(e: SlackApiError) -> float:
+    headers = e.response.headers or {}
+    value = headers.get("Retry-After") or headers.get("retry-after") or "1"
+    try:
+        return float(value if not isinstance(value, list) else value[0])
+    except ValueError:
+        return 1.0
+
+
+async def call(token: str, method: str, **params: Any) -> Dict[str, Any]:
+    """Call a Web API method (e.g. "conversations.history") under the rate scheduler."""
+    params = {k: v for k, v in params.items() if v is not None}
+    client = get_client(token)
+    limiter = _limiter(token, method)
+    for attempt in range(MAX_RETRIES + 1):
+        await limiter.acquire()
+        try:
+            with metrics.upstream("slack", method):
+                resp = await client.api_call(method, http_verb="GET", params=params)
+            return resp.data
+        except SlackApiError as e:
+            if e.response.status_code != 429 or attempt == MAX_RETRIES:
+                raise
+            limiter.block(_retry_after(e))
+    raise RuntimeError(f"Slack {method}: rate limited")
+
+
+async def close() -> None:
+    """Close the pooled sessions (app shutdown)."""
+    for loop, client in list(_clients.values()):
+        if client.session and not client.session.closed and loop is asyncio.get_running_loop():
+            await client.session.close()
+    _clients.clear()
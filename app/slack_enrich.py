@@ -0,0 +1,162 @@
+"""
+Slack message enrichment: user display names and thread replies.
+
+User ids are resolved through a TTL cache (SLACK_USER_TTL). A handful of
+unknown ids are looked up with users.info concurrently; more than
+USERS_LIST_THRESHOLD at once triggers one paginated users.list pass that
+fills the whole cache; if that fails (e.g. missing_scope) the ids stay raw.
+Threads active in the requested window (a reply in it, wherever the parent
+is) have their replies fetched concurrently with conversations.replies (from
+the window start, keeping the newest REPLIES_PER_THREAD). Replies are cached
+per (channel, thread_ts, window start) and reused while the thread's known
+latest_reply hasn't moved, for at most SLACK_REPLIES_TTL: the stored parent's
+latest_reply is only refreshed by syncs, so the TTL bounds how long a new
+reply can go unseen. Each fetch writes the parent's fresh reply_count and
+latest_reply back to the message store.
+"""
+from __future__ import annotations
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import asyncio, os, time
+
+from slack_sdk.errors import SlackApiError
+
+from . import metrics, slack_client, slack_store
+
+USER_TTL = float(os.getenv("SLACK_USER_TTL", "3600"))
+REPLIES_TTL = float(os.getenv("SLACK_REPLIES_TTL", "60"))
+USERS_LIST_THRESHOLD = 20
+MAX_THREADS = 10
+REPLIES_PER_THREAD = 20
+REPLY_PAGES = 5  # conversations.replies pages of 200 read per thread at most
+REPLY_CACHE_SIZE = 500
+MAX_REPLY_TEXT = 500
+
+_users: Dict[str, Tuple[str, float]] = {}  # user id -> (display name, expires at)
+# (channel, thread_ts, window start) -> (latest_reply, fetched at, replies)
+_replies: "OrderedDict[Tuple[str, str, str], Tuple[str, float, List[Dict[str, Any]]]]" = OrderedDict()
+
+
+def _display_name(user: Dict[str, Any]) -> str:
+    profile = user.get("profile") or {}
+    return profile.get("display_name") or profile.get("real_name") or user.get("real_name") or user.get("name") or user.get("id", "")
+
+
+def _remember(user: Dict[str, Any], expires: float) -> None:
+    if user.get("id"):
+        _users[user["id"]] = (_display_name(user), expires)
+
+
+async def _users_list(token: str) -> bool:
+    expires = time.time() + USER_TTL
+    cursor = None
+    while True:
+        try:
+            resp = await slack_client.call(token, "users.list", limit=200, cursor=cursor)
+        except SlackApiError as e:
+            print("Slack users.list failed:", e.response.get("error"))
+            return False
+        for user in resp.get("members", []):
+            _remember(user, expires)
+        cursor = (resp.get("response_metadata") or {}).get("next_cursor")
+        if not cursor:
+            return True
+
+
+async def _users_info(token: str, user_id: str) -> None:
+    try:
+        resp = await slack_client.call(token, "users.info", user=user_id)
+        _remember(resp.get("user") or {}, time.time() + USER_TTL)
+    except Exception:
+        # Bots and deleted users: keep the raw id, but don't ask again until the TTL runs out
+        _users[user_id] = (user_id, time.time() + USER_TTL)
+
+
+async def resolve_users(token: str, user_ids: Iterable[Optional[str]]) -> Dict[str, str]:
+    """id -> display name for every id (unknown ids map to themselves)."""
+    ids = {u for u in user_ids if u}
+    now = time.time()
+    missing = {u for u in ids if u not in _users or _users[u][1] < now}
+    metrics.cache("slack_users", True, len(ids) - len(missing))
+    metrics.cache("slack_users", False, len(missing))
+    if len(missing) > USERS_LIST_THRESHOLD:
+        if not await _users_list(token):
+            # users.info would fail the same way, for every id: keep them raw
+            return {u: u if u in missing else _users[u][0] for u in ids}
+        missing = {u for u in missing if u not in _users or _users[u][1] < now}
+    if missing:
+        await asyncio.gather(*(_users_info(token, u) for u in missing))
+    return {u: _users.get(u, (u, 0.0))[0] for u in ids}
+
+
+def _active_threads(messages: List[Dict[str, Any]], oldest_ts: Optional[str]) -> List[Dict[str, Any]]:
+    threads = [
+        m for m in messages
+        if m.get("reply_count") and m.get("thread_ts") == m.get("ts")
+        and (not oldest_ts or (m.get("latest_reply") or m["ts"]) > oldest_ts)
+    ]
+    # Most recently active first
+    threads.sort(key=lambda m: m.get("latest_reply") or m["ts"], reverse=True)
+    return threads[:MAX_THREADS]
+
+
+async def _thread_replies(token: str, channel_id: str, parent: Dict[str, Any],
+                          oldest_ts: Optional[str] = None) -> List[Dict[str, Any]]:
+    key = (channel_id, parent["ts"], oldest_ts or "")
+    known = parent.get("latest_reply") or ""
+    cached = _replies.get(key)
+    hit = cached is not None and cached[0] >= known and time.time() - cached[1] < REPLIES_TTL
+    metrics.cache("slack_replies", hit)
+    if hit:
+        _replies.move_to_end(key)
+        return cached[2]
+    # Replies come oldest first: start at the window and read to the end of the
+    # thread, so the newest ones (the ones in the window) are what's kept.
+    raw: List[Dict[str, Any]] = []
+    cursor = None
+    try:
+        for _ in range(REPLY_PAGES):
+            resp = await slack_client.call(token, "conversations.replies", channel=channel_id, ts=parent["ts"],
+                                           oldest=oldest_ts, limit=200, cursor=cursor)
+            raw += resp.get("messages", [])
+            cursor = (resp.get("response_metadata") or {}).get("next_cursor")
+            if not cursor:
+                break
+    except Exception:
+        return []
+    replies = [
+        {"ts": r["ts"], "user": r.get("user") or r.get("bot_id"), "text": (r.get("text") or "")[:MAX_REPLY_TEXT]}
+        for r in raw if r.get("ts") and r["ts"] != parent["ts"] and (not oldest_ts or r["ts"] >= oldest_ts)
+    ][-REPLIES_PER_THREAD:]
+    head = next((r for r in raw if r.get("ts") == parent["ts"]), None)
+    latest = max([known, (head or {}).get("latest_reply") or "", *(r["ts"] for r in replies)])
+    if latest != known:
+        parent["latest_reply"] = latest
+        if head is not None:
+            parent["reply_count"] = head.get("reply_count") or parent.get("reply_count")
+            await asyncio.to_thread(slack_store.upsert_messages, channel_id, [{**head, "latest_reply": latest}])
+    _replies[key] = (latest, time.time(), replies)
+    _replies.move_to_end(key)
+    while len(_replies) > REPLY_CACHE_SIZE:
+        _replies.popitem(last=False)
+    return replies
+
+
+async def enrich_messages(token: str, channel_id: str, messages: List[Dict[str, Any]],
+                          oldest_ts: Optional[str] = None, expand_threads: bool = True,
+                          resolve_names: bool = True) -> List[Dict[str, Any]]:
+    """Attach `replies` to active threads and `user_name` to messages and replies (in place)."""
+    if expand_threads:
+        threads = _active_threads(messages, oldest_ts)
+        fetched = await asyncio.gather(*(_thread_replies(token, channel_id, m, oldest_ts) for m in threads))
+        for parent, replies in zip(threads, fetched):
+            parent["replies"] = [dict(r) for r in replies]
+    if resolve_names:
+        everyone = [m.get("user") for m in messages]
+        everyone += [r.get("user") for m in messages for r in m.get("replies", [])]
+        names = await resolve_users(token, everyone)
+        for m in messages:
+            for item in [m, *m.get("replies", [])]:
+                if item.get("user"):
+                    item["user_name"] = names.get(item["user"], item["user"])
+    return messages
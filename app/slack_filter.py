@@ -0,0 +1,115 @@
+"""
+Noise filtering for Slack messages before they reach the model.
+
+Two linear-time passes:
+  1. drop housekeeping subtypes (joins/leaves, topic changes, ...), see
+     SLACK_DROP_SUBTYPES;
+  2. collapse near-duplicates (repeated CI/bot alerts that differ only in a
+     build number or timestamp). Each message gets a 64-bit SimHash over its
+     normalized words and word pairs; the hash is split into LSH bands so a
+     message is only compared with representatives that share a band, and it
+     joins the first one within SLACK_SIMHASH_DISTANCE bits. The
+     representative keeps a `dup_count`. An identical hash is a dict lookup;
+     otherwise only the newest BUCKET_CANDIDATES representatives of each
+     band are checked, which keeps a channel full of short, similar bot
+     messages (many representatives sharing a band) linear.
+Token counts are estimated at ~4 characters per token.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Tuple
+import functools, hashlib, os, re
+
+DEFAULT_DROP_SUBTYPES = (
+    "channel_join,channel_leave,group_join,group_leave,channel_topic,channel_purpose,"
+    "channel_name,channel_archive,channel_unarchive,pinned_item,unpinned_item,"
+    "bot_add,bot_remove,reminder_add"
+)
+DROP_SUBTYPES = frozenset(s.strip() for s in os.getenv("SLACK_DROP_SUBTYPES", DEFAULT_DROP_SUBTYPES).split(",") if s.strip())
+MAX_DISTANCE = int(os.getenv("SLACK_SIMHASH_DISTANCE", "3"))
+BANDS = 4  # 4 x 16 bits: any pair within 3 bits shares at least one band exactly
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+BUCKET_CANDIDATES = 8  # representatives compared per band, newest first
+
+_URL = re.compile(r"https?://\S+|<https?://[^>]+>")
+_MENTION = re.compile(r"<[@#!][^>]+>")
+_NUM = re.compile(r"\d+")
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    return (len(text) + 3) // 4
+
+
+def _features(text: str) -> List[str]:
+    text = _URL.sub(" url ", text.lower())
+    text = _MENTION.sub(" mention ", text)
+    words = _WORD.findall(_NUM.sub("0", text))
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+@functools.lru_cache(maxsize=65536)  # channel vocabularies repeat heavily
+def _hash64(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> int:
+    features = _features(text)
+    if not features:
+        return 0
+    # Column-wise bit counts over the feature hashes (string ops keep this out of a per-bit Python loop)
+    rows = [format(_hash64(f), "064b") for f in features]
+    half = len(rows) / 2
+    bits = "".join("1" if col.count("1") > half else "0" for col in map("".join, zip(*rows)))
+    return int(bits, 2)
+
+
+def _bands(h: int) -> List[Tuple[int, int]]:
+    return [(i, (h >> (i * BAND_BITS)) & BAND_MASK) for i in range(BANDS)]
+
+
+def _message_tokens(m: Dict[str, Any]) -> int:
+    return estimate_tokens(m.get("text") or "") + sum(estimate_tokens(r.get("text") or "") for r in m.get("replies", []))
+
+
+def filter_messages(messages: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """Returns (kept messages in their original order, stats)."""
+    stats = {"input": len(messages), "dropped_subtypes": 0, "duplicates": 0, "tokens_removed": 0, "tokens_kept": 0}
+    kept: List[Dict[str, Any]] = []
+    buckets: Dict[Tuple[int, int], List[Tuple[int, Dict[str, Any]]]] = {}
+    exact: Dict[int, Dict[str, Any]] = {}
+    for m in messages:
+        tokens = _message_tokens(m)
+        if m.get("subtype") in DROP_SUBTYPES:
+            stats["dropped_subtypes"] += 1
+            stats["tokens_removed"] += tokens
+            continue
+        text = m.get("text") or ""
+        if not text.strip() or m.get("replies"):
+            # Threads carry their own context; never fold them into another message
+            kept.append(m)
+            stats["tokens_kept"] += tokens
+            continue
+        h = simhash(text)
+        rep = exact.get(h)
+        if rep is None:
+            for band in _bands(h):
+                for rep_hash, candidate in reversed(buckets.get(band, [])[-BUCKET_CANDIDATES:]):
+                    if bin(h ^ rep_hash).count("1") <= MAX_DISTANCE:
+                        rep = candidate
+                        break
+                if rep is not None:
+                    break
+        if rep is not None:
+            rep["dup_count"] = rep.get("dup_count", 1) + 1
+            rep["dup_oldest_ts"] = min(rep.get("dup_oldest_ts", rep["ts"]), m.get("ts") or rep["ts"], key=float)
+            stats["duplicates"] += 1
+            stats["tokens_removed"] += tokens
+            continue
+        exact[h] = m
+        for band in _bands(h):
+            buckets.setdefault(band, []).append((h, m))
+        kept.append(m)
+        stats["tokens_kept"] += tokens
+    stats["output"] = len(kept)
+    return kept, stats
@@ -0,0 +1,323 @@
+"""
+Local Slack message store.
+
+Messages pulled through conversations.history are kept in SQLite with a
+per-channel `latest_ts` watermark, so each sync only asks Slack for messages
+newer than what we already have (`oldest` + cursor pagination until
+`has_more` is false). Channels synced within SLACK_SYNC_INTERVAL cost no
+upstream calls at all (each sync also refreshes the channel's activity in
+slack_channels). Every SLACK_RECONCILE_INTERVAL the last
+SLACK_RECONCILE_HOURS are re-read to pick up edits and deletions.
+
+Stored messages are indexed in an FTS5 table (kept in sync by triggers) for
+BM25-ranked search. The SQLite functions are blocking: async code calls them
+through asyncio.to_thread.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Set, Tuple
+import asyncio, os, time
+
+from sqlalchemy import delete, text
+from sqlalchemy.dialects.sqlite import insert
+from sqlmodel import Session, select
+
+from . import slack_channels, slack_client
+from .model import SlackMessage, SlackChannelState
+from .settings import engine
+
+SYNC_INTERVAL = float(os.getenv("SLACK_SYNC_INTERVAL", "60"))
+RECONCILE_INTERVAL = float(os.getenv("SLACK_RECONCILE_INTERVAL", "900"))
+RECONCILE_HOURS = float(os.getenv("SLACK_RECONCILE_HOURS", "24"))
+BACKFILL_HOURS = float(os.getenv("SLACK_BACKFILL_HOURS", "72"))
+PAGE_SIZE = 200
+MAX_PAGES = 20
+ACTIVITY_PROBES = int(os.getenv("SLACK_ACTIVITY_PROBES", "3"))
+MAX_TEXT = 1000  # served text is truncated; the store keeps the full message
+
+_locks: Dict[str, asyncio.Lock] = {}
+
+# External-content FTS5 index over slackmessage.text, keyed by rowid.
+# (If the DB is ever VACUUMed, run INSERT INTO slackmessage_fts(slackmessage_fts) VALUES('rebuild').)
+_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS slackmessage_fts USING fts5(
+        text, content='slackmessage', content_rowid='rowid', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS slackmessage_fts_ai AFTER INSERT ON slackmessage BEGIN
+        INSERT INTO slackmessage_fts(rowid, text) VALUES (new.rowid, new.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS slackmessage_fts_ad AFTER DELETE ON slackmessage BEGIN
+        INSERT INTO slackmessage_fts(slackmessage_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS slackmessage_fts_au AFTER UPDATE ON slackmessage BEGIN
+        INSERT INTO slackmessage_fts(slackmessage_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+        INSERT INTO slackmessage_fts(rowid, text) VALUES (new.rowid, new.text);
+    END""",
+]
+
+
+def init_search_index() -> None:
+    """Create the FTS5 table + triggers (idempotent; indexes rows stored before it existed)."""
+    with engine.begin() as conn:
+        existed = conn.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE name = 'slackmessage_fts'"
+        ).first()
+        for ddl in _FTS_DDL:
+            conn.exec_driver_sql(ddl)
+        if not existed:
+            conn.exec_driver_sql("INSERT INTO slackmessage_fts(slackmessage_fts) VALUES ('rebuild')")
+
+
+def _row(channel_id: str, m: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "channel_id": channel_id,
+        "ts": m["ts"],
+        "user": m.get("user") or m.get("bot_id"),
+        "text": m.get("text") or "",
+        "subtype": m.get("subtype"),
+        "thread_ts": m.get("thread_ts"),
+        "reply_count": m.get("reply_count") or 0,
+        "latest_reply": m.get("latest_reply"),
+    }
+
+
+def upsert_messages(channel_id: str, messages: List[Dict[str, Any]]) -> int:
+    rows = [_row(channel_id, m) for m in messages if m.get("ts")]
+    if not rows:
+        return 0
+    stmt = insert(SlackMessage).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["channel_id", "ts"],
+        set_={c: stmt.excluded[c] for c in ("user", "text", "subtype", "thread_ts", "reply_count", "latest_reply")},
+    )
+    with engine.begin() as conn:
+        conn.execute(stmt)
+    return len(rows)
+
+
+def get_state(channel_id: str) -> Optional[SlackChannelState]:
+    with Session(engine) as s:
+        return s.get(SlackChannelState, channel_id)
+
+
+def _save_state(state: SlackChannelState) -> None:
+    with Session(engine) as s:
+        s.merge(state)
+        s.commit()
+
+
+async def _history(token: str, channel_id: str, max_pages: int = MAX_PAGES, **params: Any) -> Tuple[List[Dict[str, Any]], bool, int]:
+    """Follow the cursor; returns (messages, has_more_left, calls made)."""
+    messages: List[Dict[str, Any]] = []
+    cursor = None
+    calls = 0
+    has_more = False
+    while calls < max_pages:
+        resp = await slack_client.call(token, "conversations.history", channel=channel_id, limit=PAGE_SIZE, cursor=cursor, **params)
+        calls += 1
+        messages.extend(resp.get("messages", []))
+        has_more = bool(resp.get("has_more"))
+        cursor = (resp.get("response_metadata") or {}).get("next_cursor")
+        if not has_more or not cursor:
+            break
+    return messages, has_more, calls
+
+
+async def _backfill(token: str, channel_id: str, state: SlackChannelState) -> int:
+    """First sync: newest page(s) back to the backfill horizon."""
+    horizon = f"{time.time() - BACKFILL_HOURS * 3600:.6f}"
+    msgs, has_more, calls = await _history(token, channel_id, max_pages=1)
+    while has_more and msgs and min(m["ts"] for m in msgs) > horizon and calls < MAX_PAGES:
+        older, has_more, n = await _history(token, channel_id, max_pages=1, latest=min(m["ts"] for m in msgs))
+        calls += n
+        if not older:
+            break
+        msgs.extend(older)
+    await asyncio.to_thread(upsert_messages, channel_id, msgs)
+    state.latest_ts = max((m["ts"] for m in msgs), default="0")
+    state.covered_from = min((m["ts"] for m in msgs), default="0") if has_more else "0"
+    return calls
+
+
+def _drop_deleted(channel_id: str, window_start: str, seen: Set[str]) -> None:
+    with engine.begin() as conn:
+        stored = conn.execute(select(SlackMessage.ts).where(
+            SlackMessage.channel_id == channel_id,
+            SlackMessage.ts > window_start,
+        )).scalars().all()
+        gone = [ts for ts in stored if ts not in seen]
+        if gone:
+            conn.execute(delete(SlackMessage).where(SlackMessage.channel_id == channel_id, SlackMessage.ts.in_(gone)))
+
+
+async def _reconcile(token: str, channel_id: str, state: SlackChannelState) -> int:
+    """Re-read the recent window (from the watermark, if that is older, so no
+    gap is left): upsert edits, drop messages deleted upstream."""
+    window_start = f"{time.time() - RECONCILE_HOURS * 3600:.6f}"
+    start = min(window_start, state.latest_ts or window_start)
+    msgs, has_more, calls = await _history(token, channel_id, oldest=start)
+    await asyncio.to_thread(upsert_messages, channel_id, msgs)
+    seen = {m["ts"] for m in msgs if m.get("ts")}
+    if msgs:
+        state.latest_ts = max(state.latest_ts or "0", max(seen))
+    if has_more:
+        # Window not fully read: can't tell deletions from unread pages, and
+        # only the newest part is contiguous now (ensure_range fills the rest)
+        if msgs:
+            state.covered_from = min(seen)
+        return calls
+    await asyncio.to_thread(_drop_deleted, channel_id, start, seen)
+    return calls
+
+
+async def sync_channel(token: str, channel_id: str, force: bool = False) -> int:
+    """Bring one channel up to date; returns the number of upstream calls made."""
+    lock = _locks.setdefault(channel_id, asyncio.Lock())
+    async with lock:
+        now = time.time()
+        state = await asyncio.to_thread(get_state, channel_id) or SlackChannelState(channel_id=channel_id)
+        if not force and now - state.synced_at < SYNC_INTERVAL:
+            return 0
+        if state.latest_ts is None:
+            calls = await _backfill(token, channel_id, state)
+            state.reconciled_at = now
+        elif now - state.reconciled_at >= RECONCILE_INTERVAL:
+            calls = await _reconcile(token, channel_id, state)
+            state.reconciled_at = now
+        else:
+            msgs, has_more, calls = await _history(token, channel_id, oldest=state.latest_ts)
+            await asyncio.to_thread(upsert_messages, channel_id, msgs)
+            if msgs:
+                state.latest_ts = max(state.latest_ts, max(m["ts"] for m in msgs if m.get("ts")))
+                if has_more:
+                    # Page budget ran out: only the newest part is contiguous now
+                    state.covered_from = min(m["ts"] for m in msgs if m.get("ts"))
+        state.synced_at = now
+        await asyncio.to_thread(_save_state, state)
+        await asyncio.to_thread(slack_channels.update_activity, channel_id, now)
+        return calls
+
+
+async def refresh_activity(token: str, types: str = slack_channels.LIST_TYPES) -> int:
+    """Sync up to ACTIVITY_PROBES channels with the oldest activity counters
+    (round robin, never-synced first); returns upstream calls made."""
+    ids = await asyncio.to_thread(slack_channels.stale_channels, ACTIVITY_PROBES, types)
+    results = await asyncio.gather(*(sync_channel(token, c) for c in ids), return_exceptions=True)
+    calls = 0
+    for channel_id, result in zip(ids, results):
+        if isinstance(result, BaseException):
+            # e.g. not_in_channel: stamp it anyway so the next probes move on
+            await asyncio.to_thread(slack_channels.update_activity, channel_id)
+        else:
+            calls += result
+    return calls
+
+
+async def ensure_range(token: str, channel_id: str, oldest_ts: str) -> int:
+    """Fetch the gap when a caller asks for history older than the store covers."""
+    state = await asyncio.to_thread(get_state, channel_id)
+    if not state or state.covered_from is None or oldest_ts >= state.covered_from:
+        return 0
+    msgs, has_more, calls = await _history(token, channel_id, oldest=oldest_ts, latest=state.covered_from)
+    await asyncio.to_thread(upsert_messages, channel_id, msgs)
+    state.covered_from = min((m["ts"] for m in msgs), default=oldest_ts) if has_more else oldest_ts
+    await asyncio.to_thread(_save_state, state)
+    return calls
+
+
+def _message(r: SlackMessage) -> Dict[str, Any]:
+    return {
+        "ts": r.ts,
+        "user": r.user,
+        "text": r.text[:MAX_TEXT],
+        "subtype": r.subtype,
+        "thread_ts": r.thread_ts,
+        "reply_count": r.reply_count,
+        "latest_reply": r.latest_reply,
+    }
+
+
+def query_messages(channel_id: str, oldest_ts: Optional[str] = None, latest_ts: Optional[str] = None,
+                   limit: int = 100, cursor: Optional[str] = None) -> Dict[str, Any]:
+    """Newest-first page from the store, in the conversations.history response shape.
+    `cursor` is the ts to continue below (keyset pagination)."""
+    stmt = select(SlackMessage).where(SlackMessage.channel_id == channel_id)
+    if oldest_ts:
+        stmt = stmt.where(SlackMessage.ts > oldest_ts)
+    if latest_ts:
+        stmt = stmt.where(SlackMessage.ts < latest_ts)
+    if cursor:
+        stmt = stmt.where(SlackMessage.ts < cursor)
+    stmt = stmt.order_by(SlackMessage.ts.desc()).limit(limit + 1)
+    with Session(engine) as s:
+        rows = s.exec(stmt).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "ok": True,
+        "messages": [_message(r) for r in rows],
+        "has_more": has_more,
+        "response_metadata": {"next_cursor": rows[-1].ts if has_more and rows else None},
+    }
+
+
+def thread_parents(channel_id: str, oldest_ts: str, limit: int = 10) -> List[Dict[str, Any]]:
+    """Parents posted at or before `oldest_ts` whose threads got replies after it,
+    most recently active first."""
+    stmt = select(SlackMessage).where(
+        SlackMessage.channel_id == channel_id,
+        SlackMessage.ts <= oldest_ts,
+        SlackMessage.thread_ts == SlackMessage.ts,
+        SlackMessage.latest_reply > oldest_ts,
+    ).order_by(SlackMessage.latest_reply.desc()).limit(limit)
+    with Session(engine) as s:
+        return [_message(r) for r in s.exec(stmt).all()]
+
+
+def _fts_query(q: str) -> str:
+    # Quote every term so user input can't hit FTS5 syntax errors; terms are ANDed
+    return " ".join('"' + t.replace('"', '""') + '"' for t in q.split())
+
+
+def search_messages(query: str, channel_id: Optional[str] = None, user: Optional[str] = None,
+                    oldest_ts: Optional[str] = None, latest_ts: Optional[str] = None,
+                    limit: int = 20) -> Dict[str, Any]:
+    """BM25-ranked full-text search over stored messages, best match first."""
+    match = _fts_query(query or "")
+    if not match:
+        return {"ok": True, "query": query, "matches": []}
+    sql = """
+        SELECT m.channel_id, m.ts, m.user, m.text, m.thread_ts,
+               bm25(slackmessage_fts) AS score,
+               snippet(slackmessage_fts, 0, '[', ']', '…', 16) AS snippet
+        FROM slackmessage_fts
+        JOIN slackmessage m ON m.rowid = slackmessage_fts.rowid
+        WHERE slackmessage_fts MATCH :match
+          AND (:channel_id IS NULL OR m.channel_id = :channel_id)
+          AND (:user IS NULL OR m.user = :user)
+          AND (:oldest_ts IS NULL OR m.ts > :oldest_ts)
+          AND (:latest_ts IS NULL OR m.ts < :latest_ts)
+        ORDER BY score
+        LIMIT :limit
+    """
+    params = {
+        "match": match, "channel_id": channel_id, "user": user,
+        "oldest_ts": oldest_ts, "latest_ts": latest_ts, "limit": limit,
+    }
+    with engine.connect() as conn:
+        rows = conn.execute(text(sql), params).mappings().all()
+    return {
+        "ok": True,
+        "query": query,
+        "matches": [
+            {
+                "channel_id": r["channel_id"],
+                "ts": r["ts"],
+                "user": r["user"],
+                "text": r["text"][:MAX_TEXT],
+                "snippet": r["snippet"],
+                "thread_ts": r["thread_ts"],
+                "score": round(-r["score"], 4),  # bm25() is lower-is-better; flip for readability
+            }
+            for r in rows
+        ],
+    }
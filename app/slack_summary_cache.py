@@ -0,0 +1,41 @@
+"""
+Per-channel Slack summary cache, keyed by the newest message ts it covers.
+
+An entry also records the window start it was built for. It only answers
+for a window whose start is within WINDOW_DRIFT of the window length of that
+start. A summary of a week is not reused for an hour, and an incrementally
+updated summary is rebuilt from scratch once messages it folded in have
+slid out of the window.
+"""
+from datetime import datetime
+from typing import Optional
+from sqlmodel import Session
+
+from .model import SlackChannelSummary
+from .settings import engine
+
+WINDOW_DRIFT = 0.1
+
+
+def get_summary(channel_id: str) -> Optional[SlackChannelSummary]:
+    with Session(engine) as s:
+        return s.get(SlackChannelSummary, channel_id)
+
+
+def matches_window(row: SlackChannelSummary, oldest_ts: str, window_seconds: float) -> bool:
+    if not row.oldest_ts:
+        return False
+    return abs(float(row.oldest_ts) - float(oldest_ts)) <= WINDOW_DRIFT * window_seconds
+
+
+def put_summary(channel_id: str, latest_ts: str, summary: dict, oldest_ts: str) -> None:
+    with Session(engine) as s:
+        row = s.get(SlackChannelSummary, channel_id)
+        if not row:
+            row = SlackChannelSummary(channel_id=channel_id, latest_ts=latest_ts)
+        row.latest_ts = latest_ts
+        row.oldest_ts = oldest_ts
+        row.summary = summary
+        row.updated_at = datetime.utcnow()
+        s.add(row)
+        s.commit()
@@ -0,0 +1,156 @@
+"""
+In-process pub/sub for live status (GET /status/stream, Server-Sent Events).
+
+Writers (DaySummary upserts, EventCompletion writes) publish the fields they
+changed; each subscriber gets only the delta against what it was last sent.
+
+Backpressure: a subscriber holds at most one pending delta. New publishes are
+merged into it, so a slow client skips intermediate states instead of growing
+a queue, and it always ends up with the latest values. An idle client is one
+parked coroutine and an Event; heartbeats are SSE comments every
+STATUS_HEARTBEAT seconds so proxies keep the connection open.
+
+publish() is called from worker threads (sync endpoints, to_thread): it
+bumps the user's shared generation and hops onto the event loop the hub is
+serving from. Subscribers in other worker processes learn about the write
+from a watcher that checks those generations every STATUS_SYNC_INTERVAL
+seconds (one query per process, however many clients) and re-reads the
+status through `loader`.
+"""
+from __future__ import annotations
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Set
+import asyncio, json, os
+
+from . import shared_state
+
+HEARTBEAT = float(os.getenv("STATUS_HEARTBEAT", "15"))
+SYNC_INTERVAL = float(os.getenv("STATUS_SYNC_INTERVAL", "1"))
+
+
+def _generation_name(user_id: int) -> str:
+    return f"status:{user_id}"
+
+
+def _merge(into: Dict[str, Any], delta: Dict[str, Any]) -> None:
+    for k, v in delta.items():
+        if isinstance(v, dict) and isinstance(into.get(k), dict):
+            into[k] = {**into[k], **v}
+        else:
+            into[k] = v
+
+
+class _Subscriber:
+    def __init__(self):
+        self.pending: Dict[str, Any] = {}
+        self.wake = asyncio.Event()
+
+
+class StatusHub:
+    def __init__(self):
+        self._subs: Dict[int, Set[_Subscriber]] = {}
+        self._state: Dict[int, Dict[str, Any]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closed = False
+        self._seen: Dict[int, int] = {}  # shared generation each user's state reflects
+        self._watcher: Optional[asyncio.Task] = None
+        # user_id -> full status fields from the DB (set by the app)
+        self.loader: Optional[Callable[[int], Dict[str, Any]]] = None
+
+    def subscribers(self, user_id: Optional[int] = None) -> int:
+        if user_id is not None:
+            return len(self._subs.get(user_id, ()))
+        return sum(len(s) for s in self._subs.values())
+
+    def publish(self, user_id: int, fields: Dict[str, Any]) -> None:
+        """Push changed status fields to the user's subscribers, in every worker (thread-safe)."""
+        # Not recorded in _seen: if another worker bumped concurrently, the watcher reloads
+        shared_state.bump(_generation_name(user_id))
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return  # nobody has subscribed yet
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._publish(user_id, fields)
+        else:
+            loop.call_soon_threadsafe(self._publish, user_id, fields)
+
+    def _publish(self, user_id: int, fields: Dict[str, Any]) -> None:
+        state = self._state.setdefault(user_id, {})
+        delta: Dict[str, Any] = {}
+        for k, v in fields.items():
+            if isinstance(v, dict):
+                # e.g. completions {event_id: completed}: only the entries that changed
+                known = state.setdefault(k, {})
+                changed = {ik: iv for ik, iv in v.items() if known.get(ik) != iv}
+                known.update(changed)
+                if changed:
+                    delta[k] = changed
+            elif state.get(k) != v:
+                state[k] = v
+                delta[k] = v
+        if not delta:
+            return
+        for sub in self._subs.get(user_id, ()):
+            _merge(sub.pending, delta)
+            sub.wake.set()
+
+    async def stream(self, user_id: int, snapshot: Dict[str, Any]) -> AsyncIterator[str]:
+        """SSE lines: the snapshot as `status`, then `delta` events and heartbeats."""
+        self._loop = asyncio.get_running_loop()
+        sub = _Subscriber()
+        if user_id not in self._subs:
+            self._seen[user_id] = await asyncio.to_thread(shared_state.generation, _generation_name(user_id))
+        self._subs.setdefault(user_id, set()).add(sub)
+        self._state[user_id] = {k: dict(v) if isinstance(v, dict) else v for k, v in snapshot.items()}
+        if self.loader and (self._watcher is None or self._watcher.done()):
+            self._watcher = asyncio.create_task(self._watch())
+        seq = 0
+        try:
+            yield f"event: status\nid: {seq}\ndata: {json.dumps(snapshot)}\n\n"
+            while not self._closed:
+                try:
+                    await asyncio.wait_for(sub.wake.wait(), timeout=HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                sub.wake.clear()
+                if not sub.pending:
+                    continue
+                delta, sub.pending = sub.pending, {}
+                seq += 1
+                yield f"event: delta\nid: {seq}\ndata: {json.dumps(delta)}\n\n"
+        finally:
+            subs = self._subs.get(user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subs[user_id]
+                    self._seen.pop(user_id, None)
+
+    async def _watch(self) -> None:
+        """Pick up writes made by other worker processes while anyone is subscribed."""
+        while self._subs and not self._closed:
+            await asyncio.sleep(SYNC_INTERVAL)
+            try:
+                names = {_generation_name(u): u for u in self._subs}
+                gens = await asyncio.to_thread(shared_state.generations, names)
+                for name, gen in gens.items():
+                    user_id = names[name]
+                    if user_id in self._seen and gen != self._seen[user_id]:
+                        self._seen[user_id] = gen
+                        self._publish(user_id, await asyncio.to_thread(self.loader, user_id))
+            except Exception as e:
+                print("status sync failed:", repr(e))
+
+    def close(self) -> None:
+        """End every stream (app shutdown)."""
+        self._closed = True
+        for subs in self._subs.values():
+            for sub in subs:
+                sub.wake.set()
+
+
+hub = StatusHub()
@@ -0,0 +1,32 @@
+"""
+Per-stage timings for a request, reported in a Server-Timing header
+(visible in the browser's network panel). Each stage is also a span in the
+request's trace.
+"""
+from __future__ import annotations
+from typing import Awaitable, Dict, TypeVar
+import time
+
+from . import tracing
+
+T = TypeVar("T")
+
+
+class ServerTiming:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    async def stage(self, name: str, awaitable: Awaitable[T]) -> T:
+        """Await one stage and record its duration."""
+        t = time.perf_counter()
+        try:
+            with tracing.span(name):
+                return await awaitable
+        finally:
+            self.stages[name] = (time.perf_counter() - t) * 1000
+
+    def header(self) -> str:
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.stages.items()]
+        parts.append(f"total;dur={(time.perf_counter() - self.started) * 1000:.1f}")
+        return ", ".join(parts)
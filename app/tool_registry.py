@@ -0,0 +1,105 @@
+"""
+Tool registry for the embedded MCP servers.
+
+Each mcp/*_server.py module is loaded once (by file path: the local `mcp/`
+folder is shadowed by the installed `mcp` SDK package, so a plain
+`from mcp.slack_server import ...` can't be relied on), its tools are
+registered with their Claude schemas, and calls are dispatched by name with a
+single dict lookup. Results come back as a ToolResult envelope.
+"""
+from __future__ import annotations
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import importlib.util, os, sys, threading
+
+from . import metrics
+from .tool_result import ToolResult, as_tool_result
+
+MCP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "mcp")
+
+
+@dataclass
+class Tool:
+    name: str
+    module: str  # file name in mcp/ (without .py) or an absolute path
+    func: str
+    description: str
+    input_schema: Dict[str, Any]
+    default: Any = None  # payload when the tool returns no content
+    fn: Optional[Callable[..., Awaitable[Any]]] = field(default=None, repr=False)
+
+    @property
+    def schema(self) -> Dict[str, Any]:
+        return {"name": self.name, "description": self.description, "input_schema": self.input_schema}
+
+
+class ToolRegistry:
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+        self._modules: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, module: str, func: str, description: str,
+                 properties: Optional[Dict[str, Any]] = None, required: Optional[List[str]] = None,
+                 default: Any = None) -> Tool:
+        schema = {"type": "object", "properties": properties or {}, "required": required or []}
+        tool = Tool(name, module, func, description, schema, default)
+        self._tools[name] = tool
+        return tool
+
+    def schemas(self) -> List[Dict[str, Any]]:
+        """Tool definitions in the shape the Messages API expects."""
+        return [t.schema for t in self._tools.values()]
+
+    def names(self) -> List[str]:
+        return list(self._tools)
+
+    def load_module(self, module: str):
+        """Import an MCP server module once and keep it."""
+        mod = self._modules.get(module)
+        if mod is not None:
+            return mod
+        with self._lock:
+            mod = self._modules.get(module)
+            if mod is None:
+                path = module if os.path.isabs(module) else os.path.join(MCP_DIR, f"{module}.py")
+                mod_name = f"cowlendar_mcp_{os.path.splitext(os.path.basename(path))[0]}"
+                spec = importlib.util.spec_from_file_location(mod_name, path)
+                assert spec and spec.loader
+                mod = importlib.util.module_from_spec(spec)
+                sys.modules[mod_name] = mod
+                try:
+                    spec.loader.exec_module(mod)
+                except Exception:
+                    sys.modules.pop(mod_name, None)
+                    raise
+                self._modules[module] = mod
+        return mod
+
+    def _resolve(self, tool: Tool) -> Callable[..., Awaitable[Any]]:
+        if tool.fn is None:
+            tool.fn = getattr(self.load_module(tool.module), tool.func)
+        return tool.fn
+
+    async def invoke(self, name: str, tool_input: Dict[str, Any]) -> ToolResult:
+        tool = self._tools.get(name)
+        if tool is None:
+            raise ValueError(f"Unknown tool: {name}")
+        fn = tool.fn or self._resolve(tool)
+        props = tool.input_schema["properties"]
+        kwargs = {k: v for k, v in (tool_input or {}).items() if k in props and v is not None}
+        outcome = "exception"
+        try:
+            with metrics.tool_durations.time(tool=name):
+                result = as_tool_result(await fn(**kwargs))
+            outcome = "ok" if result.ok else "error"
+            return result
+        finally:
+            metrics.tool_calls.inc(tool=name, outcome=outcome)
+
+    async def call(self, name: str, tool_input: Dict[str, Any]) -> Any:
+        """Plain payload for HTTP endpoints: the data, or {"error": ...}."""
+        return (await self.invoke(name, tool_input)).payload(self._tools[name].default)
+
+
+tools = ToolRegistry()
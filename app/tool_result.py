@@ -0,0 +1,65 @@
+"""
+Typed result envelope for the embedded MCP tools.
+
+Tools return `ToolResult(data=...)` / `ToolResult(error=...)` and the Python
+payload is passed through untouched. It is serialized exactly once, at the
+model boundary (`to_block`).
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+import json
+
+
+@dataclass
+class ToolResult:
+    data: Any = None
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def content(self) -> List[Dict[str, Any]]:
+        """MCP-style content blocks, for callers that still expect CallToolResult."""
+        if self.error is not None:
+            return [{"type": "text", "text": f"Error: {self.error}"}]
+        return [{"type": "json", "json": self.data}]
+
+    def payload(self, default: Any = None) -> Any:
+        """What HTTP endpoints return: the data, or {"error": ...}."""
+        if self.error is not None:
+            return {"error": self.error}
+        return default if self.data is None else self.data
+
+    def to_block(self, tool_use_id: str) -> Dict[str, Any]:
+        """tool_result block for the Messages API (the one serialization)."""
+        if self.error is not None:
+            return {"type": "tool_result", "tool_use_id": tool_use_id, "content": f"Error: {self.error}", "is_error": True}
+        return {"type": "tool_result", "tool_use_id": tool_use_id, "content": json.dumps(self.data, default=str)}
+
+
+def as_tool_result(result: Any) -> ToolResult:
+    """
+    The one decoder: accepts a ToolResult, or a CallToolResult-like object whose
+    first content block is a {"type": "json"} block, JSON text or plain text.
+    """
+    if isinstance(result, ToolResult):
+        return result
+    blocks = getattr(result, "content", None) or []
+    if not blocks:
+        return ToolResult()
+    b = blocks[0]
+    if not isinstance(b, dict):
+        # Pydantic content block (avoid BaseModel.json() name collision)
+        b = b.model_dump() if hasattr(b, "model_dump") else {"text": getattr(b, "text", "")}
+    if "json" in b:
+        return ToolResult(data=b["json"])
+    text = b.get("text") or ""
+    if getattr(result, "isError", False) or text[:6].lower() == "error:":
+        return ToolResult(error=text.split(":", 1)[1].strip() if ":" in text else text)
+    try:
+        return ToolResult(data=json.loads(text))
+    except Exception:
+        return ToolResult(data={"text": text})
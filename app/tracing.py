@@ -0,0 +1,308 @@
+"""
+Span tracing for requests and agent runs, kept in memory for /debug/traces.
+
+`with span("name", **attrs) as s:` times a block and nests under whatever
+span is current (a contextvar, so it follows awaits, asyncio.gather tasks and
+asyncio.to_thread). A span opened with nothing current starts a new trace;
+when that root span ends the trace goes into a ring buffer of the last
+TRACE_BUFFER traces. HTTP requests are roots (TracingMiddleware), and so are
+scheduler jobs. A request that did nothing worth a child span (a /status
+poll, a cache hit) is not kept.
+
+Spans record start/end, attributes (inputs, output sizes, token counts) and
+the error if the block raised. With TRACE_EXPORT_FILE set, every kept trace
+is also appended to that file as one OTLP/JSON ExportTraceServiceRequest per
+line (what the OpenTelemetry collector's otlpjsonfile receiver reads),
+written from a background thread. TRACING_ENABLED=0 turns it all off.
+"""
+from __future__ import annotations
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+import json, os, queue, secrets, threading, time
+
+ENABLED = os.getenv("TRACING_ENABLED", "1") not in ("0", "false", "no")
+BUFFER = int(os.getenv("TRACE_BUFFER", "50"))
+EXPORT_FILE = os.getenv("TRACE_EXPORT_FILE", "")
+MAX_ATTR_CHARS = 300
+SERVICE_NAME = "cowlendar-backend"
+
+_OTLP_KINDS = {"internal": 1, "server": 2, "client": 3}
+
+
+def _clip(value: Any) -> Any:
+    if value is None or isinstance(value, (bool, int, float)):
+        return value
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return text if len(text) <= MAX_ATTR_CHARS else text[:MAX_ATTR_CHARS - 1] + "…"
+
+
+class Span:
+    __slots__ = ("trace", "name", "kind", "span_id", "parent_id", "start", "end", "attributes", "error")
+
+    def __init__(self, trace: "Trace", name: str, kind: str, parent_id: Optional[str]):
+        self.trace = trace
+        self.name = name
+        self.kind = kind
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.attributes: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+
+    def set(self, **attrs: Any) -> None:
+        """Add attributes (None values are skipped). Works after the span ended too,
+        until its trace is exported."""
+        for k, v in attrs.items():
+            if v is not None:
+                self.attributes[k] = _clip(v)
+
+    def fail(self, error: str) -> None:
+        """Mark the span failed without an exception (e.g. a tool's error result)."""
+        self.error = _clip(error)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.time()) - self.start) * 1000
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": self.start,
+            "duration_ms": round(self.duration_ms, 2),
+            "attributes": dict(self.attributes),
+            "error": self.error,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def fail(self, error: str) -> None:
+        pass
+
+
+NOOP = _NoopSpan()
+
+
+class Trace:
+    def __init__(self):
+        self.trace_id = secrets.token_hex(16)
+        self.spans: List[Span] = []  # in start order
+        self.root: Optional[Span] = None
+
+    def to_dict(self, spans: bool = True) -> Dict[str, Any]:
+        root = self.root
+        out = {
+            "trace_id": self.trace_id,
+            "name": root.name if root else "",
+            "start": root.start if root else 0.0,
+            "duration_ms": round(root.duration_ms, 2) if root else 0.0,
+            "span_count": len(self.spans),
+            "error": next((s.error for s in self.spans if s.error), None),
+        }
+        if spans:
+            out["spans"] = [s.to_dict() for s in list(self.spans)]
+        return out
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("cow_span", default=None)
+_lock = threading.Lock()
+_traces: Deque[Trace] = deque(maxlen=BUFFER)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attrs: Any) -> Iterator[Any]:
+    if not ENABLED:
+        yield NOOP
+        return
+    parent = _current.get()
+    trace = parent.trace if parent else Trace()
+    s = Span(trace, name, kind, parent.span_id if parent else None)
+    s.set(**attrs)
+    trace.spans.append(s)
+    if parent is None:
+        trace.root = s
+    token = _current.set(s)
+    try:
+        yield s
+    except BaseException as e:
+        s.error = repr(e)
+        raise
+    finally:
+        s.end = time.time()
+        _current.reset(token)
+        if parent is None:
+            _finish(trace)
+
+
+def sizes(data: Any) -> Any:
+    """Output size of a payload without serializing it: the length of each
+    list/dict field of a dict, or of the payload itself."""
+    if isinstance(data, dict):
+        return {k: len(v) for k, v in data.items() if isinstance(v, (list, dict))} or None
+    if isinstance(data, (list, str)):
+        return len(data)
+    return None
+
+
+def current() -> Any:
+    """The current span (or a no-op one), to add attributes from deeper down."""
+    return _current.get() or NOOP
+
+
+def _finish(trace: Trace) -> None:
+    if trace.root.kind == "server" and len(trace.spans) == 1:
+        return  # a request that did no traced work
+    with _lock:
+        _traces.append(trace)
+    if EXPORT_FILE:
+        _exporter.submit(trace)
+
+
+def recent(limit: int = BUFFER) -> List[Trace]:
+    """Newest first."""
+    with _lock:
+        traces = list(_traces)
+    return traces[::-1][:limit]
+
+
+def get(trace_id: str) -> Optional[Trace]:
+    with _lock:
+        return next((t for t in _traces if t.trace_id == trace_id), None)
+
+
+# ---- waterfall ----
+
+def waterfall(trace: Trace, width: int = 48) -> str:
+    """Plain-text waterfall: one row per span, indented by depth, with a bar
+    placed on the trace's timeline."""
+    root = trace.root
+    total = max(root.duration_ms, 0.001)
+    children: Dict[Optional[str], List[Span]] = {}
+    for s in list(trace.spans):
+        children.setdefault(s.parent_id, []).append(s)
+    lines = [f"{root.name}  {root.duration_ms:.1f} ms  {len(trace.spans)} spans  trace {trace.trace_id}"]
+    stack = [(root, 0)]
+    while stack:
+        s, depth = stack.pop()
+        stack += [(c, depth + 1) for c in reversed(children.get(s.span_id, []))]
+        offset = (s.start - root.start) * 1000
+        a = min(width - 1, int(offset / total * width))
+        b = max(a + 1, min(width, round((offset + s.duration_ms) / total * width)))
+        bar = " " * a + "█" * (b - a) + " " * (width - b)
+        label = "  " * depth + s.name
+        notes = " ".join(f"{k}={v}" for k, v in s.attributes.items())
+        if s.error:
+            notes = f"ERROR {s.error} {notes}"
+        lines.append(f"{offset:>9.1f} {s.duration_ms:>9.1f} ms |{bar}| {label}  {notes}".rstrip())
+    return "\n".join(lines)
+
+
+# ---- OTLP/JSON file export ----
+
+def _otlp_value(v: Any) -> Dict[str, Any]:
+    if isinstance(v, bool):
+        return {"boolValue": v}
+    if isinstance(v, int):
+        return {"intValue": str(v)}
+    if isinstance(v, float):
+        return {"doubleValue": v}
+    return {"stringValue": str(v)}
+
+
+def to_otlp(trace: Trace) -> Dict[str, Any]:
+    spans = []
+    for s in list(trace.spans):
+        item = {
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "name": s.name,
+            "kind": _OTLP_KINDS.get(s.kind, 1),
+            "startTimeUnixNano": str(int(s.start * 1e9)),
+            "endTimeUnixNano": str(int((s.end or time.time()) * 1e9)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        }
+        if s.parent_id:
+            item["parentSpanId"] = s.parent_id
+        spans.append(item)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "app.tracing"}, "spans": spans}],
+    }]}
+
+
+class _FileExporter:
+    """Appends traces to EXPORT_FILE from one daemon thread (never on the event loop)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._queue: "queue.SimpleQueue[Optional[Trace]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def submit(self, trace: Trace) -> None:
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                    self._thread.start()
+        self._queue.put(trace)
+
+    def close(self, timeout: float = 2.0) -> None:
+        """Write what is queued, then stop the thread."""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self) -> None:
+        while True:
+            trace = self._queue.get()
+            if trace is None:
+                return
+            # Give spans that outlive their root (e.g. shielded runs) a moment to land
+            delay = trace.root.end + 0.5 - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                with open(self.path, "a") as f:
+                    f.write(json.dumps(to_otlp(trace)) + "\n")
+            except OSError as e:
+                print("Trace export failed:", repr(e))
+
+
+_exporter = _FileExporter(EXPORT_FILE)
+
+
+def close() -> None:
+    """Flush the file exporter (app shutdown)."""
+    _exporter.close()
+
+
+class TracingMiddleware:
+    """ASGI middleware: one server span per HTTP request, named after its route."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ENABLED:
+            return await self.app(scope, receive, send)
+        with span(f"{scope['method']} {scope['path']}", kind="server") as s:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    route = scope.get("route")
+                    if route is not None:
+                        s.name = f"{scope['method']} {route.path}"
+                    s.set(status=message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
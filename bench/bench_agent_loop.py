@@ -0,0 +1,128 @@
+"""
+Offline benchmark for the brain_mcp agent loops.
+
+Replays a cassette through the fake Anthropic server (model turns) and the
+replay layer (tool outputs), so no network is needed:
+
+    python bench/bench_agent_loop.py --scenario mood --runs 20 --latency-ms 300
+    python bench/bench_agent_loop.py --scenario slack --runs 10 --tool-latency 1.0 --json out.json
+    python bench/bench_agent_loop.py --scenario slack --runs 10 --warm   # keep summary caches between runs
+
+Reports per-run wall time, model turns, tool calls/latency and tokens.
+"""
+import argparse, asyncio, json, os, statistics, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="cow-bench-"), "bench.db"))
+
+from fake_anthropic import FakeAnthropicServer  # noqa: E402
+from app import replay  # noqa: E402
+
+SCENARIOS = {
+    "mood": os.path.join(ROOT, "bench", "cassettes", "mood.json"),
+    "slack": os.path.join(ROOT, "bench", "cassettes", "slack.json"),
+}
+
+
+async def _run_once(scenario: str):
+    from app.brain_mcp import decide_mood_with_mcp, summarize_slack_with_mcp
+    if scenario == "mood":
+        return await decide_mood_with_mcp("sk-replay", [40, 55, 70])
+    return await summarize_slack_with_mcp("sk-replay")
+
+
+def reset_caches():
+    """Drop everything the app caches in the DB so each run starts cold."""
+    from sqlmodel import SQLModel
+    from app.settings import engine
+    from app import model  # noqa: F401  (registers tables)
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+
+
+def pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))
+    return values[k]
+
+
+def run(scenario: str, runs: int, latency_ms: float, ms_per_token: float, tool_latency: float,
+        cassette_path: str | None = None, warm: bool = False):
+    path = cassette_path or SCENARIOS[scenario]
+    reset_caches()
+    with replay.use_cassette(path, "replay", tool_latency_scale=tool_latency) as cassette:
+        srv = FakeAnthropicServer(cassette, latency_ms=latency_ms, ms_per_output_token=ms_per_token).start()
+        os.environ["ANTHROPIC_BASE_URL"] = srv.base_url
+        rows = []
+        try:
+            asyncio.run(_run_once(scenario))  # warm-up: imports, client construction
+            cassette.tool_timings.clear()
+            for _ in range(runs):
+                if not warm:
+                    reset_caches()
+                before = srv.stats.snapshot()
+                tools_before = len(cassette.tool_timings)
+                started = time.perf_counter()
+                result = asyncio.run(_run_once(scenario))
+                wall_ms = (time.perf_counter() - started) * 1000
+                after = srv.stats.snapshot()
+                tool_ms = [t["elapsed_ms"] for t in cassette.tool_timings[tools_before:]]
+                rows.append({
+                    "wall_ms": wall_ms,
+                    "turns": after["requests"] - before["requests"],
+                    "misses": after["misses"] - before["misses"],
+                    "tool_calls": len(tool_ms),
+                    "tool_ms": sum(tool_ms),
+                    "input_tokens": after["input_tokens"] - before["input_tokens"],
+                    "output_tokens": after["output_tokens"] - before["output_tokens"],
+                    "ok": isinstance(result, dict) and bool(result),
+                })
+        finally:
+            srv.shutdown()
+    return rows
+
+
+def summarize(rows):
+    wall = [r["wall_ms"] for r in rows]
+    return {
+        "runs": len(rows),
+        "wall_ms_p50": pct(wall, 50),
+        "wall_ms_p95": pct(wall, 95),
+        "wall_ms_mean": statistics.mean(wall) if wall else 0.0,
+        "turns_mean": statistics.mean(r["turns"] for r in rows) if rows else 0.0,
+        "tool_calls_mean": statistics.mean(r["tool_calls"] for r in rows) if rows else 0.0,
+        "tool_ms_mean": statistics.mean(r["tool_ms"] for r in rows) if rows else 0.0,
+        "input_tokens_mean": statistics.mean(r["input_tokens"] for r in rows) if rows else 0.0,
+        "output_tokens_mean": statistics.mean(r["output_tokens"] for r in rows) if rows else 0.0,
+        "cassette_misses": sum(r["misses"] for r in rows),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scenario", choices=sorted(SCENARIOS), default="mood")
+    ap.add_argument("--cassette", help="override the scenario's cassette file")
+    ap.add_argument("--runs", type=int, default=10)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="fake model latency per turn")
+    ap.add_argument("--ms-per-token", type=float, default=0.0, help="fake model latency per output token")
+    ap.add_argument("--tool-latency", type=float, default=0.0, help="scale of recorded tool latency (1.0 = as recorded)")
+    ap.add_argument("--warm", action="store_true", help="keep DB caches between runs")
+    ap.add_argument("--json", help="write summary + raw rows to this file")
+    args = ap.parse_args()
+
+    rows = run(args.scenario, args.runs, args.latency_ms, args.ms_per_token, args.tool_latency, args.cassette, args.warm)
+    summary = summarize(rows)
+    print(f"\n🐮 agent loop benchmark: {args.scenario}")
+    for k, v in summary.items():
+        print(f"   {k:<20} {v:,.1f}" if isinstance(v, float) else f"   {k:<20} {v}")
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"scenario": args.scenario, "args": vars(args), "summary": summary, "rows": rows}, f, indent=2)
+        print(f"\n   wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Offline load test of the HTTP API against local fake upstreams.
+
+    python bench/bench_load.py --concurrency 1,4,16,64 --duration 20 --json load.json
+    python bench/bench_load.py --compare load.json          # same run, diffed against a saved one
+
+Starts fake Google Calendar, Slack, Notion and Anthropic servers (bench/fake_*.py,
+configurable latency and payload size), seeds a user connected to all of them
+and runs `uvicorn app.main:app` against them via the base-URL overrides
+(GOOGLE_CALENDAR_BASE_URL, SLACK_API_URL, NOTION_BASE_URL, ANTHROPIC_BASE_URL).
+Model turns are replayed from bench/cassettes/{mood,slack}.json; tools really
+call the fake upstreams.
+
+At each concurrency level, that many closed-loop clients send a weighted mix of
+/status, /events/today/past, /events/complete, /mood/refresh/mcp and
+/slack/summarize for --duration seconds. Reports throughput and p50/p95/p99
+per route; --json saves everything (with the git commit) for comparison.
+Pass app settings through with --env, e.g. --env REFRESH_MIN_INTERVAL=0 to
+measure the mood pipeline without single-flight reuse.
+
+--loop-monitor runs the app with LOOP_MONITOR=1 and reports, per level, the
+event-loop stalls by call site from /debug/loop (threshold via --env
+LOOP_LAG_THRESHOLD_MS=...). With --compare, sites the baseline didn't have
+are flagged, so a new blocking call on the loop shows up as a regression.
+"""
+import argparse, asyncio, json, os, random, socket, subprocess, sys, tempfile, time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from fake_anthropic import FakeAnthropicServer  # noqa: E402
+from fake_google import FakeGoogleServer  # noqa: E402
+from fake_notion import FakeNotionServer  # noqa: E402
+from fake_slack import FakeSlackServer  # noqa: E402
+
+DEFAULT_MIX = "status=50,events_past=20,events_complete=15,mood_refresh=10,slack_summarize=5"
+
+
+def _request(name: str, event_ids):
+    """(method, path, json body) for one request of the mix."""
+    if name == "status":
+        return "GET", "/status", None
+    if name == "events_past":
+        return "GET", "/events/today/past", None
+    if name == "events_complete":
+        return "POST", "/events/complete", {"event_id": random.choice(event_ids), "completed": random.random() < 0.7}
+    if name == "mood_refresh":
+        return "POST", "/mood/refresh/mcp", None
+    if name == "slack_summarize":
+        return "POST", "/slack/summarize", {"hours": 24, "max_channels": 5, "messages_per_channel": 100}
+    raise ValueError(f"Unknown route in mix: {name}")
+
+
+def pct(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, round(p / 100 * (len(values) - 1))))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return ""
+
+
+def seed_db(db_path: str) -> None:
+    os.environ["DB_PATH"] = db_path
+    from sqlmodel import Session, SQLModel
+    from app.model import User
+    from app.settings import engine
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as s:
+        s.add(User(
+            email="cow@example.com",
+            google_tokens={
+                "token": "fake", "refresh_token": "fake", "client_id": "bench", "client_secret": "bench",
+                "scopes": [], "expiry": "2099-01-01T00:00:00Z",  # never due for a refresh
+            },
+            slack_tokens={"access_token": "xoxp-fake", "user_id": "U0000"},
+        ))
+        s.commit()
+
+
+async def run_level(base: str, concurrency: int, duration: float, mix, event_ids):
+    names = [n for n, _ in mix]
+    weights = [w for _, w in mix]
+    samples = {n: [] for n in names}
+    errors = {n: 0 for n in names}
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=120) as client:
+        async def user():
+            while time.perf_counter() < deadline:
+                name = random.choices(names, weights)[0]
+                method, path, body = _request(name, event_ids)
+                t = time.perf_counter()
+                try:
+                    r = await client.request(method, path, json=body)
+                    ok = r.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                samples[name].append((time.perf_counter() - t) * 1000)
+                if not ok:
+                    errors[name] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in samples.values())
+    return {
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 2),
+        "requests": total,
+        "rps": round(total / elapsed, 1),
+        "errors": sum(errors.values()),
+        "routes": {
+            n: {
+                "count": len(samples[n]),
+                "errors": errors[n],
+                "p50_ms": round(pct(samples[n], 50), 1),
+                "p95_ms": round(pct(samples[n], 95), 1),
+                "p99_ms": round(pct(samples[n], 99), 1),
+            }
+            for n in names if samples[n]
+        },
+    }
+
+
+def warm_up(base: str, mix, event_ids):
+    """One request per route, sequentially: cold latencies (empty caches, first sync)."""
+    cold = {}
+    with httpx.Client(base_url=base, timeout=300) as client:
+        for name, _ in mix:
+            method, path, body = _request(name, event_ids)
+            t = time.perf_counter()
+            r = client.request(method, path, json=body)
+            cold[name] = {"ms": round((time.perf_counter() - t) * 1000, 1), "status": r.status_code}
+    return cold
+
+
+def loop_report(base: str, reset: bool = True):
+    """Top stall sites since the last reset (LOOP_MONITOR=1)."""
+    report = httpx.get(f"{base}/debug/loop").json()
+    if reset:
+        httpx.post(f"{base}/debug/loop/reset")
+    return {
+        "stalls": report["stalls"],
+        "max_lag_ms": report["max_lag_ms"],
+        "sites": [{k: s[k] for k in ("site", "blocked_in", "stalls", "stall_ms", "max_stall_ms")} for s in report["sites"][:10]],
+        "slow_callbacks": report["slow_callbacks"][:10],
+    }
+
+
+def print_loop(loop, baseline=None):
+    known = {s["site"] for s in (baseline or {}).get("sites", [])}
+    print(f"   event loop: {loop['stalls']} stalls, max lag {loop['max_lag_ms']:.0f} ms")
+    for s in loop["sites"][:5]:
+        new = "   NEW" if baseline and s["site"] not in known else ""
+        print(f"     {s['stall_ms']:>9.0f} ms {s['stalls']:>5}x  {s['site']}  <- {s['blocked_in']}{new}")
+
+
+def print_level(level, baseline=None):
+    print(f"\n   concurrency {level['concurrency']:>3}: {level['rps']:>7.1f} req/s, "
+          f"{level['requests']} requests, {level['errors']} errors")
+    print(f"   {'route':<16} {'count':>6} {'err':>4} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, r in level["routes"].items():
+        line = f"   {name:<16} {r['count']:>6} {r['errors']:>4} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f}"
+        old = (baseline or {}).get("routes", {}).get(name)
+        if old and old["p95_ms"]:
+            line += f"   p95 {(r['p95_ms'] / old['p95_ms'] - 1) * 100:+.0f}% vs baseline"
+        print(line)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--concurrency", default="1,4,16,64", help="comma-separated client counts")
+    ap.add_argument("--duration", type=float, default=15.0, help="seconds per level")
+    ap.add_argument("--mix", default=DEFAULT_MIX, help="route=weight,...")
+    ap.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    ap.add_argument("--google-latency-ms", type=float, default=120.0)
+    ap.add_argument("--slack-latency-ms", type=float, default=80.0)
+    ap.add_argument("--notion-latency-ms", type=float, default=80.0)
+    ap.add_argument("--model-latency-ms", type=float, default=400.0)
+    ap.add_argument("--events", type=int, default=8, help="calendar events today")
+    ap.add_argument("--channels", type=int, default=8)
+    ap.add_argument("--messages", type=int, default=300, help="Slack messages per channel")
+    ap.add_argument("--text-chars", type=int, default=120, help="Slack message length")
+    ap.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra app environment")
+    ap.add_argument("--loop-monitor", action="store_true", help="report event-loop stalls by call site")
+    ap.add_argument("--json", help="write results here")
+    ap.add_argument("--compare", help="earlier --json output to diff p95 against")
+    args = ap.parse_args()
+
+    mix = [(n, float(w)) for n, w in (part.split("=") for part in args.mix.split(","))]
+    levels = [int(c) for c in args.concurrency.split(",")]
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {lv["concurrency"]: lv for lv in json.load(f)["levels"]}
+
+    from app.replay import Cassette
+    cassette = Cassette(os.path.join(ROOT, "bench", "cassettes", "mood.json"))
+    cassette.messages += Cassette(os.path.join(ROOT, "bench", "cassettes", "slack.json")).messages
+    anthropic = FakeAnthropicServer(cassette, latency_ms=args.model_latency_ms).start()
+    google = FakeGoogleServer(events=args.events, latency_ms=args.google_latency_ms).start()
+    slack = FakeSlackServer(channels=args.channels, messages=args.messages, text_chars=args.text_chars,
+                            latency_ms=args.slack_latency_ms).start()
+    notion = FakeNotionServer(latency_ms=args.notion_latency_ms).start()
+    event_ids = [e["id"] for e in google.events]
+
+    tmp = tempfile.mkdtemp(prefix="cow-load-")
+    db_path = os.path.join(tmp, "moo.db")
+    seed_db(db_path)
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DB_PATH": db_path,
+        "ANTHROPIC_API_KEY": "sk-fake",
+        "ANTHROPIC_BASE_URL": anthropic.base_url,
+        "GOOGLE_CALENDAR_BASE_URL": google.base_url,
+        "SLACK_API_URL": slack.base_url,
+        "NOTION_BASE_URL": notion.base_url,
+        "NOTION_API_KEY": "fake",
+    }
+    env.pop("COW_CASSETTE", None)
+    if args.loop_monitor:
+        env["LOOP_MONITOR"] = "1"
+    env.update(kv.split("=", 1) for kv in args.env)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL,
+    )
+    base = f"http://127.0.0.1:{port}"
+    results, cold = [], {}
+    try:
+        for _ in range(150):
+            try:
+                if httpx.get(f"{base}/status").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        else:
+            raise SystemExit("app did not start")
+        print(f"\n🐮 load test @ {_git_commit() or 'working tree'}: {args.workers} worker(s), {args.duration:.0f}s per level, mix {args.mix}")
+        cold = warm_up(base, mix, event_ids)
+        print("\n   cold (first request per route): " + ", ".join(f"{n} {c['ms']:.0f} ms" for n, c in cold.items()))
+        if args.loop_monitor:
+            loop_report(base)  # leave the cold start out
+        for c in levels:
+            level = asyncio.run(run_level(base, c, args.duration, mix, event_ids))
+            results.append(level)
+            print_level(level, baseline.get(c))
+            if args.loop_monitor:
+                level["loop"] = loop_report(base)
+                print_loop(level["loop"], baseline.get(c, {}).get("loop"))
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    print(f"\n   upstream requests: google {google.requests}, slack {slack.requests}, "
+          f"notion {notion.requests}, anthropic {anthropic.stats.snapshot()['requests']} "
+          f"({anthropic.stats.snapshot()['misses']} cassette misses)")
+    if args.json:
+        out = {
+            "commit": _git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "args": vars(args),
+            "cold": cold,
+            "levels": results,
+        }
+        with open(args.json, "w") as f:
+            json.dump(out, f, indent=2)
+        print(f"   saved {args.json}")
+
+
+if __name__ == "__main__":
+    main()
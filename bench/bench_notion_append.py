@@ -0,0 +1,71 @@
+"""
+Exporting a large block tree to Notion: one blocks.children.append call (the
+old path) vs app/notion_writer.append_blocks_bulk, against bench/fake_notion.py
+with Notion's 100-children limit and a ~3 rps rate limit.
+
+    python bench/bench_notion_append.py --blocks 2000 --rate-limit-rps 3 --latency-ms 60
+"""
+import argparse, asyncio, os, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_notion import FakeNotionServer  # noqa: E402
+
+
+def paragraph(text, children=None):
+    block = {"object": "block", "type": "paragraph", "paragraph": {"rich_text": [{"type": "text", "text": {"content": text}}]}}
+    if children:
+        block["paragraph"]["children"] = children
+    return block
+
+
+def digest(n):
+    """A day-summary/Slack-digest shaped tree: headings with bullet children."""
+    blocks = []
+    for i in range(n // 10):
+        blocks.append(paragraph(f"section {i}", [paragraph(f"item {i}.{j}") for j in range(8)]))
+        blocks.append(paragraph(f"note {i}"))
+    return blocks
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--blocks", type=int, default=2000)
+    ap.add_argument("--rate-limit-rps", type=float, default=3.0)
+    ap.add_argument("--latency-ms", type=float, default=60.0)
+    args = ap.parse_args()
+
+    srv = FakeNotionServer(latency_ms=args.latency_ms, rate_limit_rps=args.rate_limit_rps).start()
+    os.environ["NOTION_BASE_URL"] = srv.base_url
+    os.environ.setdefault("NOTION_API_KEY", "fake-bench-key")
+    os.environ.setdefault("NOTION_RPS", str(args.rate_limit_rps))
+    from app import notion_client, notion_writer
+
+    blocks = digest(args.blocks)
+    total = sum(1 + len(b["paragraph"].get("children", [])) for b in blocks)
+    print(f"\n🐮 Notion append: {len(blocks)} top-level / {total} blocks, server limit {args.rate_limit_rps} rps")
+
+    async def run():
+        await notion_client.async_append_blocks("warm-up", [paragraph("warm-up")])
+        time.sleep(1.5)  # let the server's bucket refill between runs
+        started = time.perf_counter()
+        try:
+            await notion_client.async_append_blocks("page-single", blocks)
+            outcome = "ok"
+        except Exception as e:
+            outcome = f"failed: {str(e)[:50]}"
+        print(f"   single request           {(time.perf_counter() - started) * 1000:>8.0f} ms  {outcome}")
+
+        time.sleep(1.5)
+        started = time.perf_counter()
+        res = await notion_writer.append_blocks_bulk("page-bulk", blocks)
+        elapsed = (time.perf_counter() - started) * 1000
+        ok = len(srv.blocks.get("page-bulk", [])) == len(blocks)
+        print(f"   append_blocks_bulk       {elapsed:>8.0f} ms  {res['requests']} requests, "
+              f"{res['retries']} 429 retries, {'all blocks in order' if ok else 'MISSING BLOCKS'}")
+        await notion_client.close()
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Per-call latency of repeated databases.query / pages.retrieve against a local
+fake Notion server: a new Client per call (the old get_client) vs the shared
+pooled Client vs the AsyncClient (sequential and concurrent).
+
+    python bench/bench_notion_client.py --calls 200 --latency-ms 5
+"""
+import argparse, asyncio, os, statistics, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from fake_notion import DATABASE_ID, FakeNotionServer  # noqa: E402
+
+
+def _calls(n, page_ids):
+    for i in range(n):
+        if i % 2:
+            yield "page", page_ids[i % len(page_ids)]
+        else:
+            yield "query", None
+
+
+def run_sync(label, get_client, n, page_ids):
+    times = []
+    for kind, page_id in _calls(n, page_ids):
+        started = time.perf_counter()
+        client = get_client()
+        if kind == "query":
+            client.databases.query(database_id=DATABASE_ID, page_size=10)
+        else:
+            client.pages.retrieve(page_id=page_id)
+        times.append((time.perf_counter() - started) * 1000)
+    return label, times, sum(times)
+
+
+def run_async(label, n, page_ids, concurrency):
+    from app import notion_client as notion
+
+    async def one(kind, page_id, sem, times):
+        async with sem:
+            started = time.perf_counter()
+            if kind == "query":
+                await notion.async_query_database(DATABASE_ID, page_size=10)
+            else:
+                await notion.async_get_page(page_id)
+            times.append((time.perf_counter() - started) * 1000)
+
+    async def main():
+        times = []
+        sem = asyncio.Semaphore(concurrency)
+        await notion.async_query_database(DATABASE_ID, page_size=1)  # warm the pool
+        started = time.perf_counter()
+        await asyncio.gather(*(one(k, p, sem, times) for k, p in _calls(n, page_ids)))
+        wall = (time.perf_counter() - started) * 1000
+        await notion.close()
+        return times, wall
+
+    times, wall = asyncio.run(main())
+    return label, times, wall
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=5.0, help="server-side latency per request")
+    ap.add_argument("--concurrency", type=int, default=8)
+    args = ap.parse_args()
+
+    srv = FakeNotionServer(latency_ms=args.latency_ms).start()
+    os.environ["NOTION_BASE_URL"] = srv.base_url
+    os.environ.setdefault("NOTION_API_KEY", "fake-bench-key")
+    from notion_client import Client
+    from app import notion_client as notion
+    page_ids = [p["id"] for p in srv.pages[:50]]
+
+    def fresh_client():
+        # What app/notion_client.get_client() used to do on every call
+        return Client(auth=os.environ["NOTION_API_KEY"], base_url=srv.base_url)
+
+    notion.get_client().databases.query(database_id=DATABASE_ID, page_size=1)  # warm the pool
+    rows = [
+        run_sync("new Client per call", fresh_client, args.calls, page_ids),
+        run_sync("shared pooled Client", notion.get_client, args.calls, page_ids),
+        run_async("AsyncClient, sequential", args.calls, page_ids, 1),
+        run_async(f"AsyncClient, {args.concurrency} in flight", args.calls, page_ids, args.concurrency),
+    ]
+    print(f"\n🐮 Notion client reuse: {args.calls} calls, server latency {args.latency_ms} ms")
+    print(f"   {'':<28} {'p50 ms':>8} {'p95 ms':>8} {'wall ms':>9}")
+    for label, times, wall in rows:
+        times = sorted(times)
+        p95 = times[min(len(times) - 1, int(len(times) * 0.95))]
+        print(f"   {label:<28} {statistics.median(times):>8.2f} {p95:>8.2f} {wall:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
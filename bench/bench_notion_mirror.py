@@ -0,0 +1,69 @@
+"""
+Repeated query_notion-style calls with different filters against the same
+task database: remote databases.query vs the local mirror (app/notion_mirror.py).
+
+    python bench/bench_notion_mirror.py --pages 1000 --latency-ms 80 --queries 50
+"""
+import argparse, asyncio, os, statistics, sys, tempfile, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from fake_notion import DATABASE_ID, FakeNotionServer  # noqa: E402
+
+FILTERS = [
+    {"property": "Done", "checkbox": {"equals": False}},
+    {"property": "Status", "select": {"equals": "In progress"}},
+    {"and": [{"property": "Done", "checkbox": {"equals": False}}, {"property": "Due", "date": {"on_or_before": "2025-10-04"}}]},
+    {"property": "Notes", "rich_text": {"contains": "milk"}},
+    {"or": [{"property": "Status", "select": {"equals": "Done"}}, {"property": "Due", "date": {"after": "2025-10-08"}}]},
+]
+SORTS = [{"property": "Due", "direction": "ascending"}]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=1000)
+    ap.add_argument("--latency-ms", type=float, default=80.0)
+    ap.add_argument("--queries", type=int, default=50)
+    args = ap.parse_args()
+
+    srv = FakeNotionServer(pages=args.pages, latency_ms=args.latency_ms).start()
+    os.environ.update(NOTION_BASE_URL=srv.base_url, NOTION_MIRROR_DATABASES=DATABASE_ID)
+    os.environ.setdefault("NOTION_API_KEY", "fake-bench-key")
+    os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="cow-bench-"), "bench.db"))
+    from sqlmodel import SQLModel
+    from app import model, notion_client, notion_mirror  # noqa: F401
+    from app.settings import engine
+    SQLModel.metadata.create_all(engine)
+
+    async def run():
+        started = time.perf_counter()
+        await notion_mirror.sync(DATABASE_ID, full=True)
+        initial = (time.perf_counter() - started) * 1000
+
+        remote, local = [], []
+        for i in range(args.queries):
+            flt = FILTERS[i % len(FILTERS)]
+            t = time.perf_counter()
+            await notion_client.async_query_database(DATABASE_ID, flt, SORTS, page_size=25)
+            remote.append((time.perf_counter() - t) * 1000)
+            t = time.perf_counter()
+            await notion_mirror.query(DATABASE_ID, flt, SORTS, page_size=25)
+            local.append((time.perf_counter() - t) * 1000)
+        t = time.perf_counter()
+        srv.touch(3)
+        await notion_mirror.sync(DATABASE_ID)
+        incremental = (time.perf_counter() - t) * 1000
+        await notion_client.close()
+        return initial, incremental, remote, local
+
+    initial, incremental, remote, local = asyncio.run(run())
+    print(f"\n🐮 Notion mirror: {args.pages} pages, {args.latency_ms} ms/request, {args.queries} queries")
+    print(f"   initial full sync        {initial:>9.0f} ms")
+    print(f"   incremental sync         {incremental:>9.1f} ms")
+    print(f"   remote query p50         {statistics.median(remote):>9.1f} ms")
+    print(f"   mirror query p50         {statistics.median(local):>9.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
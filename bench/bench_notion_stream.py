@@ -0,0 +1,89 @@
+"""
+Paging a large Notion database: a client-side start_cursor loop vs the
+server-side NDJSON stream (next page prefetched while the current one is
+sent), with and without a filter_properties projection.
+
+    python bench/bench_notion_stream.py --pages 2000 --latency-ms 40 --send-ms 20
+
+--send-ms simulates the time to write one page of rows to a slow client.
+Reports time to first row, total time and peak Python allocation.
+"""
+import argparse, asyncio, json, os, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fake_notion import DATABASE_ID, FakeNotionServer  # noqa: E402
+
+
+async def cursor_loop(notion, send_ms, props):
+    """One round trip at a time: fetch a page, send it, then ask for the next."""
+    first, cursor, rows = None, None, 0
+    while True:
+        res = await notion.async_query_database(DATABASE_ID, page_size=100, start_cursor=cursor, filter_properties=props)
+        lines = [json.dumps(r) for r in res["results"]]
+        first = first or time.perf_counter()
+        rows += len(lines)
+        await asyncio.sleep(send_ms / 1000)
+        if not res.get("has_more"):
+            return first, rows
+        cursor = res["next_cursor"]
+
+
+async def stream(notion, send_ms, props):
+    first, rows, batch = None, 0, 0
+    async for row in notion.iter_database_rows(DATABASE_ID, page_size=100, filter_properties=props):
+        json.dumps(row)
+        first = first or time.perf_counter()
+        rows += 1
+        batch += 1
+        if batch == 100:
+            batch = 0
+            await asyncio.sleep(send_ms / 1000)
+    return first, rows
+
+
+def measure(fn, send_ms, props):
+    from app import notion_client as notion
+
+    async def main(trace):
+        await notion.async_query_database(DATABASE_ID, page_size=1)  # warm the pool
+        if trace:
+            tracemalloc.start()
+        started = time.perf_counter()
+        first, rows = await fn(notion, send_ms, props)
+        total = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1] if trace else 0
+        tracemalloc.stop()
+        await notion.close()
+        return (first - started) * 1000, total * 1000, peak, rows
+
+    # Timed run without tracemalloc (it slows parsing a lot), then a traced run for the peak
+    first, total, _, rows = asyncio.run(main(False))
+    peak = asyncio.run(main(True))[2]
+    return first, total, peak, rows
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--pages", type=int, default=2000, help="rows in the fake database")
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--send-ms", type=float, default=20.0)
+    args = ap.parse_args()
+
+    srv = FakeNotionServer(pages=args.pages, latency_ms=args.latency_ms).start()
+    os.environ["NOTION_BASE_URL"] = srv.base_url
+    os.environ.setdefault("NOTION_API_KEY", "fake-bench-key")
+
+    print(f"\n🐮 Notion paging: {args.pages} rows, {args.latency_ms} ms/request, {args.send_ms} ms to send a page")
+    print(f"   {'':<32} {'first row ms':>12} {'total ms':>9} {'peak MB':>8}")
+    for label, fn, props in (
+        ("start_cursor loop", cursor_loop, None),
+        ("NDJSON stream (prefetch)", stream, None),
+        ("stream + filter_properties", stream, ["title", "sTat"]),
+    ):
+        first, total, peak, rows = measure(fn, args.send_ms, props)
+        assert rows == args.pages, rows
+        print(f"   {label:<32} {first:>12.1f} {total:>9.0f} {peak / 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+Concurrent sign-ins and live status against a multi-worker server.
+
+    python bench/bench_oauth_workers.py --workers 4 --signins 200 --streams 20
+
+Starts `uvicorn app.main:app --workers N` on a temp DB with Slack's
+oauth.v2.access pointed at bench/fake_slack.py, then:
+
+  sign-ins  N concurrent /auth/slack/start -> /auth/slack/callback pairs, each
+            on a fresh connection (so start and callback usually hit different
+            workers); every callback is then replayed once and must be refused
+  status    S /status/stream clients (spread over the workers) while
+            /events/complete writes land on whichever worker; reports how many
+            streams saw every write and the delivery latency
+"""
+from urllib.parse import parse_qs, urlparse
+import argparse, asyncio, json, os, socket, subprocess, sys, tempfile, time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from fake_slack import FakeSlackServer  # noqa: E402
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+async def sign_ins(base: str, n: int):
+    # No keep-alive: each request is a new connection the kernel can hand to any worker
+    limits = httpx.Limits(max_keepalive_connections=0)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=60) as client:
+        async def one():
+            t = time.perf_counter()
+            start = (await client.get("/auth/slack/start")).json()
+            state = parse_qs(urlparse(start["auth_url"]).query)["state"][0]
+            first = await client.get("/auth/slack/callback", params={"code": "c", "state": state})
+            elapsed = time.perf_counter() - t
+            replay = await client.get("/auth/slack/callback", params={"code": "c", "state": state})
+            return first.status_code, replay.status_code, elapsed
+
+        results = await asyncio.gather(*(one() for _ in range(n)))
+    ok = sum(1 for first, _, _ in results if first == 200)
+    refused = sum(1 for _, replay, _ in results if replay == 400)
+    ms = [r[2] * 1000 for r in results]
+    print(f"   sign-ins   {ok}/{n} accepted, {n - ok} state mismatches, "
+          f"{refused}/{n} replays refused   p50 {_pct(ms, .5):.0f} ms  p95 {_pct(ms, .95):.0f} ms")
+
+
+async def status_fanout(base: str, streams: int, writes: int):
+    limits = httpx.Limits(max_keepalive_connections=0)
+    sent_at = {}
+    received = [dict() for _ in range(streams)]
+
+    async def listen(i: int, ready: asyncio.Event):
+        async with httpx.AsyncClient(base_url=base, limits=limits, timeout=None) as client:
+            async with client.stream("GET", "/status/stream") as r:
+                event = None
+                async for line in r.aiter_lines():
+                    if line.startswith("event:"):
+                        event = line.split(":", 1)[1].strip()
+                        if event == "status":
+                            ready.set()
+                    elif line.startswith("data:") and event == "delta":
+                        for event_id in json.loads(line[5:]).get("completions", {}):
+                            received[i].setdefault(event_id, time.perf_counter())
+
+    readies = [asyncio.Event() for _ in range(streams)]
+    tasks = [asyncio.create_task(listen(i, readies[i])) for i in range(streams)]
+    await asyncio.wait_for(asyncio.gather(*(e.wait() for e in readies)), 30)
+    async with httpx.AsyncClient(base_url=base, limits=limits, timeout=30) as client:
+        for w in range(writes):
+            event_id = f"evt-{w}"
+            sent_at[event_id] = time.perf_counter()
+            await client.post("/events/complete", json={"event_id": event_id, "completed": True})
+            await asyncio.sleep(0.05)
+    await asyncio.sleep(3)
+    for t in tasks:
+        t.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+    complete = sum(1 for got in received if len(got) == writes)
+    lag = [(got[e] - sent_at[e]) * 1000 for got in received for e in got]
+    print(f"   status     {complete}/{streams} streams saw all {writes} writes   "
+          f"delivery p50 {_pct(lag, .5):.0f} ms  p95 {_pct(lag, .95):.0f} ms  max {max(lag, default=0):.0f} ms")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--signins", type=int, default=200)
+    ap.add_argument("--streams", type=int, default=20)
+    ap.add_argument("--writes", type=int, default=10)
+    args = ap.parse_args()
+
+    stub = FakeSlackServer(channels=1, messages=0).start()
+    port = _free_port()
+    tmp = tempfile.mkdtemp(prefix="cow-bench-")
+    env = {
+        **os.environ,
+        "DB_PATH": os.path.join(tmp, "moo.db"),
+        "SLACK_API_URL": stub.base_url,
+        "SLACK_CLIENT_ID": "bench",
+        "ANTHROPIC_API_KEY": "",
+    }
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(100):
+            try:
+                if httpx.get(f"{base}/status").status_code == 200:
+                    break
+            except httpx.TransportError:
+                pass
+            time.sleep(0.2)
+        print(f"\n🐮 {args.workers} workers, shared SQLite state")
+        asyncio.run(sign_ins(base, args.signins))
+        asyncio.run(status_fanout(base, args.streams, args.writes))
+    finally:
+        server.terminate()
+        server.wait(10)
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
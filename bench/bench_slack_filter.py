@@ -0,0 +1,59 @@
+"""
+Cost and effect of the Slack noise filter (subtype drop + SimHash/LSH dedup).
+
+    python bench/bench_slack_filter.py --sizes 100,1000,10000 --dup-share 0.4
+
+Synthetic channels mix human chatter, repeated CI alerts that differ only in
+build numbers/links, and join/leave events. Time per message should stay
+flat as the channel grows (linear overall).
+"""
+import argparse, os, random, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.slack_filter import filter_messages  # noqa: E402
+
+WORDS = "deploy build fix review ticket release staging prod migration test flaky api cache latency retro".split()
+ALERTS = [
+    "CI build #{n} failed on main: tests/test_api.py::test_mood (https://ci.example.com/b/{n})",
+    ":rotating_light: [FIRING:1] HighLatency api-{n} p95 > 800ms for 5m",
+    "Deploy {n} to staging succeeded in {m}s",
+]
+
+
+def make_channel(n: int, dup_share: float, seed: int = 1):
+    rnd = random.Random(seed)
+    messages = []
+    for i in range(n):
+        ts = f"{1761400000 - i * 30}.000100"
+        r = rnd.random()
+        if r < dup_share:
+            text = rnd.choice(ALERTS).format(n=rnd.randint(1000, 99999), m=rnd.randint(10, 300))
+            messages.append({"ts": ts, "user": "B0CI", "text": text})
+        elif r < dup_share + 0.05:
+            messages.append({"ts": ts, "user": f"U{i % 40:04d}", "text": "has joined the channel", "subtype": "channel_join"})
+        else:
+            text = " ".join(rnd.choice(WORDS) for _ in range(rnd.randint(5, 25)))
+            messages.append({"ts": ts, "user": f"U{i % 40:04d}", "text": text})
+    return messages
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", default="100,1000,10000")
+    ap.add_argument("--dup-share", type=float, default=0.4)
+    args = ap.parse_args()
+
+    print(f"\n🐮 slack noise filter (alert share {args.dup_share:.0%})")
+    print(f"   {'messages':>9} {'kept':>7} {'dupes':>7} {'subtypes':>9} {'tokens cut':>11} {'ms':>9} {'µs/msg':>8}")
+    for n in (int(s) for s in args.sizes.split(",")):
+        messages = make_channel(n, args.dup_share)
+        started = time.perf_counter()
+        kept, stats = filter_messages(messages)
+        elapsed = time.perf_counter() - started
+        total = stats["tokens_removed"] + stats["tokens_kept"]
+        print(f"   {n:>9} {len(kept):>7} {stats['duplicates']:>7} {stats['dropped_subtypes']:>9} "
+              f"{stats['tokens_removed'] / max(total, 1):>10.0%} {elapsed * 1000:>9.1f} {elapsed / n * 1e6:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Per-call tool dispatch overhead: the old exec_module-per-call wrappers vs the
+tool registry (module loaded once, dict dispatch).
+
+    python bench/bench_tool_dispatch.py --calls 2000
+
+The tool bodies are no-ops so only dispatch cost is measured; the "legacy
+load" row re-executes mcp/slack_server.py the way the old Slack wrappers did.
+"""
+import argparse, asyncio, importlib.util, os, sys, tempfile, textwrap, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="cow-bench-"), "bench.db"))
+
+from app.tool_registry import ToolRegistry  # noqa: E402
+from app.tool_result import as_tool_result  # noqa: E402
+
+NOOP_SERVER = textwrap.dedent('''
+    class _Result:
+        def __init__(self, payload):
+            self.content = [{"type": "json", "json": payload}]
+
+    async def noop_tool(channel_id: str = "", limit: int = 100):
+        return _Result({"ok": True, "channel_id": channel_id, "limit": limit})
+''')
+
+
+def _legacy_load(path: str):
+    spec = importlib.util.spec_from_file_location("local_mcp_slack_server", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+async def _legacy_if_chain(mod, name, tool_input):
+    # Shape of the old call_tool: string compares, then a wrapper that decodes
+    if name == "get_calendar_events":
+        raise AssertionError
+    elif name == "query_notion":
+        raise AssertionError
+    elif name == "fetch_ai_query":
+        raise AssertionError
+    elif name == "slack_list_conversations":
+        raise AssertionError
+    elif name == "noop":
+        return as_tool_result(await mod.noop_tool(tool_input.get("channel_id", ""), tool_input.get("limit", 100)))
+    raise ValueError(name)
+
+
+def timed(label, calls, fn):
+    started = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - started
+    print(f"   {label:<38} {elapsed / calls * 1e6:>10.2f} µs/call")
+    return elapsed / calls
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--calls", type=int, default=2000)
+    ap.add_argument("--legacy-loads", type=int, default=50, help="exec_module calls to time (slow)")
+    args = ap.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="cow-bench-")
+    noop_path = os.path.join(tmp, "noop_server.py")
+    with open(noop_path, "w") as f:
+        f.write(NOOP_SERVER)
+
+    reg = ToolRegistry()
+    reg.register("noop", noop_path, "noop_tool", "no-op", {"channel_id": {"type": "string"}, "limit": {"type": "integer"}})
+    noop_mod = reg.load_module(noop_path)
+    tool_input = {"channel_id": "C0ENG", "limit": 50}
+
+    print("\n🐮 tool dispatch overhead")
+    slack_path = os.path.join(ROOT, "mcp", "slack_server.py")
+    try:
+        _legacy_load(slack_path)  # warm imports (slack_sdk, app.settings)
+        timed("legacy: exec_module(slack_server)", args.legacy_loads,
+              lambda: [_legacy_load(slack_path) for _ in range(args.legacy_loads)])
+    except Exception as e:
+        print(f"   legacy load skipped: {e!r}")
+
+    async def legacy():
+        for _ in range(args.calls):
+            await _legacy_if_chain(noop_mod, "noop", tool_input)
+
+    async def registry():
+        for _ in range(args.calls):
+            await reg.invoke("noop", tool_input)
+
+    async def direct():
+        for _ in range(args.calls):
+            await noop_mod.noop_tool(**tool_input)
+
+    timed("direct await (floor)", args.calls, lambda: asyncio.run(direct()))
+    timed("legacy if-chain + decode", args.calls, lambda: asyncio.run(legacy()))
+    timed("registry.invoke", args.calls, lambda: asyncio.run(registry()))
+
+
+if __name__ == "__main__":
+    main()
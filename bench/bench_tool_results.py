@@ -0,0 +1,69 @@
+"""
+Allocation and latency of moving a large Slack tool result to the model.
+
+    python bench/bench_tool_results.py --messages 2000 --text-chars 1000
+
+legacy:   server json.dumps -> wrapper json.loads -> loop json.dumps
+envelope: ToolResult passes the dict through -> one json.dumps in to_block
+"""
+import argparse, json, os, random, sys, time, tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.tool_result import ToolResult, as_tool_result  # noqa: E402
+
+
+class _LegacyResult:
+    def __init__(self, text):
+        self.content = [{"type": "text", "text": text}]
+
+
+def make_payload(n: int, chars: int) -> dict:
+    rnd = random.Random(1)
+    words = "deploy build fix review ticket release staging prod migration test flaky".split()
+    messages = []
+    for i in range(n):
+        text = " ".join(rnd.choice(words) for _ in range(chars // 6))[:chars]
+        messages.append({"ts": f"{1761400000 - i}.000100", "user": f"U{i % 40:04d}", "text": text, "subtype": None, "thread_ts": None})
+    return {"ok": True, "messages": messages, "has_more": False, "response_metadata": {"next_cursor": None}}
+
+
+def legacy(payload):
+    server_side = _LegacyResult(json.dumps(payload))  # mcp/slack_server.py
+    decoded = json.loads(server_side.content[0]["text"])  # brain_mcp wrapper
+    return {"type": "tool_result", "tool_use_id": "t", "content": json.dumps(decoded)}  # agent loop
+
+
+def envelope(payload):
+    return as_tool_result(ToolResult(data=payload)).to_block("t")
+
+
+def measure(fn, payload, repeat):
+    fn(payload)  # warm-up
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(payload)
+    per_call_ms = (time.perf_counter() - started) / repeat * 1000
+    tracemalloc.start()
+    fn(payload)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return per_call_ms, peak
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--messages", type=int, default=2000)
+    ap.add_argument("--text-chars", type=int, default=1000)
+    ap.add_argument("--repeat", type=int, default=20)
+    args = ap.parse_args()
+
+    payload = make_payload(args.messages, args.text_chars)
+    print(f"\n🐮 tool result round trip: {args.messages} messages x {args.text_chars} chars "
+          f"({len(json.dumps(payload)) / 1e6:.1f} MB serialized)")
+    for label, fn in (("legacy text round trip", legacy), ("ToolResult envelope", envelope)):
+        ms, peak = measure(fn, payload, args.repeat)
+        print(f"   {label:<24} {ms:>8.2f} ms/call   peak alloc {peak / 1e6:>7.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Local stand-in for the Anthropic Messages API that replays a cassette.
+
+    python bench/fake_anthropic.py bench/cassettes/mood.json --port 8787 --latency-ms 300
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8787 COW_CASSETTE=bench/cassettes/mood.json \\
+        uvicorn app.main:app --port 8000
+
+Serves POST /v1/messages (looked up by conversation + turn, see app/replay.py)
+and GET /v1/models. Input token usage is estimated from the request size so
+prompt growth shows up in benchmarks; output usage comes from the cassette.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse, json, os, sys, threading, time, uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app.replay import Cassette
+
+DEFAULT_MODELS = [
+    "claude-sonnet-4-5-20250929",
+    "claude-haiku-4-5-20251001",
+    "claude-3-5-haiku-20241022",
+    "claude-3-haiku-20240307",
+]
+
+
+class ReplayStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.misses = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {
+                "requests": self.requests,
+                "misses": self.misses,
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+            }
+
+
+def _complete(resp: dict, model: str, input_tokens: int) -> dict:
+    """Fill in the Message fields hand-written cassettes usually omit."""
+    out = dict(resp)
+    out.setdefault("id", f"msg_{uuid.uuid4().hex[:24]}")
+    out.setdefault("type", "message")
+    out.setdefault("role", "assistant")
+    out.setdefault("model", model)
+    out.setdefault("stop_sequence", None)
+    out.setdefault("stop_reason", "end_turn")
+    for block in out.get("content", []):
+        if block.get("type") == "tool_use":
+            block.setdefault("id", f"toolu_{uuid.uuid4().hex[:24]}")
+    usage = dict(out.get("usage") or {})
+    usage["input_tokens"] = input_tokens
+    usage.setdefault("output_tokens", max(1, len(json.dumps(out.get("content", []))) // 4))
+    out["usage"] = usage
+    return out
+
+
+class FakeAnthropicServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, cassette: Cassette, port: int = 0, latency_ms: float = 0.0,
+                 ms_per_output_token: float = 0.0, models=None):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.cassette = cassette
+        self.latency_ms = latency_ms
+        self.ms_per_output_token = ms_per_output_token
+        self.models = models or DEFAULT_MODELS
+        self.stats = ReplayStats()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeAnthropicServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeAnthropicServer
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        path = self.path.split("?")[0]
+        if path == "/v1/models":
+            data = [{"type": "model", "id": m, "display_name": m, "created_at": "2025-01-01T00:00:00Z"} for m in self.server.models]
+            return self._send(200, {"data": data, "has_more": False, "first_id": data[0]["id"] if data else None, "last_id": data[-1]["id"] if data else None})
+        if path == "/_stats":
+            return self._send(200, self.server.stats.snapshot())
+        self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": path}})
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if path != "/v1/messages":
+            return self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": path}})
+        req = json.loads(raw or b"{}")
+        model = req.get("model", "")
+        if model not in self.server.models:
+            return self._send(404, {"type": "error", "error": {"type": "not_found_error", "message": f"model: {model}"}})
+
+        srv = self.server
+        resp = srv.cassette.find_response(req.get("messages", []))
+        if resp is None:
+            with srv.stats.lock:
+                srv.stats.misses += 1
+            return self._send(400, {"type": "error", "error": {"type": "invalid_request_error", "message": "no cassette entry for this conversation turn"}})
+
+        body = _complete(resp, model, max(1, len(raw) // 4))
+        delay = srv.latency_ms + srv.ms_per_output_token * body["usage"]["output_tokens"]
+        if delay > 0:
+            time.sleep(delay / 1000.0)
+        with srv.stats.lock:
+            srv.stats.requests += 1
+            srv.stats.input_tokens += body["usage"]["input_tokens"]
+            srv.stats.output_tokens += body["usage"]["output_tokens"]
+        self._send(200, body)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("cassette")
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="fixed latency per request")
+    ap.add_argument("--ms-per-token", type=float, default=0.0, help="extra latency per output token")
+    args = ap.parse_args()
+    srv = FakeAnthropicServer(Cassette(args.cassette, "replay"), args.port, args.latency_ms, args.ms_per_token)
+    print(f"Fake Anthropic replaying {args.cassette} on {srv.base_url}")
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
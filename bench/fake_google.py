@@ -0,0 +1,101 @@
+"""
+Local stand-in for the Google Calendar API used by the load benchmarks.
+
+    python bench/fake_google.py --port 8789 --events 8 --latency-ms 120
+    GOOGLE_CALENDAR_BASE_URL=http://127.0.0.1:8789/ uvicorn app.main:app
+
+Serves today's primary calendar, `events` timed events spread over the local
+day with about half of them already over when the server starts:
+  GET /calendars/primary/events   (timeMin/timeMax are ignored)
+  GET /calendars/primary
+Any bearer token is accepted.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta
+from urllib.parse import urlparse
+import argparse, json, threading, time
+
+TITLES = ["Standup", "Design review", "Lunch", "1:1", "Sprint planning", "Focus time", "Interview", "Retro"]
+
+
+def make_events(n: int, now: datetime) -> list:
+    # Half end before now, half after; 45 minute events every hour
+    first = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=n // 2)
+    day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    events = []
+    for i in range(n):
+        start = max(day, first + timedelta(hours=i))
+        end = start + timedelta(minutes=45)
+        events.append({
+            "kind": "calendar#event",
+            "id": f"evt{i:03d}",
+            "status": "confirmed",
+            "summary": TITLES[i % len(TITLES)],
+            "start": {"dateTime": start.isoformat()},
+            "end": {"dateTime": end.isoformat()},
+        })
+    return events
+
+
+class FakeGoogleServer(ThreadingHTTPServer):
+    daemon_threads = True
+    protocol_version = "HTTP/1.1"
+    request_queue_size = 1024
+
+    def __init__(self, port: int = 0, events: int = 8, latency_ms: float = 0.0, email: str = "cow@example.com"):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.events = make_events(events, datetime.now().astimezone())
+        self.latency_ms = latency_ms
+        self.email = email
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+    def start(self) -> "FakeGoogleServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeGoogleServer
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: dict):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+        path = urlparse(self.path).path.rstrip("/")
+        if path == "/calendars/primary/events":
+            return self._send(200, {"kind": "calendar#events", "items": self.server.events})
+        if path == "/calendars/primary":
+            return self._send(200, {"kind": "calendar#calendar", "id": self.server.email, "summary": self.server.email})
+        self._send(404, {"error": {"code": 404, "message": f"Not Found: {path}"}})
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8789)
+    ap.add_argument("--events", type=int, default=8)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    args = ap.parse_args()
+    srv = FakeGoogleServer(args.port, args.events, args.latency_ms)
+    print(f"fake Google Calendar on {srv.base_url}")
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Local stand-in for the Notion API used by the Notion benchmarks.
+
+    python bench/fake_notion.py --port 8788 --pages 500 --latency-ms 50
+    NOTION_BASE_URL=http://127.0.0.1:8788 NOTION_API_KEY=fake uvicorn app.main:app
+
+Serves a synthetic task database (DATABASE_ID) with Name/Done/Status/Due/Notes
+properties:
+  POST  /v1/databases/{id}/query   page_size, start_cursor, filter_properties;
+                                   the only filter applied is a last_edited_time
+                                   timestamp filter, sorts only last_edited_time
+  GET   /v1/pages/{id}
+  POST  /v1/search
+  PATCH /v1/blocks/{id}/children   rejects > 100 children per array, nesting
+                                   deeper than two levels, and column_list /
+                                   column / table blocks without children;
+                                   optional rate limit answers 429 + Retry-After
+  GET   /v1/blocks/{id}/children   page_size, start_cursor
+HTTP/1.1 keep-alive, so connection reuse shows up in the numbers.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import datetime, timedelta, timezone
+from urllib.parse import parse_qs, urlparse
+import argparse, json, random, threading, time, uuid
+
+DATABASE_ID = "db000000-0000-0000-0000-000000000001"
+STATUSES = ["Not started", "In progress", "Done"]
+
+
+def _iso(dt: datetime) -> str:
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.000Z")
+
+
+def make_page(i: int, edited: datetime, rnd: random.Random) -> dict:
+    due = (edited + timedelta(days=rnd.randint(-3, 10))).date().isoformat()
+    status = rnd.choice(STATUSES)
+    text = " ".join(rnd.choice("call email review ship draft plan fix cow milk barn".split()) for _ in range(8))
+    return {
+        "object": "page",
+        "id": str(uuid.UUID(int=i + 1)),
+        "created_time": _iso(edited - timedelta(days=1)),
+        "last_edited_time": _iso(edited),
+        "archived": False,
+        "parent": {"type": "database_id", "database_id": DATABASE_ID},
+        "properties": {
+            "Name": {"id": "title", "type": "title", "title": [{"type": "text", "plain_text": f"Task {i}", "text": {"content": f"Task {i}"}}]},
+            "Done": {"id": "dOne", "type": "checkbox", "checkbox": status == "Done"},
+            "Status": {"id": "sTat", "type": "select", "select": {"name": status}},
+            "Due": {"id": "dUe_", "type": "date", "date": {"start": due, "end": None}},
+            "Notes": {"id": "nOte", "type": "rich_text", "rich_text": [{"type": "text", "plain_text": text, "text": {"content": text}}]},
+        },
+    }
+
+
+class FakeNotionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, port: int = 0, pages: int = 200, latency_ms: float = 0.0,
+                 rate_limit_rps: float = 0.0, seed: int = 1):
+        super().__init__(("127.0.0.1", port), _Handler)
+        rnd = random.Random(seed)
+        start = datetime(2025, 10, 1, tzinfo=timezone.utc)
+        self.pages = [make_page(i, start + timedelta(minutes=i), rnd) for i in range(pages)]
+        self.latency_ms = latency_ms
+        self.rate_limit_rps = rate_limit_rps
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.rate_limited = 0
+        self.blocks = {}  # block id -> appended children, in order
+        self._bucket = (max(1.0, rate_limit_rps), time.monotonic())
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self) -> "FakeNotionServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def touch(self, index: int) -> dict:
+        """Edit a page now (bumps last_edited_time), for incremental sync tests."""
+        with self.lock:
+            page = self.pages[index]
+            page["last_edited_time"] = _iso(datetime.now(timezone.utc))
+            return page
+
+    def store(self, parent_id: str, children: list) -> list:
+        """Create blocks (and their inline children) under parent_id; call with the lock held."""
+        made = []
+        for child in children:
+            body = child.get(child.get("type"), {})
+            kids = body.get("children") if isinstance(body, dict) else None
+            block = {"object": "block", "id": str(uuid.uuid4()), "has_children": bool(kids), **child}
+            self.blocks.setdefault(parent_id, []).append(block)
+            if kids:
+                self.store(block["id"], kids)
+            made.append(block)
+        return made
+
+    def take_token(self) -> float:
+        """0 if the request may proceed, else seconds to wait (token bucket)."""
+        if not self.rate_limit_rps:
+            return 0.0
+        with self.lock:
+            tokens, at = self._bucket
+            now = time.monotonic()
+            tokens = min(max(1.0, self.rate_limit_rps), tokens + (now - at) * self.rate_limit_rps)
+            if tokens >= 1:
+                self._bucket = (tokens - 1, now)
+                return 0.0
+            self._bucket = (tokens, now)
+            return (1 - tokens) / self.rate_limit_rps
+
+
+def _invalid(children: list, depth: int = 0):
+    """Why Notion would reject this children array (None if it wouldn't)."""
+    if len(children) > 100:
+        return "body.children.length should be ≤ `100`"
+    for child in children:
+        body = child.get(child.get("type"), {})
+        kids = body.get("children") if isinstance(body, dict) else None
+        if kids and depth == 2:
+            return "body.children nesting should be ≤ 2 levels"
+        if not kids and child.get("type") in ("column_list", "column", "table"):
+            return f"{child['type']} must be created with its children"
+        problem = kids and _invalid(kids, depth + 1)
+        if problem:
+            return problem
+    return None
+
+
+def _project(page: dict, wanted) -> dict:
+    if not wanted:
+        return page
+    props = {k: v for k, v in page["properties"].items() if k in wanted or v["id"] in wanted}
+    return {**page, "properties": props}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeNotionServer
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: dict, headers=None):
+        raw = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def _error(self, status: int, code: str, message: str, headers=None):
+        self._send(status, {"object": "error", "status": status, "code": code, "message": message}, headers)
+
+    def _body(self) -> dict:
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        return json.loads(raw or b"{}")
+
+    def _begin(self) -> bool:
+        with self.server.lock:
+            self.server.requests += 1
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000)
+        return True
+
+    def do_GET(self):
+        self._begin()
+        parts = urlparse(self.path).path.strip("/").split("/")
+        if len(parts) == 4 and parts[1] == "blocks" and parts[3] == "children":
+            q = parse_qs(urlparse(self.path).query)
+            children = self.server.blocks.get(parts[2], [])
+            size = min(int((q.get("page_size") or ["100"])[0]), 100)
+            offset = int((q.get("start_cursor") or ["0"])[0])
+            more = offset + size < len(children)
+            return self._send(200, {"object": "list", "results": children[offset:offset + size],
+                                    "next_cursor": str(offset + size) if more else None, "has_more": more})
+        if len(parts) == 3 and parts[1] == "pages":
+            for page in self.server.pages:
+                if page["id"] == parts[2]:
+                    return self._send(200, page)
+            return self._error(404, "object_not_found", parts[2])
+        self._error(404, "invalid_request_url", self.path)
+
+    def do_POST(self):
+        self._begin()
+        url = urlparse(self.path)
+        parts = url.path.strip("/").split("/")
+        body = self._body()
+        if parts[1:2] == ["search"]:
+            db = {"object": "database", "id": DATABASE_ID, "title": [{"plain_text": "Tasks"}]}
+            return self._send(200, {"object": "list", "results": [db], "next_cursor": None, "has_more": False})
+        if len(parts) == 4 and parts[1] == "databases" and parts[3] == "query":
+            if parts[2] != DATABASE_ID:
+                return self._error(404, "object_not_found", parts[2])
+            pages = self.server.pages
+            flt = body.get("filter") or {}
+            if flt.get("timestamp") == "last_edited_time":
+                cond = flt.get("last_edited_time") or {}
+                if "on_or_after" in cond:
+                    pages = [p for p in pages if p["last_edited_time"] >= cond["on_or_after"]]
+                elif "after" in cond:
+                    pages = [p for p in pages if p["last_edited_time"] > cond["after"]]
+            for sort in body.get("sorts") or []:
+                if sort.get("timestamp") == "last_edited_time":
+                    pages = sorted(pages, key=lambda p: p["last_edited_time"], reverse=sort.get("direction") == "descending")
+            size = min(int(body.get("page_size") or 100), 100)
+            offset = int(body.get("start_cursor") or 0)
+            chunk = pages[offset:offset + size]
+            more = offset + size < len(pages)
+            wanted = parse_qs(url.query).get("filter_properties")
+            return self._send(200, {
+                "object": "list",
+                "results": [_project(p, wanted) for p in chunk],
+                "next_cursor": str(offset + size) if more else None,
+                "has_more": more,
+            })
+        self._error(404, "invalid_request_url", self.path)
+
+    def do_PATCH(self):
+        self._begin()
+        parts = urlparse(self.path).path.strip("/").split("/")
+        body = self._body()
+        if len(parts) == 4 and parts[1] == "blocks" and parts[3] == "children":
+            wait = self.server.take_token()
+            if wait:
+                with self.server.lock:
+                    self.server.rate_limited += 1
+                return self._error(429, "rate_limited", "slow down", {"Retry-After": f"{wait:.3f}"})
+            children = body.get("children") or []
+            problem = _invalid(children)
+            if problem:
+                return self._error(400, "validation_error", problem)
+            with self.server.lock:
+                results = self.server.store(parts[2], children)
+            return self._send(200, {"object": "list", "results": results, "next_cursor": None, "has_more": False})
+        self._error(404, "invalid_request_url", self.path)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8788)
+    ap.add_argument("--pages", type=int, default=200)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    ap.add_argument("--rate-limit-rps", type=float, default=0.0)
+    args = ap.parse_args()
+    srv = FakeNotionServer(args.port, args.pages, args.latency_ms, args.rate_limit_rps)
+    print(f"fake Notion on {srv.base_url} (database {DATABASE_ID})")
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Local stand-in for the Slack Web API used by the load benchmarks.
+
+    python bench/fake_slack.py --port 8790 --channels 8 --messages 300 --latency-ms 80
+    SLACK_API_URL=http://127.0.0.1:8790/api/ uvicorn app.main:app
+
+Serves synthetic channels with `messages` recent messages each (every
+twenty-fifth one a thread parent), GET or POST with form/query params:
+  conversations.list, conversations.history, conversations.replies,
+  users.list, users.info, oauth.v2.access
+Pagination uses offset cursors. Any token is accepted.
+"""
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+import argparse, json, random, threading, time
+
+NAMES = ["eng", "ops-alerts", "random", "design", "support", "sales", "infra", "general"]
+WORDS = "deploy build fix review ticket release staging prod migration test flaky cow milk barn".split()
+
+
+def _text(rnd: random.Random, chars: int) -> str:
+    return " ".join(rnd.choice(WORDS) for _ in range(chars // 5 + 1))[:chars]
+
+
+class FakeSlackServer(ThreadingHTTPServer):
+    daemon_threads = True
+    protocol_version = "HTTP/1.1"
+    request_queue_size = 1024
+
+    def __init__(self, port: int = 0, channels: int = 8, messages: int = 300, text_chars: int = 120,
+                 users: int = 40, latency_ms: float = 0.0, seed: int = 1):
+        super().__init__(("127.0.0.1", port), _Handler)
+        rnd = random.Random(seed)
+        now = time.time()
+        self.channels = [{
+            "id": f"C{i:04d}", "name": NAMES[i % len(NAMES)] + ("" if i < len(NAMES) else f"-{i}"),
+            "is_channel": True, "is_member": True, "is_private": False,
+        } for i in range(channels)]
+        self.users = [{"id": f"U{i:04d}", "name": f"user{i}", "profile": {"display_name": f"User {i}"}} for i in range(users)]
+        self.history = {}
+        for ch in self.channels:
+            msgs = []
+            for j in range(messages):
+                ts = f"{now - j * 240 - rnd.random():.6f}"
+                m = {"type": "message", "ts": ts, "user": rnd.choice(self.users)["id"], "text": _text(rnd, text_chars)}
+                if j % 25 == 0:
+                    m.update(thread_ts=ts, reply_count=3, latest_reply=ts)
+                msgs.append(m)
+            self.history[ch["id"]] = msgs  # newest first
+        self.latency_ms = latency_ms
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/api/"
+
+    def start(self) -> "FakeSlackServer":
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def _page(items: list, q: dict, default_limit: int = 100):
+    offset = int(q.get("cursor") or 0)
+    limit = int(q.get("limit") or default_limit)
+    chunk = items[offset:offset + limit]
+    more = offset + limit < len(items)
+    return chunk, more, {"next_cursor": str(offset + limit) if more else ""}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeSlackServer
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, body: dict):
+        raw = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        self.wfile.write(raw)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        self._handle(url.path.rsplit("/", 1)[-1], {k: v[0] for k, v in parse_qs(url.query).items()})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        raw = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode()
+        q = {k: v[0] for k, v in parse_qs(url.query).items()}
+        q.update({k: v[0] for k, v in parse_qs(raw).items()})
+        self._handle(url.path.rsplit("/", 1)[-1], q)
+
+    def _handle(self, method: str, q: dict):
+        srv = self.server
+        with srv.lock:
+            srv.requests += 1
+        if srv.latency_ms:
+            time.sleep(srv.latency_ms / 1000)
+        if method == "conversations.list":
+            chunk, _, meta = _page(srv.channels, q)
+            return self._send({"ok": True, "channels": chunk, "response_metadata": meta})
+        if method == "conversations.history":
+            msgs = srv.history.get(q.get("channel"))
+            if msgs is None:
+                return self._send({"ok": False, "error": "channel_not_found"})
+            if q.get("oldest"):
+                msgs = [m for m in msgs if m["ts"] > q["oldest"]]
+            if q.get("latest"):
+                msgs = [m for m in msgs if m["ts"] < q["latest"]]
+            chunk, more, meta = _page(msgs, q)
+            return self._send({"ok": True, "messages": chunk, "has_more": more, "response_metadata": meta})
+        if method == "conversations.replies":
+            ts = q.get("ts", "0")
+            replies = [{"type": "message", "ts": f"{float(ts) + i:.6f}", "thread_ts": ts,
+                        "user": srv.users[i % len(srv.users)]["id"], "text": f"reply {i}"} for i in range(1, 4)]
+            return self._send({"ok": True, "messages": [{"ts": ts, "thread_ts": ts, "text": "parent"}] + replies, "has_more": False})
+        if method == "users.list":
+            chunk, _, meta = _page(srv.users, q, 200)
+            return self._send({"ok": True, "members": chunk, "response_metadata": meta})
+        if method == "users.info":
+            for user in srv.users:
+                if user["id"] == q.get("user"):
+                    return self._send({"ok": True, "user": user})
+            return self._send({"ok": False, "error": "user_not_found"})
+        if method == "oauth.v2.access":
+            return self._send({
+                "ok": True,
+                "authed_user": {"id": "U0000", "access_token": "xoxp-fake", "scope": "channels:read"},
+                "team": {"id": "T0001", "name": "Barn"},
+            })
+        self._send({"ok": False, "error": "unknown_method"})
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--port", type=int, default=8790)
+    ap.add_argument("--channels", type=int, default=8)
+    ap.add_argument("--messages", type=int, default=300)
+    ap.add_argument("--text-chars", type=int, default=120)
+    ap.add_argument("--latency-ms", type=float, default=0.0)
+    args = ap.parse_args()
+    srv = FakeSlackServer(args.port, args.channels, args.messages, args.text_chars, latency_ms=args.latency_ms)
+    print(f"fake Slack on {srv.base_url}")
+    srv.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,24 @@
-import asyncio, json
+import asyncio, os, sys
 from mcp.server import Server
-from mcp.types import Tool, CallToolResult
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from app.tool_result import ToolResult
 
 srv = Server("moo-google-calendar")
 
 @srv.tool(name="get_today_events", description="Return today's Google Calendar events for the signed-in user.")
-async def get_today_events_tool() -> CallToolResult:
+async def get_today_events_tool() -> ToolResult:
     try:
-        # Load tokens from DB
-        import sys
-        import os
-        sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-        
         from app.calendar_client import get_today_events
-        from app.settings import engine
-        from app.model import User
-        from sqlmodel import Session, select
-        
-        with Session(engine) as s:
-            user = s.exec(select(User)).first()
-            if not user or not user.google_tokens:
-                return CallToolResult(content=[{"type": "text", "text": "No authenticated user found"}])
-            
-            events = get_today_events(user.google_tokens)
-            return CallToolResult(content=[{"type": "json", "json": events}])
+        from app.credentials import credentials
+
+        tokens = credentials.google_tokens()
+        if not tokens:
+            return ToolResult(error="No authenticated user found")
+        events = await asyncio.to_thread(get_today_events, tokens)  # blocking Google client
+        return ToolResult(data=events)
     except Exception as e:
-        return CallToolResult(content=[{"type": "text", "text": f"Error: {str(e)}"}])
+        return ToolResult(error=str(e))
 
 async def main():
     await srv.run_stdio()
@@ -1,6 +1,8 @@
-import asyncio
+import asyncio, os, sys
 from mcp.server import Server
-from mcp.types import CallToolResult
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from app.tool_result import ToolResult
 
 srv = Server("moo-fetch-ai")
 
@@ -8,7 +10,7 @@ srv = Server("moo-fetch-ai")
     name="fetch_ai_query",
     description="Query Fetch AI agent for productivity insights or task recommendations."
 )
-async def fetch_ai_query_tool(query: str) -> CallToolResult:
+async def fetch_ai_query_tool(query: str) -> ToolResult:
     """
     Placeholder for Fetch AI integration.
     Replace with actual Fetch AI SDK calls.
@@ -30,15 +32,15 @@ async def fetch_ai_query_tool(query: str) -> CallToolResult:
             }
         }
         
-        return CallToolResult(content=[{"type": "json", "json": result}])
+        return ToolResult(data=result)
     except Exception as e:
-        return CallToolResult(content=[{"type": "text", "text": f"Error: {str(e)}"}])
+        return ToolResult(error=str(e))
 
 @srv.tool(
     name="fetch_ai_task_suggestions",
     description="Get AI-powered task suggestions based on current workload."
 )
-async def fetch_ai_task_suggestions_tool(context: str = "") -> CallToolResult:
+async def fetch_ai_task_suggestions_tool(context: str = "") -> ToolResult:
     """
     Get task prioritization suggestions from Fetch AI.
     """
@@ -53,9 +55,9 @@ async def fetch_ai_task_suggestions_tool(context: str = "") -> CallToolResult:
             "context": context
         }
         
-        return CallToolResult(content=[{"type": "json", "json": suggestions}])
+        return ToolResult(data=suggestions)
     except Exception as e:
-        return CallToolResult(content=[{"type": "text", "text": f"Error: {str(e)}"}])
+        return ToolResult(error=str(e))
 
 async def main():
     await srv.run_stdio()
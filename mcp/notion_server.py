@@ -1,67 +1,53 @@
-import asyncio, os, json
+import asyncio, os, sys, json
 from dotenv import load_dotenv
 from mcp.server import Server
-from mcp.types import CallToolResult
-from notion_client import Client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+from app import notion_client as notion, notion_mirror, notion_writer
+from app.tool_result import ToolResult
 
 load_dotenv()
 
 srv = Server("moo-notion")
 
-def get_client() -> Client:
-    token = os.getenv("NOTION_API_KEY", "")
-    if not token:
-        raise RuntimeError("NOTION_API_KEY not set in environment")
-    return Client(auth=token)
-
 @srv.tool(name="notion_list_databases", description="List Notion databases accessible by the integration. Optional query to filter by name.")
-async def notion_list_databases(query: str | None = None, page_size: int = 10) -> CallToolResult:
+async def notion_list_databases(query: str | None = None, page_size: int = 10) -> ToolResult:
     try:
-        client = get_client()
-        res = client.search(
-            query=query or None,
-            filter={"property": "object", "value": "database"},
-            page_size=page_size,
-        )
-        return CallToolResult(content=[{"type": "json", "json": res}])
+        res = await notion.async_search_databases(query, page_size)
+        return ToolResult(data=res)
     except Exception as e:
-        return CallToolResult(content=[{"type": "text", "text": f"error: {e}"}])
+        return ToolResult(error=str(e))
 
 @srv.tool(name="notion_query_database", description="Query a Notion database. filter_json/sorts_json should be JSON strings matching Notion API.")
-async def notion_query_database(database_id: str, filter_json: str = "", sorts_json: str = "", page_size: int = 25, start_cursor: str | None = None) -> CallToolResult:
+async def notion_query_database(database_id: str, filter_json: str = "", sorts_json: str = "", page_size: int = 25, start_cursor: str | None = None) -> ToolResult:
     try:
-        client = get_client()
         filt = json.loads(filter_json) if filter_json else None
         sorts = json.loads(sorts_json) if sorts_json else None
-        res = client.databases.query(
-            database_id=database_id,
-            **({"filter": filt} if filt is not None else {}),
-            **({"sorts": sorts} if sorts is not None else {}),
-            **({"start_cursor": start_cursor} if start_cursor else {}),
-            page_size=page_size,
-        )
-        return CallToolResult(content=[[{"type": "json", "json": res}]][0])
+        # Mirrored databases are answered locally when the filter/sorts are supported
+        res = await notion_mirror.query(database_id, filt, sorts, page_size, start_cursor)
+        if res is None:
+            res = await notion.async_query_database(database_id, filt, sorts, page_size, start_cursor)
+        return ToolResult(data=res)
     except Exception as e:
-        return CallToolResult(content=[{"type": "text", "text": f"error: {e}"}])
+        return ToolResult(error=str(e))
 
 @srv.tool(name="notion_get_page", description="Retrieve a Notion page by page_id.")
-async def notion_get_page(page_id: str) -> CallToolResult:
+async def notion_get_page(page_id: str) -> ToolResult:
     try:
-        client = get_client()
-        res = client.pages.retrieve(page_id=page_id)
-        return CallToolResult(content=[{"type": "json", "json": res}])
+        res = await notion.async_get_page(page_id)
+        return ToolResult(data=res)
     except Exception as e:
-        return CallToolResult(content=[{"type": "text", "text": f"error: {e}"}])
+        return ToolResult(error=str(e))
 
 @srv.tool(name="notion_append_blocks", description="Append blocks to a block/page. children_json should be a JSON array of Notion block objects.")
-async def notion_append_blocks(block_id: str, children_json: str) -> CallToolResult:
+async def notion_append_blocks(block_id: str, children_json: str) -> ToolResult:
     try:
-        client = get_client()
         children = json.loads(children_json)
-        res = client.blocks.children.append(block_id=block_id, children=children)
-        return CallToolResult(content=[{"type": "json", "json": res}])
+        # Chunked to Notion's per-request limits and rate limited; order is preserved
+        res = await notion_writer.append_blocks_bulk(block_id, children)
+        return ToolResult(data=res)
     except Exception as e:
-        return CallToolResult(content=[{"type": "text", "text": f"error: {e}"}])
+        return ToolResult(error=str(e))
 
 async def main():
     await srv.run_stdio()
@@ -1,89 +1,80 @@
-import os, sys, json
-from mcp.types import CallToolResult
-from slack_sdk import WebClient
+import asyncio, os, sys
 
 # Ensure app package is importable (same pattern as calendar_server)
 sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
-from app.settings import engine
-from app.model import User
-from sqlmodel import Session, select
+from app.credentials import credentials
+from app.tool_result import ToolResult
+from app import slack_channels, slack_enrich, slack_filter, slack_store
 
 
 def _get_user_token() -> str:
-    with Session(engine) as s:
-        user = s.exec(select(User)).first()
-        if not user or not user.slack_tokens:
-            raise RuntimeError("No Slack authenticated user found")
-        token = user.slack_tokens.get("access_token")
-        if not token:
-            raise RuntimeError("Slack access token missing")
-        return token
+    # Cached in memory; refreshed by the OAuth callback
+    return credentials.slack_token()
 
 
-async def slack_list_conversations(types: str = "public_channel,private_channel,im,mpim", limit: int = 100, cursor: str | None = None) -> CallToolResult:
+async def slack_list_conversations(types: str = "public_channel,private_channel,im,mpim", limit: int = 100, cursor: str | None = None) -> ToolResult:
+    """Served from the channel index (conversations.list is re-paginated at most
+    once per SLACK_CHANNEL_LIST_INTERVAL), most active first. `cursor` is an offset."""
     try:
         token = _get_user_token()
-        client = WebClient(token=token)
-        resp = client.conversations_list(types=types, limit=limit, cursor=cursor)
-        # Minimize payload
-        channels = []
-        for ch in resp.data.get("channels", []):
-            channels.append({
-                "id": ch.get("id"),
-                "name": ch.get("name"),
-                "is_channel": ch.get("is_channel"),
-                "is_group": ch.get("is_group"),
-                "is_im": ch.get("is_im"),
-                "is_private": ch.get("is_private"),
-            })
+        await slack_channels.refresh_channels(token)
+        await slack_store.refresh_activity(token, types)
+        ranked = await asyncio.to_thread(slack_channels.ranked_channels, types)
+        start = int(cursor or 0)
+        page = ranked[start:start + limit]
         data = {
-            "ok": resp.data.get("ok", True),
-            "channels": channels,
+            "ok": True,
+            "channels": [slack_channels.to_dict(ch) for ch in page],
             "response_metadata": {
-                "next_cursor": (resp.data.get("response_metadata") or {}).get("next_cursor")
+                "next_cursor": str(start + limit) if start + limit < len(ranked) else None
             }
         }
-        return CallToolResult(content=[{"type": "text", "text": json.dumps(data)}])
+        return ToolResult(data=data)
     except Exception as e:
-        return CallToolResult(content=[{"type": "text", "text": f"Error: {e}"}])
+        return ToolResult(error=str(e))
 
 
-async def slack_fetch_messages(channel_id: str, oldest_ts: str | None = None, latest_ts: str | None = None, limit: int = 100, cursor: str | None = None) -> CallToolResult:
+async def slack_fetch_messages(channel_id: str, oldest_ts: str | None = None, latest_ts: str | None = None, limit: int = 100, cursor: str | None = None, expand_threads: bool = True, resolve_users: bool = True, filter_noise: bool = True) -> ToolResult:
+    """Served from the local message store; Slack is only asked for what's new.
+    `cursor` is the next_cursor of a previous response. Messages come back with
+    `user_name`, and threads active in the window carry their `replies`; on the
+    first page that includes threads started before `oldest_ts`.
+    With `filter_noise`, housekeeping subtypes are dropped and near-duplicates
+    collapsed into one message with `dup_count` (stats under "filter")."""
     try:
         token = _get_user_token()
-        client = WebClient(token=token)
-        kwargs = {
-            "channel": channel_id,
-            "limit": limit,
-        }
-        if cursor:
-            kwargs["cursor"] = cursor
+        await slack_store.sync_channel(token, channel_id)
         if oldest_ts:
-            kwargs["oldest"] = oldest_ts
-        if latest_ts:
-            kwargs["latest"] = latest_ts
-        resp = client.conversations_history(**kwargs)
-        # Minimize payload and truncate text
-        messages = []
-        for m in resp.data.get("messages", []):
-            text = m.get("text") or ""
-            if isinstance(text, str) and len(text) > 1000:
-                text = text[:1000]
-            messages.append({
-                "ts": m.get("ts"),
-                "user": m.get("user"),
-                "text": text,
-                "subtype": m.get("subtype"),
-                "thread_ts": m.get("thread_ts"),
-            })
-        data = {
-            "ok": resp.data.get("ok", True),
-            "messages": messages,
-            "has_more": resp.data.get("has_more"),
-            "response_metadata": {
-                "next_cursor": (resp.data.get("response_metadata") or {}).get("next_cursor")
-            }
-        }
-        return CallToolResult(content=[{"type": "text", "text": json.dumps(data)}])
+            await slack_store.ensure_range(token, channel_id, oldest_ts)
+        data = await asyncio.to_thread(slack_store.query_messages, channel_id, oldest_ts, latest_ts, limit, cursor)
+        if expand_threads and oldest_ts and not cursor:
+            # Older threads that got replies in the window (listed after the window's messages)
+            data["messages"] += await asyncio.to_thread(slack_store.thread_parents, channel_id, oldest_ts, slack_enrich.MAX_THREADS)
+        await slack_enrich.enrich_messages(token, channel_id, data["messages"], oldest_ts, expand_threads, resolve_users)
+        if filter_noise:
+            data["messages"], data["filter"] = slack_filter.filter_messages(data["messages"])
+        return ToolResult(data=data)
+    except Exception as e:
+        return ToolResult(error=str(e))
+
+
+async def slack_top_channels(k: int = 5, types: str = "public_channel,private_channel,im,mpim") -> ToolResult:
+    """Member conversations ranked by recent activity from the channel index."""
+    try:
+        token = _get_user_token()
+        await slack_channels.refresh_channels(token)
+        await slack_store.refresh_activity(token, types)
+        top = await asyncio.to_thread(slack_channels.top_channels, k, types)
+        data = {"ok": True, "channels": [slack_channels.to_dict(ch) for ch in top]}
+        return ToolResult(data=data)
+    except Exception as e:
+        return ToolResult(error=str(e))
+
+
+async def slack_search_messages(query: str, channel_id: str | None = None, user: str | None = None, oldest_ts: str | None = None, latest_ts: str | None = None, limit: int = 20) -> ToolResult:
+    """Full-text search over messages already synced into the local store."""
+    try:
+        data = await asyncio.to_thread(slack_store.search_messages, query, channel_id, user, oldest_ts, latest_ts, limit)
+        return ToolResult(data=data)
     except Exception as e:
-        return CallToolResult(content=[{"type": "text", "text": f"Error: {e}"}])
+        return ToolResult(error=str(e))